@@ -0,0 +1,397 @@
+# ann_index.py - Index type and compression policy (Flat / IVF / HNSW, SQ8 / fp16 / PQ) for subject vector stores
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import logging
+from typing import List, Optional
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+# 🎯 Index policy configuration
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "hnsw")         # index used above ANN_MIN_CHUNKS: hnsw | ivf
+ANN_MIN_CHUNKS = int(os.getenv("ANN_MIN_CHUNKS", "5000"))    # below this a flat index is exact and fast enough
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))              # IVF lists visited per query
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "64"))        # HNSW candidate list size per query
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+POLICY_FILE = "index_policy.json"  # optional override, e.g. {"type": "ivf", "nprobe": 32}
+POLICY_DEPTH = 4                   # subject, semester, year and branch directories may each hold one
+
+# 🗜️ Vector compression: the index keeps codes, exact vectors stay on disk for re-ranking
+ANN_COMPRESSION = os.getenv("ANN_COMPRESSION", "none")             # none | sq8 | fp16 | pq
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "48"))                         # PQ bytes per vector
+ANN_RERANK_FACTOR = int(os.getenv("ANN_RERANK_FACTOR", "4"))        # candidates re-ranked per result
+PQ_MIN_VECTORS = 1024  # PQ trains 256 centroids per sub-quantizer; smaller stores fall back to sq8
+EXACT_VECTORS_FILE = "vectors.npy"
+SQ_TYPES = {"sq8": faiss.ScalarQuantizer.QT_8bit, "fp16": faiss.ScalarQuantizer.QT_fp16}
+
+def load_policy(store_dir: Optional[str] = None) -> dict:
+    """Index policy for a store: environment defaults, overridden by index_policy.json files
+
+    Files are read from the branch directory down to the subject directory, so a
+    branch-wide setting (e.g. {"compression": "sq8"}) can be refined per subject.
+    """
+    policy = {
+        "type": "auto",
+        "ann_type": ANN_INDEX_TYPE,
+        "min_chunks": ANN_MIN_CHUNKS,
+        "nprobe": ANN_NPROBE,
+        "ef_search": ANN_EF_SEARCH,
+        "hnsw_m": ANN_HNSW_M,
+        "compression": ANN_COMPRESSION,
+        "pq_m": ANN_PQ_M,
+        "rerank_factor": ANN_RERANK_FACTOR
+    }
+    if store_dir:
+        dirs = [os.path.normpath(store_dir)]
+        while len(dirs) < POLICY_DEPTH and os.path.dirname(dirs[-1]) not in ("", dirs[-1]):
+            dirs.append(os.path.dirname(dirs[-1]))
+        for policy_dir in reversed(dirs):
+            try:
+                with open(os.path.join(policy_dir, POLICY_FILE)) as f:
+                    policy.update(json.load(f))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Ignoring invalid {POLICY_FILE} in {policy_dir}: {e}")
+    return policy
+
+def choose_index_type(n_vectors: int, policy: dict) -> str:
+    if policy["type"] != "auto":
+        return policy["type"]
+    return policy["ann_type"] if n_vectors >= policy["min_chunks"] else "flat"
+
+def index_type(index) -> str:
+    """flat | ivf | hnsw for a FAISS index"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+def compression(index) -> str:
+    """none | sq8 | fp16 | pq for a FAISS index"""
+    downcast = faiss.downcast_index(index)
+    if isinstance(downcast, faiss.IndexHNSW):
+        downcast = faiss.downcast_index(downcast.storage)
+    if isinstance(downcast, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return next((name for name, qtype in SQ_TYPES.items() if qtype == downcast.sq.qtype), "sq")
+    if isinstance(downcast, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return "none"
+
+def is_compressed(index) -> bool:
+    return compression(index) != "none"
+
+def is_inner_product(index) -> bool:
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalized float32 copy of a vector matrix"""
+    vectors = np.array(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def choose_compression(n_vectors: int, policy: dict) -> str:
+    target = policy.get("compression", "none")
+    if target == "pq" and n_vectors < PQ_MIN_VECTORS:
+        return "sq8"
+    return target
+
+def _pq_m(dim: int, requested: int) -> int:
+    """Largest sub-quantizer count <= requested that divides the dimension"""
+    return next(m for m in range(max(1, min(int(requested), dim)), 0, -1) if dim % m == 0)
+
+def build_index(vectors: np.ndarray, policy: Optional[dict] = None, kind: Optional[str] = None):
+    """Build an inner-product index of the policy's type and compression over L2-normalized vectors"""
+    policy = policy or load_policy()
+    vectors = normalized(vectors)  # copy: normalization is in place
+    n, dim = vectors.shape
+    kind = kind or choose_index_type(n, policy)
+    codec = choose_compression(n, policy)
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if kind == "hnsw":
+        m = int(policy["hnsw_m"])
+        if codec in SQ_TYPES:
+            index = faiss.IndexHNSWSQ(dim, SQ_TYPES[codec], m, metric)
+        elif codec == "pq":
+            index = faiss.IndexHNSWPQ(dim, _pq_m(dim, policy["pq_m"]), m, 8, metric)
+        else:
+            index = faiss.IndexHNSWFlat(dim, m, metric)
+    elif kind == "ivf":
+        # ~sqrt(n) lists, keeping at least 39 training points per list
+        nlist = max(1, min(int(math.sqrt(n)), n // 39))
+        if codec in SQ_TYPES:
+            index = faiss.IndexIVFScalarQuantizer(faiss.IndexFlatIP(dim), dim, nlist, SQ_TYPES[codec], metric)
+        elif codec == "pq":
+            index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, nlist, _pq_m(dim, policy["pq_m"]), 8, metric)
+        else:
+            index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, metric)
+    else:
+        if codec in SQ_TYPES:
+            index = faiss.IndexScalarQuantizer(dim, SQ_TYPES[codec], metric)
+        elif codec == "pq":
+            index = faiss.IndexPQ(dim, _pq_m(dim, policy["pq_m"]), 8, metric)
+        else:
+            index = faiss.IndexFlatIP(dim)
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    configure_search(index, policy)
+    return index
+
+def configure_search(index, policy: Optional[dict] = None):
+    """Apply the policy's search-time knobs (nprobe / efSearch) to an index"""
+    policy = policy or load_policy()
+    downcast = faiss.downcast_index(index)
+    if isinstance(downcast, faiss.IndexIVF):
+        downcast.nprobe = int(policy["nprobe"])
+    elif isinstance(downcast, faiss.IndexHNSW):
+        downcast.hnsw.efSearch = int(policy["ef_search"])
+
+def search_params(index, sel=None, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """SearchParameters of the right subclass for an index, or None when nothing is overridden"""
+    downcast = faiss.downcast_index(index)
+    if isinstance(downcast, faiss.IndexIVF):
+        if sel is None and nprobe is None:
+            return None
+        params = faiss.SearchParametersIVF(nprobe=nprobe or downcast.nprobe)
+    elif isinstance(downcast, faiss.IndexHNSW):
+        if sel is None and ef_search is None:
+            return None
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or downcast.hnsw.efSearch)
+    else:
+        if sel is None:
+            return None
+        params = faiss.SearchParameters()
+    if sel is not None:
+        params.sel = sel
+    return params
+
+def similarity_from_distance(index, distance: float) -> float:
+    """Cosine similarity for a search result, comparable across index types
+
+    Inner-product indexes return the cosine directly; older L2 indexes return the
+    squared distance between unit vectors, which is 2 - 2 * cosine.
+    """
+    if is_inner_product(index):
+        return float(distance)
+    return 1.0 - float(distance) / 2.0
+
+def rerank_search(
+    index,
+    query: np.ndarray,
+    k: int,
+    params=None,
+    exact_vectors: Optional[np.ndarray] = None,
+    rerank_factor: int = ANN_RERANK_FACTOR
+):
+    """index.search, re-scoring a compressed index's top rerank_factor * k candidates with exact vectors
+
+    Scores come back as exact cosine similarities, so callers treat them like a flat
+    inner-product index's. Without exact vectors the compressed scores are returned.
+    """
+    if exact_vectors is None or not is_compressed(index):
+        return index.search(query, k, params=params)
+
+    candidates = index.search(query, k * max(1, int(rerank_factor)), params=params)[1]
+    queries = normalized(query)
+    scores = np.full((len(queries), k), -np.finfo(np.float32).max, dtype=np.float32)
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    for row, (q, row_ids) in enumerate(zip(queries, candidates)):
+        row_ids = row_ids[(row_ids >= 0) & (row_ids < len(exact_vectors))]
+        exact_scores = np.asarray(exact_vectors[row_ids], dtype=np.float32) @ q
+        order = np.argsort(-exact_scores)[:k]
+        scores[row, :len(order)] = exact_scores[order]
+        ids[row, :len(order)] = row_ids[order]
+    return scores, ids
+
+def reconstruct_all(index) -> np.ndarray:
+    """All stored vectors of an index, in id order (approximate for compressed indexes)"""
+    downcast = faiss.downcast_index(index)
+    if isinstance(downcast, faiss.IndexIVF):
+        downcast.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def load_exact_vectors(store_dir: str) -> Optional[np.ndarray]:
+    """Read-only memory map of a store's exact vectors, if it keeps them"""
+    path = os.path.join(store_dir, EXACT_VECTORS_FILE)
+    return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+def apply_policy(index, store_dir: Optional[str] = None, exact_vectors: Optional[np.ndarray] = None):
+    """Return an index matching the store's policy, rebuilding only when the type, metric or compression differs"""
+    policy = load_policy(store_dir)
+    kind = choose_index_type(index.ntotal, policy)
+    codec = choose_compression(index.ntotal, policy)
+    if index.ntotal and (index_type(index) != kind or compression(index) != codec or not is_inner_product(index)):
+        return build_index(exact_vectors if exact_vectors is not None else reconstruct_all(index), policy, kind)
+    configure_search(index, policy)
+    return index
+
+def save_exact_vectors(store_dir: str, index, exact_vectors: Optional[np.ndarray]):
+    """Keep exact vectors next to a compressed index; drop a stale file once the index stores them itself"""
+    path = os.path.join(store_dir, EXACT_VECTORS_FILE)
+    if exact_vectors is None or not is_compressed(index):
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, np.asarray(exact_vectors, dtype=np.float32))
+    os.replace(tmp_path, path)
+
+def _index_dirs(root: str):
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        if "index.faiss" in files:
+            yield dirpath
+
+# 🛠️ Migration of existing index.faiss files
+def migrate(root: str, kind: Optional[str] = None, dry_run: bool = False) -> dict:
+    """Convert every index.faiss under root to the configured policy, keeping vector ids"""
+    report = {"converted": 0, "unchanged": 0, "failed": 0}
+    for dirpath in _index_dirs(root):
+        path = os.path.join(dirpath, "index.faiss")
+        try:
+            start_time = time.time()
+            index = faiss.read_index(path)
+            policy = load_policy(dirpath)
+            target = kind or choose_index_type(index.ntotal, policy)
+            codec = choose_compression(index.ntotal, policy)
+            if index_type(index) == target and compression(index) == codec and is_inner_product(index):
+                report["unchanged"] += 1
+                continue
+
+            metric = "ip" if is_inner_product(index) else "l2"
+            print(f"🔄 {path}: {index_type(index)}/{metric}/{compression(index)} ({index.ntotal} vectors) -> {target}/ip/{codec}")
+            if not dry_run:
+                exact_vectors = load_exact_vectors(dirpath)
+                if exact_vectors is None:
+                    if is_compressed(index):
+                        logger.warning(f"{dirpath} has no {EXACT_VECTORS_FILE}, rebuilding from decoded vectors")
+                    exact_vectors = normalized(reconstruct_all(index))
+                new_index = build_index(exact_vectors, policy, target)
+                # Exact vectors first: they cover every id of either index
+                save_exact_vectors(dirpath, new_index, exact_vectors)
+                tmp_path = f"{path}.tmp"
+                faiss.write_index(new_index, tmp_path)
+                os.replace(tmp_path, path)
+                print(f"✅ Converted in {time.time() - start_time:.2f}s")
+            report["converted"] += 1
+        except Exception as e:
+            print(f"❌ {path}: {e}")
+            report["failed"] += 1
+    return report
+
+# 📏 Size / recall report for compression settings
+def _recall_at_k(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    return float(np.mean([len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth)]))
+
+def compression_report(
+    root: str,
+    codecs: Optional[List[str]] = None,
+    k: int = 5,
+    n_queries: int = 200,
+    seed: int = 0
+) -> List[dict]:
+    """Index bytes and recall@k of each compression setting for every store under root
+
+    Stored chunk vectors serve as queries and exact inner-product search over the
+    uncompressed vectors is the ground truth. Each store is rebuilt in memory with
+    its current index type, so the numbers compare like with like.
+    """
+    codecs = codecs or ["none", "sq8", "fp16", "pq"]
+    rows = []
+    for dirpath in _index_dirs(root):
+        index = faiss.read_index(os.path.join(dirpath, "index.faiss"))
+        if index.ntotal == 0:
+            continue
+        exact_vectors = load_exact_vectors(dirpath)
+        if exact_vectors is None:
+            if is_compressed(index):
+                print(f"⚠️ {dirpath}: compressed index without {EXACT_VECTORS_FILE}, skipped")
+                continue
+            exact_vectors = reconstruct_all(index)
+        exact_vectors = normalized(exact_vectors)
+
+        rng = np.random.default_rng(seed)
+        queries = exact_vectors[rng.choice(len(exact_vectors), min(n_queries, len(exact_vectors)), replace=False)]
+        flat = faiss.IndexFlatIP(exact_vectors.shape[1])
+        flat.add(exact_vectors)
+        truth = flat.search(queries, k)[1]
+
+        policy = load_policy(dirpath)
+        kind = index_type(index)
+        row = {
+            "store": os.path.relpath(dirpath, root),
+            "branch": os.path.relpath(dirpath, root).split(os.sep)[0],
+            "type": kind,
+            "vectors": int(index.ntotal),
+            "current": compression(index),
+            "settings": {}
+        }
+        for codec in codecs:
+            candidate = build_index(exact_vectors, {**policy, "compression": codec}, kind)
+            found = candidate.search(queries, k)[1]
+            reranked = rerank_search(candidate, queries, k, exact_vectors=exact_vectors, rerank_factor=policy["rerank_factor"])[1]
+            row["settings"][codec] = {
+                "built_as": compression(candidate),  # small stores fall back from pq to sq8
+                "bytes": int(faiss.serialize_index(candidate).nbytes),
+                "recall": _recall_at_k(found, truth, k),
+                "recall_reranked": _recall_at_k(reranked, truth, k)
+            }
+        rows.append(row)
+    return rows
+
+def print_compression_report(rows: List[dict], k: int):
+    by_branch = {}
+    for row in rows:
+        print(f"\n📁 {row['store']} ({row['type']}, {row['vectors']} vectors, currently {row['current']})")
+        for codec, result in row["settings"].items():
+            label = codec if result["built_as"] == codec else f"{codec}->{result['built_as']}"
+            print(f"   {label:>9}: {result['bytes'] / 1024:10.1f} KiB  recall@{k} {result['recall']:.3f}  reranked {result['recall_reranked']:.3f}")
+            totals = by_branch.setdefault(row["branch"], {}).setdefault(codec, {"bytes": 0, "recall": [], "reranked": []})
+            totals["bytes"] += result["bytes"]
+            totals["recall"].append(result["recall"])
+            totals["reranked"].append(result["recall_reranked"])
+
+    for branch, codecs in by_branch.items():
+        print(f"\n📊 Branch {branch}")
+        for codec, totals in codecs.items():
+            print(
+                f"   {codec:>9}: {totals['bytes'] / 1024:10.1f} KiB  mean recall@{k} {np.mean(totals['recall']):.3f}"
+                f"  reranked {np.mean(totals['reranked']):.3f}"
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert vector store indexes to the configured ANN policy")
+    parser.add_argument("command", choices=["migrate", "report"])
+    parser.add_argument("root", nargs="?", default="vector_store")
+    parser.add_argument("--type", choices=["flat", "ivf", "hnsw"], help="force an index type instead of the policy")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    parser.add_argument("--compression", default="none,sq8,fp16,pq", help="report: comma-separated settings to compare")
+    parser.add_argument("--k", type=int, default=5, help="report: recall@k")
+    parser.add_argument("--queries", type=int, default=200, help="report: sampled queries per store")
+    parser.add_argument("--json", action="store_true", help="report: print JSON instead of a table")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        rows = compression_report(args.root, args.compression.split(","), k=args.k, n_queries=args.queries)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            print_compression_report(rows, args.k)
+        return True
+
+    report = migrate(args.root, kind=args.type, dry_run=args.dry_run)
+    print(f"\n📊 Converted: {report['converted']}, unchanged: {report['unchanged']}, failed: {report['failed']}")
+    return report["failed"] == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,43 @@
+# array_file.py - Rows appended to .npy files in place, for store files that only ever grow
+import io
+import os
+import numpy as np
+from numpy.lib import format as npy_format
+
+def append_rows(path: str, rows: np.ndarray, start: int) -> bool:
+    """Keep the first start rows of the .npy file at path and write rows after them
+
+    The rows go in before the header's shape is updated, and the file is cut to
+    length last, so a reader opening it at any moment finds a shape the file covers.
+    Returns False without writing when the file is missing, holds fewer than start
+    rows, has another dtype or row shape, or its header can't be rewritten in place;
+    the caller then writes the whole file.
+    """
+    rows = np.ascontiguousarray(rows)
+    if not os.path.exists(path):
+        return False
+    with open(path, "r+b") as f:
+        if npy_format.read_magic(f) != (1, 0):  # what np.save writes for plain arrays
+            return False
+        shape, fortran_order, dtype = npy_format.read_array_header_1_0(f)
+        header_size = f.tell()
+        if not shape or fortran_order or dtype != rows.dtype or tuple(shape[1:]) != rows.shape[1:] or shape[0] < start:
+            return False
+        header = io.BytesIO()
+        npy_format.write_array_header_1_0(header, {
+            "descr": npy_format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (start + len(rows),) + tuple(shape[1:])
+        })
+        # numpy pads headers so the row count can grow in place; a file written without that padding is rewritten
+        if len(header.getvalue()) != header_size:
+            return False
+
+        row_bytes = dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64))
+        f.seek(header_size + start * row_bytes)
+        f.write(rows.tobytes())
+        f.flush()
+        f.seek(0)
+        f.write(header.getvalue())
+        f.truncate(header_size + (start + len(rows)) * row_bytes)
+    return True
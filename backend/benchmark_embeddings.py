@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark for handing embeddings to FAISS
+Compares the list path (encoder array -> .tolist() -> FAISS.add_embeddings) with
+passing the float32 array straight to the index, for ingestion batches and queries
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from retriever import _add_vectors
+
+class _Precomputed(Embeddings):
+    """Embeddings looked up from the vectors the simulated encoder already produced"""
+
+    def __init__(self, docs, encoded):
+        self.vectors = {doc.page_content: vector for doc, vector in zip(docs, encoded)}
+
+    def embed_documents(self, texts):
+        return [self.vectors[text].tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text].tolist()
+
+def _empty_store(embeddings, dim):
+    return FAISS(
+        embedding_function=embeddings,
+        index=faiss.IndexFlatIP(dim),
+        docstore=InMemoryDocstore({}),
+        index_to_docstore_id={}
+    )
+
+def ingest_lists(encoded, docs, embeddings):
+    """What ingestion did before: nested float lists, re-read into an array by iter_batches, then pairs for LangChain"""
+    db = _empty_store(embeddings, encoded.shape[1])
+    vectors = np.asarray(encoded.tolist(), dtype=np.float32)
+    db.add_embeddings(list(zip((doc.page_content for doc in docs), vectors)), metadatas=[doc.metadata for doc in docs])
+    return db
+
+def ingest_arrays(encoded, docs, embeddings):
+    db = _empty_store(embeddings, encoded.shape[1])
+    _add_vectors(db, docs, np.asarray(encoded, dtype=np.float32))
+    return db
+
+def query_lists(index, queries, k):
+    for query in queries:
+        index.search(np.array([query.tolist()], dtype=np.float32), k)
+
+def query_arrays(index, queries, k):
+    for query in queries:
+        index.search(query.reshape(1, -1), k)
+
+def measure(fn, repeat):
+    """Best wall time of repeat runs and the peak memory Python allocated during one"""
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start_time)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 1024 / 1024
+
+def report(label, lists, arrays):
+    (list_time, list_mb), (array_time, array_mb) = lists, arrays
+    print(f"   {label}")
+    print(f"      lists : {list_time * 1000:9.1f} ms  peak {list_mb:8.1f} MB")
+    print(f"      arrays: {array_time * 1000:9.1f} ms  peak {array_mb:8.1f} MB  x{list_time / max(array_time, 1e-9):.1f} faster")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the list and array paths from encoder output to FAISS")
+    parser.add_argument("--chunks", type=int, default=20000, help="chunks in the simulated upload")
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    print("🚀 Starting Embedding Path Benchmark")
+    rng = np.random.default_rng(0)
+    encoded = rng.normal(size=(args.chunks, args.dim)).astype(np.float32)  # what the encoder returns
+    docs = [Document(page_content=f"chunk {i}", metadata={"source": "bench.pdf"}) for i in range(args.chunks)]
+
+    print(f"\n📥 Ingesting {args.chunks} x {args.dim} embeddings (best of {args.repeat}):")
+    embeddings = _Precomputed(docs, encoded)
+    report(
+        "add to index",
+        measure(lambda: ingest_lists(encoded, docs, embeddings), args.repeat),
+        measure(lambda: ingest_arrays(encoded, docs, embeddings), args.repeat)
+    )
+
+    # A small index keeps the search itself from hiding the per-query conversion
+    index = ingest_arrays(encoded[:1000], docs[:1000], embeddings).index
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    print(f"\n🔍 {args.queries} single-query searches over 1000 vectors:")
+    report("search", measure(lambda: query_lists(index, queries, 5), args.repeat), measure(lambda: query_arrays(index, queries, 5), args.repeat))
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
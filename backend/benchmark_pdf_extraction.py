@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark for PDF text extraction
+Compares extractor backends (pages/sec, peak memory) and the serial page loop
+with page-parallel extraction over a process pool
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pdf_extract import extract_pages, page_count, available_backends, EXTRACTORS, _extract_range
+
+def find_pdfs(paths):
+    """PDF files given directly or found under the given directories"""
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                pdfs.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".pdf"))
+        elif path.lower().endswith(".pdf"):
+            pdfs.append(path)
+    return pdfs
+
+def time_extraction(extract, repeat):
+    """Best wall time of repeat runs, and the pages of the last one"""
+    best = float("inf")
+    pages = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        pages = extract()
+        best = min(best, time.perf_counter() - start_time)
+    return best, pages
+
+def _peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+def measure_backend(backend, pdfs, repeat):
+    """Serial extraction of the corpus with one backend; runs in a fresh process so peak memory is its own"""
+    EXTRACTORS[backend].page_count(pdfs[0])  # import the library before taking the baseline
+    baseline_mb = _peak_rss_mb()
+    result = {"backend": backend, "pages": 0, "seconds": 0.0, "chars": 0, "failed": []}
+    for pdf in pdfs:
+        try:
+            seconds, pages = time_extraction(lambda: _extract_range(pdf, 0, page_count(pdf, backend), backend), repeat)
+            result["pages"] += page_count(pdf, backend)
+            result["seconds"] += seconds
+            result["chars"] += sum(len(text) for _, text in pages)
+        except Exception as e:
+            result["failed"].append(f"{os.path.basename(pdf)}: {e}")
+    result["peak_mb"] = _peak_rss_mb() - baseline_mb
+    return result
+
+def benchmark_backends(pdfs, backends, repeat):
+    print(f"\n🔌 Backends on {len(pdfs)} PDFs (serial, best of {repeat}):")
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(measure_backend, backend, pdfs, repeat).result()
+        results.append(result)
+        print(
+            f"   {backend:10s}: {result['pages'] / max(result['seconds'], 1e-9):8.1f} pages/s"
+            f"  {result['seconds']:7.3f}s  peak +{result['peak_mb']:6.1f} MB  {result['chars']} chars"
+        )
+        for failure in result["failed"]:
+            print(f"      ❌ {failure}")
+    return results
+
+def benchmark_workers(pdfs, worker_counts, repeat, backend=None):
+    totals = {"serial": [0, 0.0], **{w: [0, 0.0] for w in worker_counts}}
+    for pdf in pdfs:
+        n_pages = page_count(pdf, backend)
+        print(f"\n📄 {os.path.basename(pdf)} ({n_pages} pages)")
+
+        serial_time, serial_pages = time_extraction(lambda: _extract_range(pdf, 0, n_pages, backend), repeat)
+        totals["serial"][0] += n_pages
+        totals["serial"][1] += serial_time
+        print(f"   serial    : {serial_time:7.3f}s  {n_pages / serial_time:8.1f} pages/s")
+
+        for workers in worker_counts:
+            extract_pages(pdf, workers=workers, min_pages=0, backend=backend)  # warm-up: starts the pool
+            parallel_time, parallel_pages = time_extraction(
+                lambda: extract_pages(pdf, workers=workers, min_pages=0, backend=backend), repeat
+            )
+            totals[workers][0] += n_pages
+            totals[workers][1] += parallel_time
+            same = "✅" if parallel_pages == serial_pages else "❌ output differs"
+            print(
+                f"   {workers:2d} workers: {parallel_time:7.3f}s  {n_pages / parallel_time:8.1f} pages/s"
+                f"  x{serial_time / parallel_time:.2f} {same}"
+            )
+
+    print(f"\n📊 Total over {len(pdfs)} PDFs:")
+    for name, (n_pages, seconds) in totals.items():
+        label = "serial    " if name == "serial" else f"{name:2d} workers"
+        print(f"   {label}: {seconds:7.3f}s  {n_pages / max(seconds, 1e-9):8.1f} pages/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction backends and page-parallel extraction")
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--backends", default=",".join(available_backends()), help="comma-separated backends to compare")
+    parser.add_argument("--backend", help="backend for the worker comparison (default: PDF_EXTRACT_BACKEND)")
+    parser.add_argument("--workers", default="2,4", help="comma-separated worker counts, empty to skip")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    pdfs = find_pdfs(args.paths)
+    if not pdfs:
+        print("❌ No PDFs found")
+        return False
+
+    print("🚀 Starting PDF Extraction Benchmark")
+    backends = [b for b in args.backends.split(",") if b]
+    missing = [b for b in backends if b not in available_backends()]
+    if missing:
+        print(f"⚠️ Not installed, skipped: {', '.join(missing)}")
+    benchmark_backends(pdfs, [b for b in backends if b not in missing], args.repeat)
+    if args.workers:
+        benchmark_workers(pdfs, [int(w) for w in args.workers.split(",")], args.repeat, args.backend)
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,155 @@
+# chunk_store.py - Compact on-disk chunk texts and metadata, read lazily through mmap
+import os
+import sys
+import json
+import mmap
+import pickle
+import argparse
+from collections.abc import Mapping
+from typing import Iterable, Iterator, Union
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from array_file import append_rows
+
+# 📦 Layout: one JSON record [text, metadata] per chunk, in FAISS id order, plus byte offsets
+CHUNKS_FILE = "chunks.jsonl"
+OFFSETS_FILE = "chunks.offsets.npy"
+
+def has_chunk_store(store_dir: str) -> bool:
+    return os.path.exists(os.path.join(store_dir, OFFSETS_FILE))
+
+def write_chunk_store(store_dir: str, docs: Iterable[Document]) -> int:
+    """Write chunk records in FAISS id order; the offsets file is renamed into place last"""
+    chunks_path = os.path.join(store_dir, CHUNKS_FILE)
+    offsets_path = os.path.join(store_dir, OFFSETS_FILE)
+    suffix = f".{os.getpid()}.tmp"
+    offsets = [0]
+    with open(chunks_path + suffix, "wb") as f:
+        for doc in docs:
+            record = json.dumps([doc.page_content, doc.metadata], ensure_ascii=False).encode() + b"\n"
+            f.write(record)
+            offsets.append(offsets[-1] + len(record))
+    with open(offsets_path + suffix, "wb") as f:
+        np.save(f, np.asarray(offsets, dtype=np.uint64))
+
+    # Records are only ever appended, so offsets already on disk stay valid for the new chunks file
+    os.replace(chunks_path + suffix, chunks_path)
+    os.replace(offsets_path + suffix, offsets_path)
+    return len(offsets) - 1
+
+def append_chunk_store(store_dir: str, docs: Iterable[Document], start: int) -> bool:
+    """Write chunk records after the first start ones, in place, without rewriting those
+
+    Records past start (left by an interrupted append) are overwritten. The offsets
+    grow after the records they point at. Returns False when the store holds fewer
+    than start records or its offsets can't grow in place; write_chunk_store then.
+    """
+    chunks_path = os.path.join(store_dir, CHUNKS_FILE)
+    offsets_path = os.path.join(store_dir, OFFSETS_FILE)
+    if not has_chunk_store(store_dir) or not os.path.exists(chunks_path):
+        return False
+    offsets = np.load(offsets_path, mmap_mode="r")
+    if len(offsets) <= start:
+        return False
+    end = int(offsets[start])
+    del offsets
+    new_offsets = []
+    with open(chunks_path, "r+b") as f:
+        f.seek(end)
+        for doc in docs:
+            record = json.dumps([doc.page_content, doc.metadata], ensure_ascii=False).encode() + b"\n"
+            f.write(record)
+            end += len(record)
+            new_offsets.append(end)
+        f.truncate()
+    return append_rows(offsets_path, np.asarray(new_offsets, dtype=np.uint64), start + 1)
+
+class ChunkStore(Docstore):
+    """Read-only docstore over chunks.jsonl; a Document is built only when a search hit asks for it
+
+    Ids are FAISS positions as strings (see PositionalIds). The files are memory-mapped,
+    so every worker process serving the same store shares one copy in the page cache.
+    """
+
+    def __init__(self, store_dir: str):
+        # Offsets first: chunks.jsonl is always at least as new as the offsets read
+        self.offsets = np.load(os.path.join(store_dir, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(store_dir, CHUNKS_FILE), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return max(0, len(self.offsets) - 1)
+
+    def get(self, position: int) -> Document:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        text, metadata = json.loads(self._data[start:end])
+        return Document(page_content=text, metadata=metadata)
+
+    def search(self, search: str) -> Union[str, Document]:
+        try:
+            position = int(search)
+            if not 0 <= position < len(self):
+                raise IndexError(position)
+            return self.get(position)
+        except (ValueError, IndexError):
+            return f"ID {search} not found."
+
+    def __iter__(self) -> Iterator[Document]:
+        for position in range(len(self)):
+            yield self.get(position)
+
+class PositionalIds(Mapping):
+    """index_to_docstore_id for a ChunkStore: FAISS position i maps to id str(i)"""
+
+    def __init__(self, n: int):
+        self.n = n
+
+    def __getitem__(self, i):
+        if not 0 <= int(i) < self.n:
+            raise KeyError(i)
+        return str(int(i))
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return iter(range(self.n))
+
+# 🛠️ Conversion of existing index.pkl stores
+def convert(root: str) -> dict:
+    """Write a chunk store next to every index.pkl under root that lacks one"""
+    report = {"converted": 0, "skipped": 0, "failed": 0}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        if "index.pkl" not in files:
+            continue
+        if has_chunk_store(dirpath):
+            report["skipped"] += 1
+            continue
+        try:
+            with open(os.path.join(dirpath, "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            n = write_chunk_store(
+                dirpath, (docstore.search(index_to_docstore_id[i]) for i in range(len(index_to_docstore_id)))
+            )
+            print(f"✅ {dirpath}: {n} chunks")
+            report["converted"] += 1
+        except Exception as e:
+            print(f"❌ {dirpath}: {e}")
+            report["failed"] += 1
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Write compact chunk stores for existing vector stores")
+    parser.add_argument("command", choices=["convert"])
+    parser.add_argument("root", nargs="?", default="vector_store")
+    args = parser.parse_args()
+
+    report = convert(args.root)
+    print(f"\n📊 Converted: {report['converted']}, skipped: {report['skipped']}, failed: {report['failed']}")
+    return report["failed"] == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,198 @@
+# embedding_cache.py - Persistent content-addressed embedding store
+import os
+import re
+import json
+import hashlib
+import threading
+import logging
+from typing import Callable, Dict, List
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 💾 Cache configuration
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")  # float32 | float16
+DIGEST_SIZE = 20  # sha1
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so re-extracted text with different spacing hashes the same"""
+    return " ".join(text.split())
+
+def content_hash(text: str) -> str:
+    """sha1 hex digest of a chunk's normalized text"""
+    return hashlib.sha1(normalize_text(text).encode()).hexdigest()
+
+class EmbeddingStore:
+    """Embeddings keyed by (model name, chunk hash) in an append-only, memory-mapped file
+
+    Layout per model: vectors.bin holds fixed-size rows, keys.bin holds the 20-byte
+    digest of each row in the same order, meta.json records dimension and dtype.
+    """
+
+    def __init__(self, model_name: str, root: str = EMBEDDING_CACHE_DIR, dtype: str = EMBEDDING_CACHE_DTYPE):
+        self.model_name = model_name
+        self.dir = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self._lock = threading.RLock()
+        self._rows = {}        # digest -> row number
+        self._keys_offset = 0  # bytes of keys.bin already read
+        self._vectors = None   # read-only np.memmap over the valid rows
+        self.metrics = {"hits": 0, "misses": 0, "writes": 0}
+
+    @property
+    def _keys_path(self):
+        return os.path.join(self.dir, "keys.bin")
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.dir, "vectors.bin")
+
+    def _load_meta(self):
+        meta_path = os.path.join(self.dir, "meta.json")
+        if self.dim is None and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self.dtype = np.dtype(meta["dtype"])  # the file's dtype wins over the configured one
+
+    def _refresh(self):
+        """Pick up rows appended since the last read, including ones written by other processes"""
+        self._load_meta()
+        if self.dim is None:
+            return
+        try:
+            keys_size = os.path.getsize(self._keys_path)
+        except OSError:
+            return
+        if keys_size == self._keys_offset:
+            return
+
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read(keys_size - self._keys_offset)
+        row = self._keys_offset // DIGEST_SIZE
+        for i in range(0, len(data) - DIGEST_SIZE + 1, DIGEST_SIZE):
+            self._rows.setdefault(data[i:i + DIGEST_SIZE], row)
+            row += 1
+        self._keys_offset += (len(data) // DIGEST_SIZE) * DIGEST_SIZE
+
+        if row:
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(row, self.dim))
+
+    def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Look up cached vectors (as float32) for the given chunk hashes"""
+        found = {}
+        with self._lock:
+            self._refresh()
+            for h in hashes:
+                row = self._rows.get(bytes.fromhex(h))
+                if row is not None:
+                    found[h] = np.asarray(self._vectors[row], dtype=np.float32)
+        self.metrics["hits"] += len(found)
+        self.metrics["misses"] += len(hashes) - len(found)
+        return found
+
+    def put_many(self, hashes: List[str], vectors: np.ndarray):
+        """Append vectors for new chunk hashes"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(os.path.join(self.dir, "write.lock"), "w") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+                if self.dim is None:
+                    self._load_meta()
+                if self.dim is None:
+                    self.dim = vectors.shape[1]
+                    with open(os.path.join(self.dir, "meta.json"), "w") as f:
+                        json.dump({"model": self.model_name, "dim": self.dim, "dtype": self.dtype.name}, f)
+                self._refresh()
+
+                new_rows = {}
+                for h, vector in zip(hashes, vectors):
+                    digest = bytes.fromhex(h)
+                    if digest not in self._rows and digest not in new_rows:
+                        new_rows[digest] = vector
+                if not new_rows:
+                    return
+
+                # Vectors first, keys last: a row only counts once its key is on disk.
+                # Truncating to the key count drops rows left by a writer that died mid-append.
+                row_bytes = self.dim * self.dtype.itemsize
+                n_rows = self._keys_offset // DIGEST_SIZE
+                mode = "r+b" if os.path.exists(self._vectors_path) else "w+b"
+                with open(self._vectors_path, mode) as f:
+                    f.truncate(n_rows * row_bytes)
+                    f.seek(n_rows * row_bytes)
+                    f.write(np.asarray(list(new_rows.values()), dtype=self.dtype).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(self._keys_path, "ab") as f:
+                    f.write(b"".join(new_rows.keys()))
+
+                self.metrics["writes"] += len(new_rows)
+                self._refresh()
+
+    def embed(self, texts: List[str], embed_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Embed texts, computing only the ones missing from the cache"""
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        hashes = [content_hash(text) for text in texts]
+        found = self.get_many(hashes)
+        missing = list(dict.fromkeys(h for h in hashes if h not in found))
+        if missing:
+            first_text = {}
+            for h, text in zip(hashes, texts):
+                first_text.setdefault(h, text)
+            computed = np.asarray(embed_fn([first_text[h] for h in missing]), dtype=np.float32)
+            try:
+                self.put_many(missing, computed)
+            except Exception as e:
+                logger.warning(f"Could not persist embeddings: {e}")
+            if len(missing) == len(hashes):
+                return computed  # every text new and distinct: already in order, no row-by-row copy
+            found.update(zip(missing, computed))
+
+        return np.vstack([found[h] for h in hashes]).astype(np.float32, copy=False)
+
+    def clear(self):
+        """Drop the in-memory key map and mapping; the on-disk store is kept"""
+        with self._lock:
+            self._rows = {}
+            self._keys_offset = 0
+            self._vectors = None
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def stats(self) -> Dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "model": self.model_name,
+            "dtype": self.dtype.name,
+            "entries": len(self),
+            "hit_rate": self.metrics["hits"] / max(1, lookups)
+        }
+
+# 🚀 One store per model
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_embedding_store(model_name: str) -> EmbeddingStore:
+    """Get the shared embedding store for a model (files are opened lazily)"""
+    with _stores_lock:
+        if model_name not in _stores:
+            _stores[model_name] = EmbeddingStore(model_name)
+        return _stores[model_name]
@@ -0,0 +1,328 @@
+# index_catalog.py - In-memory catalog of vector store indexes
+import os
+import json
+import struct
+import threading
+import time
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 🗂️ Catalog configuration
+VECTOR_STORE_DIR = "vector_store"
+CATALOG_FILE = "catalog.json"
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "10"))
+SEMESTER_INDEX_DIR = "_semester"
+
+def read_index_ntotal(index_path: str) -> int:
+    """Read the vector count from a FAISS index header without loading the index"""
+    # Every FAISS index starts with a 4-byte type tag, int32 dimension and int64 ntotal
+    with open(index_path, "rb") as f:
+        header = f.read(16)
+    if len(header) < 16:
+        return 0
+    return struct.unpack("<q", header[8:16])[0]
+
+class IndexCatalog:
+    """Maps branch/year/semester/subject to index paths, chunk counts, sizes and versions"""
+
+    def __init__(self, root: str = VECTOR_STORE_DIR, catalog_path: Optional[str] = None):
+        self.root = root
+        self.catalog_path = catalog_path or os.path.join(root, CATALOG_FILE)
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()  # one filesystem walk at a time; lookups don't wait for it
+        self._changes = 0    # bumped by every write to _tree, so a walk can tell it went stale
+        self._tree = {}      # branch -> year -> semester -> semester record
+        self._listings = {}  # directory -> [mtime, [[name, is_dir], ...]]
+        self._catalog_mtime = 0.0
+        self._watcher = None
+        self._stop = threading.Event()
+        self.metrics = {"refreshes": 0, "directory_listings": 0, "reloads": 0, "saves": 0}
+
+    # 📂 Persistence
+    def load(self) -> bool:
+        """Load the persisted catalog from disk"""
+        try:
+            with open(self.catalog_path) as f:
+                data = json.load(f)
+            with self._lock:
+                self._tree = data.get("tree", {})
+                self._listings = data.get("listings", {})
+                self._changes += 1
+                self._catalog_mtime = os.path.getmtime(self.catalog_path)
+            self.metrics["reloads"] += 1
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Could not load index catalog: {e}")
+            return False
+
+    def save(self):
+        """Persist the catalog atomically"""
+        with self._lock:
+            data = json.dumps({"tree": self._tree, "listings": self._listings, "saved_at": time.time()})
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{self.catalog_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, self.catalog_path)
+            self._catalog_mtime = os.path.getmtime(self.catalog_path)
+            self.metrics["saves"] += 1
+        except Exception as e:
+            logger.warning(f"Could not save index catalog: {e}")
+
+    # 🔄 Refresh from the filesystem
+    def _entries(self, path: str) -> Optional[List[list]]:
+        """List a directory, reusing the previous listing while its mtime is unchanged"""
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        cached = self._listings.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        entries = sorted([entry.name, entry.is_dir()] for entry in os.scandir(path))
+        self._listings[path] = [mtime, entries]
+        self.metrics["directory_listings"] += 1
+        return entries
+
+    def _subdirs(self, path: str) -> List[str]:
+        return [name for name, is_dir in self._entries(path) or [] if is_dir]
+
+    def _subject_record(self, subject_dir: str, previous: Optional[dict]) -> dict:
+        """Build a subject record, reusing the previous one while the index file is unchanged"""
+        files = [name for name, is_dir in self._entries(subject_dir) or [] if not is_dir]
+        index_path = os.path.join(subject_dir, "index.faiss")
+        record = {
+            "path": subject_dir,
+            "index_path": None,
+            "chunks": 0,
+            "bytes": 0,
+            "version": previous["version"] if previous else 0,
+            "mtime": 0.0,
+            "pdfs": [name for name in files if name.lower().endswith(".pdf")]
+        }
+        if "index.faiss" not in files:
+            return record
+
+        stat = os.stat(index_path)
+        record["index_path"] = index_path
+        record["mtime"] = stat.st_mtime
+        record["bytes"] = sum(
+            os.path.getsize(os.path.join(subject_dir, name))
+            for name in files if not name.lower().endswith(".pdf")
+        )
+        if previous and previous.get("mtime") == stat.st_mtime:
+            record["chunks"] = previous["chunks"]
+        else:
+            record["chunks"] = read_index_ntotal(index_path)
+            record["version"] += 1
+        return record
+
+    def _semester_record(self, semester_dir: str, previous: Optional[dict]) -> dict:
+        previous_subjects = previous["subjects"] if previous else {}
+        record = {"path": semester_dir, "semester_index": None, "pdfs": [], "subjects": {}}
+        for name, is_dir in self._entries(semester_dir) or []:
+            child = os.path.join(semester_dir, name)
+            if not is_dir:
+                if name.lower().endswith(".pdf"):
+                    record["pdfs"].append(name)
+            elif name == SEMESTER_INDEX_DIR:
+                if os.path.exists(os.path.join(child, "index.faiss")):
+                    record["semester_index"] = child
+            elif not name.startswith("_"):
+                record["subjects"][name] = self._subject_record(child, previous_subjects.get(name))
+        return record
+
+    def _walk(self, old_tree: dict) -> dict:
+        tree = {}
+        for branch in self._subdirs(self.root):
+            branch_dir = os.path.join(self.root, branch)
+            for year in self._subdirs(branch_dir):
+                year_dir = os.path.join(branch_dir, year)
+                for semester in self._subdirs(year_dir):
+                    previous = old_tree.get(branch, {}).get(year, {}).get(semester)
+                    tree.setdefault(branch, {}).setdefault(year, {})[semester] = self._semester_record(
+                        os.path.join(year_dir, semester), previous
+                    )
+                tree.setdefault(branch, {}).setdefault(year, {})
+            tree.setdefault(branch, {})
+        return tree
+
+    def refresh(self) -> bool:
+        """Re-stat the vector store tree and re-list only directories whose mtime changed
+
+        The walk runs outside the lookup lock and its result is swapped in; if an
+        ingestion updated the catalog meanwhile, the walk is redone from that state.
+        """
+        changed = False
+        with self._refresh_lock:
+            for _ in range(3):  # still racing with ingestion after that: the next refresh catches up
+                with self._lock:
+                    old_tree, changes = self._tree, self._changes
+                tree = self._walk(old_tree)
+                gone = {path for path in list(self._listings) if not os.path.isdir(path)}
+                with self._lock:
+                    if self._changes != changes:
+                        continue
+                    # Drop listings for directories that no longer exist
+                    self._listings = {path: listing for path, listing in self._listings.items() if path not in gone}
+                    changed = tree != old_tree
+                    self._tree = tree
+                    self._changes += 1
+                    self.metrics["refreshes"] += 1
+                    break
+
+        if changed:
+            self.save()
+        return changed
+
+    def update_subject(self, store_dir: str, chunks: Optional[int] = None):
+        """Record a freshly written subject index (called on ingestion)"""
+        keys = self._keys(store_dir, depth=4)
+        if keys is None:
+            return
+        branch, year, semester, subject = keys
+        with self._lock:
+            semester_dir = os.path.dirname(os.path.normpath(store_dir))
+            semesters = self._tree.setdefault(branch, {}).setdefault(year, {})
+            record = semesters.get(semester) or {"path": semester_dir, "semester_index": None, "pdfs": [], "subjects": {}}
+            self._listings.pop(store_dir, None)
+            previous = record["subjects"].get(subject)
+            subject_record = self._subject_record(store_dir, previous)
+            if chunks is not None:
+                subject_record["chunks"] = chunks
+            if previous and previous.get("mtime") == subject_record["mtime"]:
+                subject_record["version"] += 1
+            # Copy-on-write so concurrent readers never see a half-updated record
+            semesters[semester] = {**record, "subjects": {**record["subjects"], subject: subject_record}}
+            self._changes += 1
+        self.save()
+
+    def update_semester_index(self, semester_dir: str):
+        """Record a rebuilt unified semester index"""
+        keys = self._keys(semester_dir, depth=3)
+        if keys is None:
+            return
+        branch, year, semester = keys
+        index_dir = os.path.join(semester_dir, SEMESTER_INDEX_DIR)
+        with self._lock:
+            semesters = self._tree.setdefault(branch, {}).setdefault(year, {})
+            record = semesters.get(semester) or {"path": semester_dir, "semester_index": None, "pdfs": [], "subjects": {}}
+            semesters[semester] = {
+                **record,
+                "semester_index": index_dir if os.path.exists(os.path.join(index_dir, "index.faiss")) else None
+            }
+            self._changes += 1
+        self.save()
+
+    # 👀 mtime watcher
+    def _reload_if_changed(self):
+        """Pick up catalog writes made by other worker processes"""
+        try:
+            mtime = os.path.getmtime(self.catalog_path)
+        except OSError:
+            return
+        if mtime != self._catalog_mtime:
+            self.load()
+
+    def _watch(self):
+        while not self._stop.wait(CATALOG_REFRESH_SECONDS):
+            try:
+                self._reload_if_changed()
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Index catalog refresh failed: {e}")
+
+    def start_watcher(self):
+        """Start the background thread that keeps the catalog in step with the filesystem"""
+        if self._watcher is None or not self._watcher.is_alive():
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="index-catalog-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    # 🔎 Lookups (in-memory only, no filesystem access)
+    def _keys(self, path: str, depth: int) -> Optional[tuple]:
+        """Split a path below the catalog root into its branch/year/semester[/subject] keys"""
+        rel = os.path.relpath(os.path.abspath(path), os.path.abspath(self.root))
+        parts = rel.split(os.sep)
+        if rel.startswith("..") or len(parts) != depth:
+            return None
+        return tuple(parts)
+
+    def semester(self, semester_dir: str) -> Optional[dict]:
+        """Semester record for a path, or None if it is outside the catalog root or not catalogued yet
+
+        A semester created since the last refresh is only on disk, so callers check there
+        on None rather than miss it until the watcher catches up.
+        """
+        keys = self._keys(semester_dir, depth=3)
+        if keys is None:
+            return None
+        branch, year, semester = keys
+        with self._lock:
+            return self._tree.get(branch, {}).get(year, {}).get(semester)
+
+    def subject_dirs(self, semester_dir: str) -> Optional[List[str]]:
+        """Subject directories holding an index, or None if the semester isn't catalogued"""
+        record = self.semester(semester_dir)
+        if record is None:
+            return None
+        return [s["path"] for s in record["subjects"].values() if s["index_path"]]
+
+    def has_materials(self, semester_dir: str) -> Optional[bool]:
+        """Whether a semester has PDFs or subject indexes, or None if it isn't catalogued"""
+        record = self.semester(semester_dir)
+        if record is None:
+            return None
+        return bool(record["pdfs"]) or any(s["index_path"] for s in record["subjects"].values())
+
+    def list_subjects(self, branch: str, year: str, semester: str) -> Optional[List[str]]:
+        """Subject names for a semester, or None if the semester is unknown"""
+        with self._lock:
+            record = self._tree.get(branch, {}).get(year, {}).get(semester)
+        return sorted(record["subjects"]) if record else None
+
+    def list_branches(self) -> List[str]:
+        with self._lock:
+            return sorted(self._tree)
+
+    def stats(self) -> Dict:
+        """Catalog size and refresh counters"""
+        with self._lock:
+            subjects = [
+                s for years in self._tree.values() for semesters in years.values()
+                for record in semesters.values() for s in record["subjects"].values()
+            ]
+        return {
+            **self.metrics,
+            "subjects": len(subjects),
+            "indexed_subjects": sum(1 for s in subjects if s["index_path"]),
+            "total_chunks": sum(s["chunks"] for s in subjects),
+            "total_bytes": sum(s["bytes"] for s in subjects)
+        }
+
+# 🚀 Process-wide catalog
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog() -> IndexCatalog:
+    """Get the shared catalog, loading it from disk and starting its watcher on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                catalog = IndexCatalog()
+                catalog.load()
+                catalog.refresh()
+                catalog.start_watcher()
+                _catalog = catalog
+    return _catalog
@@ -0,0 +1,308 @@
+# ingest_pipeline.py - Streaming PDF ingestion: pages -> sections -> chunks -> embedding batches
+import os
+import re
+import time
+import queue
+import threading
+import logging
+from itertools import chain, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from embedding_cache import content_hash
+from pdf_extract import iter_pages
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Pipeline configuration
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))                # items buffered between stages
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))             # chunks per embedding call
+INGEST_MAX_SECTION_CHARS = int(os.getenv("INGEST_MAX_SECTION_CHARS", "200000"))  # longer sections are split in parts
+INGEST_SECTION_LOOKAHEAD = int(os.getenv("INGEST_SECTION_LOOKAHEAD", "32"))  # lines scanned to pick a heading style
+
+# Heading styles in order of preference; the first one found in the lookahead is used for the document
+HEADING_PATTERNS = [
+    r'\d+(?:\.\d+)*\s+[^\n]+',  # Numbered sections
+    r'[A-Z][^:\n]+:',           # Title sections
+    r'[A-Z][^.\n]+\.',          # Sentence titles
+    r'[A-Z][^?\n]+\?',          # Question titles
+]
+MIN_SECTION_CHARS = 50
+
+# 📊 Per-stage throughput counters (seconds exclude time spent waiting on the previous stage)
+PIPELINE_METRICS = {}
+_metrics_lock = threading.Lock()
+
+def _record(stage: str, items: int, seconds: float):
+    with _metrics_lock:
+        metrics = PIPELINE_METRICS.setdefault(stage, {"items": 0, "seconds": 0.0, "runs": 0})
+        metrics["items"] += items
+        metrics["seconds"] += seconds
+
+def get_pipeline_metrics() -> Dict:
+    with _metrics_lock:
+        return {
+            stage: {**metrics, "items_per_sec": metrics["items"] / max(metrics["seconds"], 1e-9)}
+            for stage, metrics in PIPELINE_METRICS.items()
+        }
+
+# 🧵 Bounded hand-off between stages
+_DONE = object()
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+class _QueueReader:
+    """Iterator over a bounded queue filled by a stage thread; tracks how long the reader waited
+
+    Ends when the run is stopped too, since a stopped stage never sends _DONE.
+    """
+
+    def __init__(self, items: queue.Queue, stop: threading.Event):
+        self._items = items
+        self._stop = stop
+        self.wait = 0.0
+
+    def __iter__(self):
+        while True:
+            start = time.perf_counter()
+            try:
+                item = self._items.get(timeout=0.1)
+            except queue.Empty:
+                item = None
+            self.wait += time.perf_counter() - start
+            if item is None:
+                if self._stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+def _put(items: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def run_stage(
+    name: str,
+    stage: Iterable,
+    stop: threading.Event,
+    upstream: Optional[_QueueReader] = None,
+    maxsize: int = INGEST_QUEUE_SIZE
+) -> _QueueReader:
+    """Run a generator stage in its own thread, handing items on through a bounded queue
+
+    The stage blocks once maxsize items wait downstream, so a slow consumer holds
+    back everything before it instead of letting work pile up in memory.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    with _metrics_lock:
+        PIPELINE_METRICS.setdefault(name, {"items": 0, "seconds": 0.0, "runs": 0})["runs"] += 1
+
+    def produce():
+        try:
+            iterator = iter(stage)
+            while not stop.is_set():
+                waited = upstream.wait if upstream else 0.0
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                _record(name, 1, time.perf_counter() - start - ((upstream.wait if upstream else 0.0) - waited))
+                if not _put(items, item, stop):
+                    return
+            _put(items, _DONE, stop)
+        except BaseException as e:
+            _put(items, _Failure(e), stop)
+
+    threading.Thread(target=produce, name=f"ingest-{name}", daemon=True).start()
+    return _QueueReader(items, stop)
+
+# 📑 Stages
+def iter_sections(
+    pages: Iterable[Tuple[int, str]],
+    lookahead: int = INGEST_SECTION_LOOKAHEAD,
+    max_chars: int = INGEST_MAX_SECTION_CHARS
+) -> Iterator[dict]:
+    """Sections of a page stream, as extract_sections finds them in the joined text
+
+    A heading is a whole line matching the document's heading style, not directly
+    after another heading; text before the first heading is dropped. Without any
+    heading in the lookahead the document is one "Full Document" section. Sections
+    longer than max_chars are emitted in parts so no section is held whole.
+    """
+    lines = ((number, line) for number, text in pages for line in text.split("\n"))
+    window = list(islice(lines, lookahead))
+    # The last line can't be a heading: a heading needs the line break after it
+    pattern = next((p for p in HEADING_PATTERNS if any(re.fullmatch(p, line) for _, line in window[:-1])), None)
+
+    title = None if pattern else "Full Document"
+    parts = []       # (page, line) of the current section
+    size = 0
+    previous_heading = False
+
+    def section(is_final: bool) -> dict:
+        text = "\n".join(line for _, line in parts)
+        lead = len(text) - len(text.lstrip())
+        starts, offset = [], -lead
+        for number, line in parts:
+            starts.append((max(0, offset), number))
+            offset += len(line) + 1
+        return {"title": title, "content": text.strip(), "pages": starts, "final": is_final}
+
+    stream = chain(window, lines)
+    current = next(stream, None)
+    while current is not None:
+        following = next(stream, None)
+        number, line = current
+        if pattern and following is not None and not previous_heading and re.fullmatch(pattern, line):
+            if title is not None and parts:
+                yield section(True)
+            title, parts, size = line.strip(), [], 0
+            previous_heading = True
+        else:
+            previous_heading = False
+            if title is not None:
+                # A part is only cut ahead of another line, so every section ends on a final part
+                if parts and size + len(line) > max_chars:
+                    yield section(False)
+                    parts, size = [], 0
+                parts.append(current)
+                size += len(line) + 1
+        current = following
+
+    if title is not None and parts:
+        yield section(True)
+
+def _page_at(starts: List[Tuple[int, int]], position: int) -> Optional[int]:
+    page = None
+    for offset, number in starts:
+        if offset > position:
+            break
+        page = number
+    return page
+
+def iter_chunks(
+    sections: Iterable[dict],
+    source: str,
+    known_hashes: Set[str],
+    splitter: Optional[RecursiveCharacterTextSplitter] = None,
+    counts: Optional[Dict[str, int]] = None
+) -> Iterator[Document]:
+    """Chunk Documents of each section, skipping chunks whose hash is already known"""
+    splitter = splitter or RecursiveCharacterTextSplitter(
+        chunk_size=800,  # Optimal size for balance
+        chunk_overlap=100,  # Reduced overlap for speed
+        separators=["\n\n", "\n", ". ", "! ", "? ", "; ", ":", " "],
+        length_function=len
+    )
+    counts = counts if counts is not None else {}
+    counts.setdefault("chunks", 0)
+    counts.setdefault("new_chunks", 0)
+    chunk_number = 0  # continues across the parts of one long section
+    for section in sections:
+        content = section["content"]
+        if len(content.strip()) > MIN_SECTION_CHARS:
+            cursor = 0
+            for chunk in splitter.split_text(content):
+                i, chunk_number = chunk_number, chunk_number + 1
+                if not chunk.strip():
+                    continue
+                counts["chunks"] += 1
+                digest = content_hash(chunk)
+                if digest in known_hashes:
+                    continue
+                known_hashes.add(digest)
+                counts["new_chunks"] += 1
+
+                # Chunks come in order, so look for each one after the previous
+                probe = chunk.strip()[:80]
+                position = content.find(probe, cursor)
+                if position == -1:
+                    position = content.find(probe)
+                cursor = max(cursor, position)
+                yield Document(
+                    page_content=chunk.strip(),
+                    metadata={
+                        "source": source,
+                        "section": section["title"],
+                        "chunk_id": f"{section['title']}_{i}",
+                        "length": len(chunk),
+                        "content_hash": digest,
+                        "page": _page_at(section["pages"], position) if position != -1 else None
+                    }
+                )
+        if section["final"]:
+            chunk_number = 0
+
+def iter_batches(
+    docs: Iterable[Document],
+    embed_fn: Callable[[List[str]], np.ndarray],
+    batch_size: int = INGEST_EMBED_BATCH
+) -> Iterator[Tuple[List[Document], np.ndarray]]:
+    """(Documents, float32 vectors) in batches of batch_size"""
+    docs = iter(docs)
+    while True:
+        batch = list(islice(docs, batch_size))
+        if not batch:
+            return
+        vectors = np.asarray(embed_fn([doc.page_content for doc in batch]), dtype=np.float32)
+        yield batch, vectors
+
+# 🚀 Whole pipeline
+class IngestRun:
+    """One streaming ingestion of a PDF; iterate it for embedded batches, then read its counts"""
+
+    def __init__(
+        self,
+        pdf_path: str,
+        known_hashes: Set[str],
+        embed_fn: Callable[[List[str]], np.ndarray],
+        backend: Optional[str] = None
+    ):
+        self.pdf_path = pdf_path
+        self.known_hashes = known_hashes
+        self.embed_fn = embed_fn
+        self.backend = backend
+        self.counts = {"pages": 0, "sections": 0, "chunks": 0, "new_chunks": 0}
+
+    def _pages(self):
+        for page in iter_pages(self.pdf_path, backend=self.backend):
+            self.counts["pages"] += 1
+            yield page
+
+    def _sections(self, pages):
+        for section in iter_sections(pages):
+            self.counts["sections"] += 1
+            yield section
+
+    def __iter__(self) -> Iterator[Tuple[List[Document], np.ndarray]]:
+        stop = threading.Event()
+        with _metrics_lock:
+            PIPELINE_METRICS.setdefault("index", {"items": 0, "seconds": 0.0, "runs": 0})["runs"] += 1
+        try:
+            pages = run_stage("extract", self._pages(), stop)
+            sections = run_stage("sections", self._sections(pages), stop, upstream=pages)
+            chunks = run_stage(
+                "split",
+                iter_chunks(sections, os.path.basename(self.pdf_path), self.known_hashes, counts=self.counts),
+                stop,
+                upstream=sections
+            )
+            batches = run_stage("embed", iter_batches(chunks, self.embed_fn), stop, upstream=chunks)
+            for docs, vectors in batches:
+                start = time.perf_counter()
+                yield docs, vectors
+                _record("index", len(docs), time.perf_counter() - start)
+        finally:
+            stop.set()  # unblocks every stage if the consumer stops early or fails
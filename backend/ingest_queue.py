@@ -0,0 +1,356 @@
+# ingest_queue.py - Durable SQLite queue of ingestion jobs, run by worker processes outside the API
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import logging
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Queue configuration
+INGEST_QUEUE_DB = os.getenv("INGEST_QUEUE_DB", "ingest_jobs.db")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))                  # worker processes per API process, 0 for none
+INGEST_MAX_RUNNING = int(os.getenv("INGEST_MAX_RUNNING", "1"))          # jobs running at once across all workers
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "1"))
+INGEST_HEARTBEAT_SECONDS = float(os.getenv("INGEST_HEARTBEAT_SECONDS", "5"))
+INGEST_LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "120"))  # a running job silent this long is retried
+INGEST_START_METHOD = os.getenv("INGEST_START_METHOD", "spawn")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT UNIQUE,
+    pdf_path TEXT NOT NULL,
+    store_dir TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    progress TEXT,
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS ingest_jobs_status ON ingest_jobs (status, created_at);
+"""
+
+class IngestQueue:
+    """Ingestion jobs in a SQLite file shared by the API and worker processes
+
+    Claiming a job and checking the running cap happen in one write transaction, so
+    the cap holds across every worker of every API process using the same file.
+    """
+
+    def __init__(self, path: str = INGEST_QUEUE_DB, max_running: int = INGEST_MAX_RUNNING):
+        self.path = path
+        self.max_running = max_running
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _job(row: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"]) if job["progress"] else {}
+        return job
+
+    def enqueue(self, pdf_path: str, store_dir: str, idempotency_key: Optional[str] = None) -> Tuple[Dict, bool]:
+        """Queue a job; with a known idempotency key the existing job is returned instead
+
+        Returns (job, created). A failed job is queued again when its key is resubmitted.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if idempotency_key is not None:
+                row = conn.execute("SELECT * FROM ingest_jobs WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+                if row is not None and row["status"] != FAILED:
+                    conn.execute("COMMIT")
+                    return self._job(row), False
+                if row is not None:
+                    conn.execute(
+                        "UPDATE ingest_jobs SET status = ?, attempts = 0, error = NULL, progress = NULL, "
+                        "worker = NULL, pdf_path = ?, store_dir = ?, created_at = ?, started_at = NULL, "
+                        "heartbeat_at = NULL, finished_at = NULL WHERE id = ?",
+                        (QUEUED, pdf_path, store_dir, time.time(), row["id"])
+                    )
+                    job = conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (row["id"],)).fetchone()
+                    conn.execute("COMMIT")
+                    return self._job(job), True
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO ingest_jobs (id, idempotency_key, pdf_path, store_dir, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, idempotency_key, pdf_path, store_dir, QUEUED, time.time())
+            )
+            job = conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("COMMIT")
+            return self._job(job), True
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        try:
+            job = self._job(conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone())
+            if job is not None and job["status"] == QUEUED:
+                job["queue_position"] = conn.execute(
+                    "SELECT COUNT(*) FROM ingest_jobs WHERE status = ? AND created_at < ?", (QUEUED, job["created_at"])
+                ).fetchone()[0]
+            return job
+        finally:
+            conn.close()
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Take the oldest queued job for a store no running job is writing, unless max_running jobs are already running"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._release_stale(conn)
+            running = conn.execute("SELECT COUNT(*) FROM ingest_jobs WHERE status = ?", (RUNNING,)).fetchone()[0]
+            row = None
+            if running < self.max_running:
+                # Jobs for one store run one after another; the others' workers take other stores meanwhile
+                row = conn.execute(
+                    "SELECT * FROM ingest_jobs WHERE status = ? AND store_dir NOT IN "
+                    "(SELECT store_dir FROM ingest_jobs WHERE status = ?) ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING)
+                ).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute(
+                    "UPDATE ingest_jobs SET status = ?, attempts = attempts + 1, worker = ?, "
+                    "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (RUNNING, worker, now, now, row["id"])
+                )
+                row = conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+            return self._job(row)
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _release_stale(self, conn: sqlite3.Connection):
+        """Requeue running jobs whose worker stopped heartbeating, failing those out of attempts"""
+        cutoff = time.time() - INGEST_LEASE_SECONDS
+        stale = conn.execute(
+            "SELECT id, attempts, worker FROM ingest_jobs WHERE status = ? AND heartbeat_at < ?", (RUNNING, cutoff)
+        ).fetchall()
+        for row in stale:
+            if row["attempts"] >= INGEST_MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE ingest_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (FAILED, f"Worker {row['worker']} stopped responding", time.time(), row["id"])
+                )
+            else:
+                conn.execute("UPDATE ingest_jobs SET status = ?, worker = NULL WHERE id = ?", (QUEUED, row["id"]))
+            logger.warning(f"⚠️ Ingestion job {row['id']} lost its worker {row['worker']}")
+
+    def heartbeat(self, job_id: str, progress: Optional[Dict] = None):
+        conn = self._connect()
+        try:
+            if progress is None:
+                conn.execute("UPDATE ingest_jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+            else:
+                conn.execute(
+                    "UPDATE ingest_jobs SET heartbeat_at = ?, progress = ? WHERE id = ?",
+                    (time.time(), json.dumps(progress), job_id)
+                )
+        finally:
+            conn.close()
+
+    def finish(self, job_id: str, error: Optional[str] = None):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE ingest_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED if error else DONE, error, time.time(), job_id)
+            )
+        finally:
+            conn.close()
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        conn = self._connect()
+        try:
+            if status:
+                rows = conn.execute(
+                    "SELECT * FROM ingest_jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM ingest_jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            return [self._job(row) for row in rows]
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status").fetchall())
+        finally:
+            conn.close()
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+# 🏭 Worker processes
+def run_job(queue: IngestQueue, job: Dict) -> bool:
+    """Ingest one claimed job, heartbeating until it finishes"""
+    from retriever import create_vectorstore
+
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(INGEST_HEARTBEAT_SECONDS):
+            queue.heartbeat(job["id"])
+
+    heartbeat = threading.Thread(target=beat, name=f"ingest-heartbeat-{job['id']}", daemon=True)
+    heartbeat.start()
+    try:
+        logger.info(f"Starting ingestion job {job['id']}: {job['pdf_path']} -> {job['store_dir']}")
+        create_vectorstore(
+            job["pdf_path"],
+            job["store_dir"],
+            progress=lambda counts: queue.heartbeat(job["id"], counts),
+            raise_errors=True
+        )
+        queue.finish(job["id"])
+        logger.info(f"✅ Ingestion job {job['id']} done")
+        return True
+    except Exception as e:
+        queue.finish(job["id"], error=str(e) or type(e).__name__)
+        logger.error(f"❌ Ingestion job {job['id']} failed: {e}")
+        return False
+    finally:
+        stop.set()
+
+def worker_loop(path: str = INGEST_QUEUE_DB, stop: Optional[threading.Event] = None):
+    """Claim and run jobs until stop is set, or until the process that started this worker is gone"""
+    logging.basicConfig(level=logging.INFO)
+    queue = IngestQueue(path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    parent = multiprocessing.parent_process()
+    try:
+        while (stop is None or not stop.is_set()) and (parent is None or parent.is_alive()):
+            try:
+                job = queue.claim(worker)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not claim an ingestion job: {e}")
+                job = None
+            if job is None:
+                if stop is not None:
+                    stop.wait(INGEST_POLL_SECONDS)
+                else:
+                    time.sleep(INGEST_POLL_SECONDS)
+                continue
+            run_job(queue, job)
+    finally:
+        # atexit hooks don't run in multiprocessing children, so the extraction pool is shut down here
+        from pdf_extract import shutdown_pools
+        shutdown_pools()
+
+_workers = []
+_workers_stop = None
+
+def start_workers(n: int = INGEST_WORKERS, path: str = INGEST_QUEUE_DB) -> int:
+    """Start n worker processes for this API process (no-op if already started)
+
+    Workers aren't daemons: PDF extraction starts a process pool of its own, which a
+    daemon process may not do. stop_workers ends them, and they exit by themselves
+    once this process is gone.
+    """
+    global _workers_stop
+    if _workers or n <= 0:
+        return len(_workers)
+    context = multiprocessing.get_context(INGEST_START_METHOD)
+    _workers_stop = context.Event()
+    for i in range(n):
+        process = context.Process(target=worker_loop, args=(path, _workers_stop), name=f"ingest-worker-{i}")
+        process.start()
+        _workers.append(process)
+    logger.info(f"✅ Started {n} ingestion worker processes")
+    return n
+
+def stop_workers(timeout: float = 10.0):
+    """Ask workers to stop after their current job; terminate those still busy after timeout"""
+    if _workers_stop is not None:
+        _workers_stop.set()
+    deadline = time.time() + timeout
+    for process in _workers:
+        process.join(max(0.0, deadline - time.time()))
+        if process.is_alive():
+            process.terminate()
+            process.join(1.0)
+    _workers.clear()
+
+# 🚀 Process-wide queue
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_ingest_queue() -> IngestQueue:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = IngestQueue()
+    return _queue
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ingestion workers or inspect ingestion jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    work = sub.add_parser("worker", help="run ingestion workers in the foreground")
+    work.add_argument("--workers", type=int, default=1)
+    status = sub.add_parser("status", help="show one job, or recent jobs")
+    status.add_argument("job_id", nargs="?")
+    status.add_argument("--status", choices=[QUEUED, RUNNING, DONE, FAILED])
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        if args.workers <= 1:
+            worker_loop()
+            return True
+        start_workers(args.workers)
+        try:
+            for process in _workers:
+                process.join()
+        except KeyboardInterrupt:
+            stop_workers()
+        return True
+
+    queue = get_ingest_queue()
+    jobs = [queue.get(args.job_id)] if args.job_id else queue.list(args.status)
+    if not jobs or jobs[0] is None:
+        print("❌ No jobs found")
+        return False
+    for job in jobs:
+        print(json.dumps(job, indent=2, default=str))
+    print(f"\n📊 {queue.stats()}")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,261 @@
+# lexical_index.py - BM25 inverted index stored next to each FAISS store, and rank fusion
+import os
+import re
+import sys
+import argparse
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 🔤 Lexical search configuration
+LEXICAL_INDEX_FILE = "bm25.npz"
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "rrf").lower()  # off | rrf | weighted
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", "0.6"))  # weighted fusion: dense share of the score
+LEXICAL_SHORTCUT = os.getenv("LEXICAL_SHORTCUT", "true").lower() == "true"
+LEXICAL_SHORTCUT_COVERAGE = float(os.getenv("LEXICAL_SHORTCUT_COVERAGE", "1.0"))  # idf share of query terms matched
+LEXICAL_SHORTCUT_MARGIN = float(os.getenv("LEXICAL_SHORTCUT_MARGIN", "2.0"))  # top BM25 score over the runner-up
+
+# Course codes, formulas and acronyms stay whole ("cs-301", "o(n^2)" -> "o", "n^2", "c++"); their parts are indexed too
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._\-/^*][a-z0-9]+)*[+#]*")
+PART_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = PART_RE.findall(token)
+        if len(parts) > 1 or parts[0] != token:
+            tokens.extend(parts)
+            if len(parts) > 1:
+                tokens.append("".join(parts))
+    return tokens
+
+def _postings(texts: Iterable[str], vocab: Dict[str, int], first_doc: int = 0):
+    """(term ids, doc ids, term frequencies, document lengths) of texts numbered from first_doc; vocab grows in place"""
+    doc_ids, term_ids, freqs, lengths = [], [], [], []
+    for doc_id, text in enumerate(texts, first_doc):
+        counts = {}
+        tokens = tokenize(text)
+        for token in tokens:
+            term = vocab.setdefault(token, len(vocab))
+            counts[term] = counts.get(term, 0) + 1
+        doc_ids.extend([doc_id] * len(counts))
+        term_ids.extend(counts.keys())
+        freqs.extend(counts.values())
+        lengths.append(len(tokens))
+    return (
+        np.asarray(term_ids, dtype=np.int64),
+        np.asarray(doc_ids, dtype=np.uint32),
+        np.minimum(np.asarray(freqs, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16),
+        np.asarray(lengths, dtype=np.uint32)
+    )
+
+def _save_lexical_index(path: str, vocab: Dict[str, int], term_ids, doc_ids, freqs, lengths):
+    order = np.argsort(term_ids, kind="stable")  # doc ids stay ascending within a term
+    offsets = np.zeros(len(vocab) + 1, dtype=np.uint64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+    terms = "\n".join(sorted(vocab, key=vocab.get)).encode()
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        tmp_path,
+        terms=np.frombuffer(terms, dtype=np.uint8),
+        offsets=offsets,
+        doc_ids=doc_ids[order],
+        freqs=freqs[order],
+        lengths=lengths
+    )
+    os.replace(tmp_path, path)
+
+def write_lexical_index(store_dir: str, texts: Iterable[str]) -> int:
+    """BM25 postings of texts in FAISS id order, written to one file renamed into place
+
+    Layout: the vocabulary as newline-joined UTF-8, per-term offsets into the postings,
+    posting doc ids (uint32) and term frequencies (uint16), and every document's length.
+    """
+    vocab = {}
+    term_ids, doc_ids, freqs, lengths = _postings(texts, vocab)
+    _save_lexical_index(os.path.join(store_dir, LEXICAL_INDEX_FILE), vocab, term_ids, doc_ids, freqs, lengths)
+    return len(lengths)
+
+def extend_lexical_index(store_dir: str, texts: Iterable[str], start: int) -> Optional[int]:
+    """Add texts as documents start, start + 1, ... of a store's index, merging their postings into the stored ones
+
+    Only the new texts are tokenized. Postings from start on (left by an interrupted
+    append) are dropped first. Returns the new document count, or None when there is
+    no index holding start documents; write_lexical_index then.
+    """
+    path = os.path.join(store_dir, LEXICAL_INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        terms = data["terms"].tobytes().decode()
+        offsets = data["offsets"].astype(np.int64)
+        doc_ids, freqs, lengths = data["doc_ids"], data["freqs"], data["lengths"]
+    if len(lengths) < start:
+        return None
+    vocab = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+    keep = doc_ids < start
+    # Stored postings precede the new ones, so the stable sort keeps each term's doc ids ascending
+    old_terms = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))[keep]
+    new_terms, new_docs, new_freqs, new_lengths = _postings(texts, vocab, start)
+    _save_lexical_index(
+        path, vocab,
+        np.concatenate([old_terms, new_terms]),
+        np.concatenate([doc_ids[keep], new_docs]),
+        np.concatenate([freqs[keep], new_freqs]),
+        np.concatenate([lengths[:start], new_lengths])
+    )
+    return start + len(new_lengths)
+
+class LexicalIndex:
+    """In-memory BM25 over a store's chunks; doc ids are FAISS positions"""
+
+    def __init__(self, path: str, k1: float = BM25_K1, b: float = BM25_B):
+        with np.load(path) as data:
+            terms = data["terms"].tobytes().decode()
+            self.offsets = data["offsets"].astype(np.int64)
+            self.doc_ids = data["doc_ids"].astype(np.int64)
+            self.freqs = data["freqs"].astype(np.float32)
+            lengths = data["lengths"].astype(np.float32)
+        self.vocab = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+        self.n_docs = len(lengths)
+        self.k1 = k1
+        # Length normalisation per document, computed once instead of per query
+        self.norms = k1 * (1 - b + b * lengths / max(float(lengths.mean()) if self.n_docs else 1.0, 1e-9))
+        self.nbytes = sum(a.nbytes for a in (self.offsets, self.doc_ids, self.freqs, self.norms))
+
+    def idf(self, term_id: int) -> float:
+        df = int(self.offsets[term_id + 1] - self.offsets[term_id])
+        return float(np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5)))
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        n: Optional[int] = None,
+        mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Top-k (scores, doc ids, coverage) for a query
+
+        Coverage is the idf-weighted share of the query's terms a hit contains. Only ids
+        below n are returned (a newer index file than the FAISS index being searched),
+        and only ids where mask is true when a mask is given.
+        """
+        empty = np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query_terms = set(tokenize(query))
+        terms = {self.vocab[t] for t in query_terms if t in self.vocab}
+        if not terms or not self.n_docs:
+            return empty
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        matched = np.zeros(self.n_docs, dtype=np.float32)
+        for term_id in terms:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            ids, tf = self.doc_ids[start:end], self.freqs[start:end]
+            idf = self.idf(term_id)
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + self.norms[ids])
+            matched[ids] += idf
+        # Terms the index has never seen count against coverage with the highest possible idf
+        unseen = len(query_terms) - len(terms)
+        total_idf = sum(self.idf(t) for t in terms) + unseen * float(np.log(1 + (self.n_docs + 0.5) / 0.5))
+        if n is not None and n < self.n_docs:
+            scores[n:] = 0
+        if mask is not None:
+            scores[~mask[:self.n_docs]] = 0
+        candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            return empty
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return scores[top], top, matched[top] / max(total_idf, 1e-9)
+
+def load_lexical_index(store_dir: str) -> Optional[LexicalIndex]:
+    path = os.path.join(store_dir, LEXICAL_INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        return LexicalIndex(path)
+    except Exception as e:
+        logger.warning(f"Could not load lexical index {path}: {e}")
+        return None
+
+def is_confident(matches: List[dict]) -> bool:
+    """Whether lexical hits (sorted by bm25) are strong enough to skip the dense search"""
+    if not matches or matches[0]["coverage"] < LEXICAL_SHORTCUT_COVERAGE - 1e-6:
+        return False
+    return len(matches) == 1 or matches[0]["bm25"] >= LEXICAL_SHORTCUT_MARGIN * matches[1]["bm25"]
+
+# 🔀 Rank fusion of dense and lexical hits
+def _key(match: dict) -> tuple:
+    return match["source"], match["content"]
+
+def fuse(dense: List[dict], lexical: List[dict], mode: str = HYBRID_SEARCH) -> List[dict]:
+    """One ranking of dense matches (cosine "score") and lexical matches ("bm25"), best first
+
+    rrf sums 1 / (RRF_K + rank) over both lists; weighted mixes the cosine score with
+    the BM25 score scaled by the best lexical hit.
+    """
+    if mode == "off" or not lexical:
+        return dense
+    fused: Dict[tuple, dict] = {}
+    if mode == "weighted":
+        best = max(match["bm25"] for match in lexical)
+        for match in dense:
+            fused[_key(match)] = {**match, "score": HYBRID_DENSE_WEIGHT * match["score"]}
+        for match in lexical:
+            entry = fused.setdefault(_key(match), {**match, "score": 0.0})
+            entry["score"] += (1 - HYBRID_DENSE_WEIGHT) * match["bm25"] / best
+    else:
+        for ranking in (dense, lexical):
+            for rank, match in enumerate(ranking):
+                entry = fused.setdefault(_key(match), {**match, "score": 0.0})
+                entry["score"] += 1.0 / (RRF_K + rank + 1)
+    return sorted(fused.values(), key=lambda match: match["score"], reverse=True)
+
+# 🛠️ Lexical indexes for existing stores
+def build_all(root: str, force: bool = False) -> dict:
+    """Write a BM25 index next to every store under root that lacks one"""
+    from chunk_store import has_chunk_store, ChunkStore
+    import pickle
+
+    report = {"built": 0, "skipped": 0, "failed": 0}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        if "index.faiss" not in files:
+            continue
+        if not force and LEXICAL_INDEX_FILE in files:
+            report["skipped"] += 1
+            continue
+        try:
+            if has_chunk_store(dirpath):
+                texts = (doc.page_content for doc in ChunkStore(dirpath))
+            else:
+                with open(os.path.join(dirpath, "index.pkl"), "rb") as f:
+                    docstore, ids = pickle.load(f)
+                texts = (docstore.search(ids[i]).page_content for i in range(len(ids)))
+            n = write_lexical_index(dirpath, texts)
+            print(f"✅ {dirpath}: {n} chunks")
+            report["built"] += 1
+        except Exception as e:
+            print(f"❌ {dirpath}: {e}")
+            report["failed"] += 1
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Build BM25 indexes for existing vector stores")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("root", nargs="?", default="vector_store")
+    parser.add_argument("--force", action="store_true", help="rebuild indexes that already exist")
+    args = parser.parse_args()
+
+    report = build_all(args.root, args.force)
+    print(f"\n📊 Built: {report['built']}, skipped: {report['skipped']}, failed: {report['failed']}")
+    return report["failed"] == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -5,20 +5,36 @@ import logging
 import time
 import hashlib
 import asyncio
-from typing import Optional, Dict, List
+import math
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from typing import Optional, Dict, List, AsyncIterator, Tuple
 from dotenv import load_dotenv
 import google.generativeai as genai
 import requests
 import json
+import httpx
 from functools import lru_cache
+from llm_providers import get_provider, ProviderError
+from response_cache import get_response_cache
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 # 🚀 Performance Configuration
 OLLAMA_MODEL = "mistral"
-OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+OLLAMA_OPTIONS = {
+    "temperature": 0.05,    # Ultra low for maximum speed
+    "num_predict": 100,      # Very short responses
+    "top_k": 5,            # Minimal selection for speed
+    "top_p": 0.7,          # Very focused sampling
+    "repeat_penalty": 1.0,  # No penalty for speed
+    "num_ctx": 512         # Minimal context for speed
+}
+GEMINI_GENERATION_CONFIG = {"temperature": 0.3, "maxOutputTokens": 1000, "topK": 40, "topP": 0.9, "stopSequences": ["\n"]}
+LOCAL_MODELS = ("ollama", "llamacpp")  # may see course materials; Gemini only ever gets the question
 
 # Initialize Gemini client
 GEMINI_MODEL = None
@@ -66,12 +82,14 @@ PERFORMANCE_METRICS = {
     "cache_hits": 0,
     "cache_misses": 0,
     "avg_response_time": 0.0,
-    "model_usage": {"ollama": 0, "gemini": 0}
+    "model_usage": {"ollama": 0, "gemini": 0, "llamacpp": 0},
+    "streamed_responses": 0,
+    "avg_time_to_first_token": 0.0,
+    "generations_saved": 0  # requests that joined an identical one already generating
 }
 
-# 🎯 Response Cache
-RESPONSE_CACHE = {}
-MAX_CACHE_SIZE = 500
+# 🎯 Response Cache (on disk, shared by every worker)
+RESPONSE_CACHE = get_response_cache()
 
 class FastLLMInterface:
     def __init__(self):
@@ -108,21 +126,17 @@ class FastLLMInterface:
     
     def _get_cached_response(self, cache_key: str) -> Optional[str]:
         """Get cached response if available"""
-        if cache_key in RESPONSE_CACHE:
+        response = RESPONSE_CACHE.get(cache_key)
+        if response is not None:
             PERFORMANCE_METRICS["cache_hits"] += 1
-            return RESPONSE_CACHE[cache_key]
+            return response
         
         PERFORMANCE_METRICS["cache_misses"] += 1
         return None
     
     def _cache_response(self, cache_key: str, response: str):
         """Cache response with LRU eviction"""
-        if len(RESPONSE_CACHE) >= MAX_CACHE_SIZE:
-            # Remove oldest entry
-            oldest_key = next(iter(RESPONSE_CACHE))
-            del RESPONSE_CACHE[oldest_key]
-        
-        RESPONSE_CACHE[cache_key] = response
+        RESPONSE_CACHE.put(cache_key, response)
 
 # 🚀 Optimized Ollama Interface with CRITICAL fixes
 def run_llm_ollama(prompt: str, timeout: int = 30) -> str:
@@ -140,14 +154,7 @@ def run_llm_ollama(prompt: str, timeout: int = 30) -> str:
                 "model": OLLAMA_MODEL,
                 "prompt": optimized_prompt,
                 "stream": False,
-                "options": {
-                    "temperature": 0.05,    # Ultra low for maximum speed
-                    "num_predict": 100,      # Very short responses
-                    "top_k": 5,            # Minimal selection for speed
-                    "top_p": 0.7,          # Very focused sampling
-                    "repeat_penalty": 1.0,  # No penalty for speed
-                    "num_ctx": 512         # Minimal context for speed
-                }
+                "options": OLLAMA_OPTIONS
             },
             timeout=timeout  # CRITICAL: Much shorter timeout
         )
@@ -248,6 +255,80 @@ def _create_comprehensive_prompt(prompt: str) -> str:
     
     return prompt
 
+# 🎯 Prompts per model, shared by run_llm and LLMStream
+def _build_prompt(
+    query: str,
+    context: Optional[str],
+    model_type: str,
+    sources: Optional[List[str]],
+    conversation_history: Optional[List[Dict]]
+) -> Tuple[Optional[str], Optional[str]]:
+    """Prompt for the model and, for local answers from course materials, the source line they end with"""
+    # 🧠 Build conversation context from history
+    conversation_context = ""
+    if conversation_history and len(conversation_history) > 0:
+        # Include last 3 Q&A pairs for context
+        recent_history = conversation_history[-3:]
+        history_text = []
+        for item in recent_history:
+            history_text.append(f"Previous Q: {item['question']}")
+            history_text.append(f"Previous A: {item['answer']}")
+        conversation_context = "\n".join(history_text) + "\n\n"
+    
+    if model_type == "gemini":
+        # GEMINI: Only use general knowledge, no course materials
+        return f"""Question: {query}
+
+Answer briefly:""", None
+    
+    if model_type not in LOCAL_MODELS:
+        return None, None
+    
+    # OLLAMA / LLAMA.CPP: Use materials if available, otherwise general knowledge
+    if context and sources:
+        # Material-based response with source citation
+        truncated_context = truncate_context(context, max_length=500)   # Minimal context for speed
+        
+        # Format source information
+        source_info = "\n[Information sourced from course materials]"
+        if sources:
+            source_files = ", ".join([os.path.basename(s).split('-section')[0] for s in sources if s])
+            if source_files:
+                source_info = f"\n[Information sourced from: {source_files}]"
+        
+        prompt = f"""{conversation_context}Based on the provided course materials:
+
+Context: {truncated_context}
+
+Current Question: {query}
+
+Answer the question concisely using only the provided materials. 
+At the end of your response, add: {source_info}
+
+Answer:"""
+        return prompt, source_info
+    
+    # No materials available, use general knowledge with conversation context
+    return f"""Question: {query}
+
+Answer concisely. If you are not using any specific course materials, do not mention any sources.""", None
+
+def _finish_ollama_response(response: str, source_info: Optional[str]) -> str:
+    """Make sure a materials answer names its sources and a general one names none"""
+    if source_info is not None:
+        # Ensure the source info is included in the response
+        if source_info not in response:
+            response += f"\n\n{source_info}"
+        return response
+    
+    # Clean up any accidental source mentions in the response
+    response = response.strip()
+    if "[Information sourced from:" in response:
+        response = response.split("[Information sourced from:")[0].strip()
+    if "[This is a general knowledge answer]" not in response:
+        response = f"{response}\n\n[This is a general knowledge answer]"
+    return response
+
 # 🚀 Enhanced main LLM function with conversation memory
 def run_llm(
     query: str, 
@@ -274,80 +355,184 @@ def run_llm(
             logger.info("✅ Using cached response")
             return cached_response
     
-    # 🧠 Build conversation context from history
-    conversation_context = ""
-    if conversation_history and len(conversation_history) > 0:
-        # Include last 3 Q&A pairs for context
-        recent_history = conversation_history[-3:]
-        history_text = []
-        for item in recent_history:
-            history_text.append(f"Previous Q: {item['question']}")
-            history_text.append(f"Previous A: {item['answer']}")
-        conversation_context = "\n".join(history_text) + "\n\n"
-    
     # 🎯 PRIVACY PROTECTION: Route based on model and context availability
+    prompt, source_info = _build_prompt(query, context, model_type, sources, conversation_history)
     if model_type == "gemini":
         # GEMINI: Only use general knowledge, no course materials
-        prompt = f"""Question: {query}
-
-Answer briefly:"""
         response = run_llm_gemini(prompt)
-    
     elif model_type == "ollama":
-        # OLLAMA: Use materials if available, otherwise general knowledge
-        if context and sources:
-            # Material-based response with source citation
-            truncated_context = truncate_context(context, max_length=500)   # Minimal context for speed
-            
-            # Format source information
-            source_info = "\n[Information sourced from course materials]"
-            if sources:
-                source_files = ", ".join([os.path.basename(s).split('-section')[0] for s in sources if s])
-                if source_files:
-                    source_info = f"\n[Information sourced from: {source_files}]"
-            
-            prompt = f"""{conversation_context}Based on the provided course materials:
-
-Context: {truncated_context}
-
-Current Question: {query}
-
-Answer the question concisely using only the provided materials. 
-At the end of your response, add: {source_info}
-
-Answer:"""
-            response = run_llm_ollama(prompt, timeout=30)
-            
-            # Ensure the source info is included in the response
-            if source_info not in response:
-                response += f"\n\n{source_info}"
-        else:
-            # No materials available, use general knowledge with conversation context
-            prompt = f"""Question: {query}
-
-Answer concisely. If you are not using any specific course materials, do not mention any sources."""
-            response = run_llm_ollama(prompt, timeout=30)
-            
-            # Clean up any accidental source mentions in the response
-            response = response.strip()
-            if "[Information sourced from:" in response:
-                response = response.split("[Information sourced from:")[0].strip()
-            if "[This is a general knowledge answer]" not in response:
-                response = f"{response}\n\n[This is a general knowledge answer]"
+        response = _finish_ollama_response(run_llm_ollama(prompt, timeout=30), source_info)
     else:
         response = f"❌ Invalid model type: {model_type}"
     
     # Cache the response
     if use_cache and response and not response.startswith("❌"):
-        if len(RESPONSE_CACHE) >= MAX_CACHE_SIZE:
-            # Remove oldest entry
-            oldest_key = next(iter(RESPONSE_CACHE))
-            del RESPONSE_CACHE[oldest_key]
-        
-        RESPONSE_CACHE[cache_key] = response
+        RESPONSE_CACHE.put(cache_key, response)
     
     return response
 
+# 🚦 Admission control: a concurrency limit per backend, queued by priority
+PRIORITIES = ("interactive", "batch", "quiz")  # served in this order
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "2"))  # generations per backend; LLM_CONCURRENCY_OLLAMA etc. override
+LLM_INTERACTIVE_RESERVED = int(os.getenv("LLM_INTERACTIVE_RESERVED", "1"))  # slots batch and quiz work can't take
+LLM_QUEUE_LIMITS = {
+    "interactive": int(os.getenv("LLM_QUEUE_INTERACTIVE", "32")),
+    "batch": int(os.getenv("LLM_QUEUE_BATCH", "20")),
+    "quiz": int(os.getenv("LLM_QUEUE_QUIZ", "4"))
+}
+
+class LLMBusyError(Exception):
+    """The backend's queue for this priority is full; retry after retry_after seconds"""
+    
+    def __init__(self, backend: str, priority: str, retry_after: int):
+        super().__init__(f"{backend} is busy ({priority} queue full). Please retry in {retry_after}s.")
+        self.backend = backend
+        self.priority = priority
+        self.retry_after = retry_after
+
+class _Scheduler:
+    """Generation slots of one backend
+
+    A free slot is taken at once; otherwise the request waits in its priority's queue,
+    and a full queue is refused straight away (LLMBusyError) rather than left to time
+    out. Freed slots go to interactive requests first, then batch, then quiz, and the
+    last LLM_INTERACTIVE_RESERVED slots only ever go to interactive ones.
+    """
+    
+    def __init__(self, backend: str, limit: int):
+        self.backend = backend
+        self.limit = max(1, limit)
+        self.running = 0
+        self.queues = {priority: deque() for priority in PRIORITIES}
+        self.avg_generation_time = 10.0  # seconds, for Retry-After
+        self.metrics = {
+            priority: {"admitted": 0, "rejected": 0, "avg_wait": 0.0, "max_wait": 0.0} for priority in PRIORITIES
+        }
+    
+    def _can_run(self, priority: str) -> bool:
+        reserved = 0 if priority == "interactive" else min(LLM_INTERACTIVE_RESERVED, self.limit - 1)
+        return self.running < self.limit - reserved
+    
+    def _dispatch(self):
+        for priority in PRIORITIES:
+            queue = self.queues[priority]
+            while queue and self._can_run(priority):
+                waiter = queue.popleft()
+                if not waiter.done():  # cancelled while queued
+                    self.running += 1
+                    waiter.set_result(None)
+    
+    def _retry_after(self, priority: str) -> int:
+        ahead = self.running + sum(len(self.queues[p]) for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        return max(1, math.ceil(self.avg_generation_time * ahead / self.limit))
+    
+    def admit(self, priority: str = "interactive") -> asyncio.Future:
+        """Queue a request for a slot: the future resolves once the slot is its own
+
+        Raises LLMBusyError instead when the priority's queue is full.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        waiter = asyncio.get_running_loop().create_future()
+        if len(self.queues[priority]) >= LLM_QUEUE_LIMITS[priority] and not self._can_run(priority):
+            self.metrics[priority]["rejected"] += 1
+            raise LLMBusyError(self.backend, priority, self._retry_after(priority))
+        self.queues[priority].append(waiter)
+        self._dispatch()
+        return waiter
+    
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive", waiter: Optional[asyncio.Future] = None):
+        """Hold a slot for the duration of the block, waiting for it in the queue first"""
+        queued_at = time.time()
+        waiter = waiter or self.admit(priority)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            self.abandon(waiter, priority)
+            raise
+        
+        wait = time.time() - queued_at
+        metrics = self.metrics[priority]
+        metrics["admitted"] += 1
+        metrics["avg_wait"] += (wait - metrics["avg_wait"]) / metrics["admitted"]
+        metrics["max_wait"] = max(metrics["max_wait"], wait)
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.avg_generation_time += 0.2 * ((time.time() - start_time) - self.avg_generation_time)
+            self._release()
+    
+    def _release(self):
+        self.running -= 1
+        self._dispatch()
+    
+    def abandon(self, waiter: asyncio.Future, priority: str = "interactive"):
+        """Give back what admit() handed out for a request that went away: its slot, or its place in the queue"""
+        if waiter.done() and not waiter.cancelled():
+            self._release()  # granted just as the request went away
+        else:
+            waiter.cancel()
+            if waiter in self.queues[priority]:
+                self.queues[priority].remove(waiter)
+    
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "queued": {priority: len(self.queues[priority]) for priority in PRIORITIES},
+            "avg_generation_time": round(self.avg_generation_time, 2),
+            "classes": self.metrics
+        }
+
+_schedulers: Dict[str, _Scheduler] = {}
+
+def get_scheduler(backend: str) -> _Scheduler:
+    scheduler = _schedulers.get(backend)
+    if scheduler is None:
+        limit = int(os.getenv(f"LLM_CONCURRENCY_{backend.upper()}", LLM_CONCURRENCY))
+        scheduler = _schedulers[backend] = _Scheduler(backend, limit)
+    return scheduler
+
+async def run_prompt(prompt: str, model_type: str = "ollama", options: Optional[dict] = None, priority: str = "interactive") -> str:
+    """Complete a ready-made prompt on a backend, in turn with everything else the scheduler runs
+
+    No prompt building, caching or coalescing: for callers with their own prompts (quiz generation).
+    """
+    async with get_scheduler(model_type).slot(priority):
+        async with aclosing(get_provider(model_type).stream(prompt, options)) as tokens:
+            return "".join([token async for token in tokens])
+
+# 🔌 Native async generation through the pooled provider clients
+def _resolve_model_type(model_type: str) -> str:
+    # If Gemini is selected but not available or quota exceeded, fall back to Ollama
+    if model_type.lower() == "gemini" and (GEMINI_QUOTA_EXCEEDED or not GEMINI_AVAILABLE):
+        return "ollama"
+    return model_type
+
+async def _stream_model(model_type: str, prompt: str) -> AsyncIterator[str]:
+    """Tokens of one completion from a backend, with the options this module uses for it"""
+    global GEMINI_QUOTA_EXCEEDED
+    
+    if model_type != "gemini":
+        async with aclosing(get_provider(model_type).stream(_create_comprehensive_prompt(prompt), OLLAMA_OPTIONS)) as tokens:
+            async for token in tokens:
+                yield token
+        return
+    
+    if GEMINI_QUOTA_EXCEEDED:
+        raise Exception("Gemini API quota exceeded. Please check your Google Cloud Console.")
+    try:
+        async with aclosing(get_provider("gemini").stream(prompt, GEMINI_GENERATION_CONFIG)) as tokens:
+            async for token in tokens:
+                yield token
+    except ProviderError as e:
+        if "quota" in str(e).lower() or "429" in str(e):
+            GEMINI_QUOTA_EXCEEDED = True
+            raise Exception("Gemini API quota exceeded. Please check your Google Cloud Console.")
+        raise
+
 # 🚀 Async version for better performance
 async def run_llm_async(
     query: str, 
@@ -355,26 +540,21 @@ async def run_llm_async(
     model_type: str = "ollama",
     use_cache: bool = True,
     sources: Optional[List[str]] = None,
-    conversation_history: Optional[List[Dict]] = None
+    conversation_history: Optional[List[Dict]] = None,
+    priority: str = "interactive"
 ) -> str:
-    """Async version of run_llm for non-blocking operations with proper cancellation support"""
+    """Async run_llm on the pooled provider clients; a timeout or cancellation stops the model generating
+
+    Raises LLMBusyError when the backend's queue for this priority is full.
+    """
+    async def answer() -> str:
+        stream = LLMStream(query, context, model_type, use_cache, sources, conversation_history, priority)
+        async for _ in stream:
+            pass
+        return stream.answer
+    
     try:
-        # Create a task that can be cancelled
-        loop = asyncio.get_event_loop()
-        task = loop.run_in_executor(
-            None,  # Use default executor
-            lambda: run_llm(
-                query=query,
-                context=context,
-                model_type=model_type,
-                use_cache=use_cache,
-                sources=sources,
-                conversation_history=conversation_history
-            )
-        )
-        
-        # Wait for the task to complete or be cancelled
-        return await asyncio.wait_for(task, timeout=60)  # 60 second timeout
+        return await asyncio.wait_for(answer(), timeout=60)  # 60 second timeout
         
     except asyncio.TimeoutError:
         logger.warning("LLM request timed out after 60 seconds")
@@ -384,15 +564,242 @@ async def run_llm_async(
         logger.info("LLM request was cancelled")
         raise  # Re-raise to allow proper cleanup
         
+    except LLMBusyError:
+        raise  # the caller answers 429
+        
     except Exception as e:
         logger.error(f"Error in run_llm_async: {str(e)}")
         return f"❌ Error processing your request: {str(e)}"
 
+# 🤝 Identical in-flight requests share one generation
+IN_FLIGHT: Dict[str, "_Generation"] = {}  # cache key -> generation still running
+
+class _Generation:
+    """One completion, read by every request with the same cache key while it runs
+
+    The model runs in its own task, so the request that started it can leave without
+    cutting the others off; it is cancelled (closing the backend request) once every
+    request that joined it has left, read or not. Each reader gets the pieces sent so
+    far, then the new ones.
+    """
+    
+    def __init__(self, cache_key: str, model_type: str, prompt: str, source_info: Optional[str], use_cache: bool, priority: str, waiter: asyncio.Future):
+        self.cache_key = cache_key
+        self.pieces = []
+        self.answer = None
+        self.done = False
+        self.readers = 0
+        self._changed = asyncio.Event()
+        self._ran = False
+        self.task = asyncio.create_task(self._run(model_type, prompt, source_info, use_cache, priority, waiter))
+        self.task.add_done_callback(lambda task: self._cancelled_early(task, model_type, priority, waiter))
+    
+    def _cancelled_early(self, task: asyncio.Task, model_type: str, priority: str, waiter: asyncio.Future):
+        """Clean up for a task cancelled before its first step, when _run never got to"""
+        if self._ran or not task.cancelled():
+            return
+        get_scheduler(model_type).abandon(waiter, priority)
+        self.done = True
+        self._unregister()
+        self._publish()
+    
+    def _publish(self, piece: Optional[str] = None):
+        if piece:
+            self.pieces.append(piece)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+    
+    def _unregister(self):
+        if IN_FLIGHT.get(self.cache_key) is self:
+            del IN_FLIGHT[self.cache_key]
+    
+    def join(self):
+        self.readers += 1
+    
+    def leave(self):
+        self.readers -= 1
+        if not self.readers and not self.done:
+            self._unregister()  # a new request starts afresh rather than joining a cancelled one
+            self.task.cancel()
+    
+    async def follow(self) -> AsyncIterator[str]:
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.pieces):
+                sent += 1
+                yield self.pieces[sent - 1]
+            if self.done:
+                return
+            await changed.wait()
+    
+    async def _run(self, model_type: str, prompt: str, source_info: Optional[str], use_cache: bool, priority: str, waiter: asyncio.Future):
+        self._ran = True
+        start_time = time.time()
+        time_to_first_token = None
+        parts = []
+        try:
+            try:
+                async with get_scheduler(model_type).slot(priority, waiter):
+                    async with aclosing(_stream_model(model_type, prompt)) as tokens:
+                        async for token in tokens:
+                            if time_to_first_token is None:
+                                time_to_first_token = time.time() - start_time
+                            parts.append(token)
+                            self._publish(token)
+            except httpx.TimeoutException:
+                logger.warning(f"{model_type} stream timed out")
+                self.answer = "❌ LLM timed out. The model might be busy or the question too complex. Try a simpler question or try again."
+                self._publish(self.answer)
+                return
+            except Exception as e:
+                logger.error(f"{model_type} error: {str(e)}")
+                if model_type == "gemini":
+                    self.answer = f"❌ Error processing your request: {str(e)}"
+                else:
+                    self.answer = f"❌ {model_type} error: {str(e)}. Check that the {model_type} server is running and the model is available."
+                self._publish(self.answer)
+                return
+            
+            streamed = "".join(parts).strip()
+            answer = _finish_ollama_response(streamed, source_info) if model_type in LOCAL_MODELS else streamed
+            if answer.startswith(streamed) and len(answer) > len(streamed):
+                self._publish(answer[len(streamed):])
+            self.answer = answer
+            
+            response_time = time.time() - start_time
+            PERFORMANCE_METRICS["model_usage"][model_type] += 1
+            PERFORMANCE_METRICS["total_queries"] += 1
+            PERFORMANCE_METRICS["avg_response_time"] += (
+                (response_time - PERFORMANCE_METRICS["avg_response_time"]) / PERFORMANCE_METRICS["total_queries"]
+            )
+            if time_to_first_token is not None:
+                PERFORMANCE_METRICS["streamed_responses"] += 1
+                PERFORMANCE_METRICS["avg_time_to_first_token"] += (
+                    (time_to_first_token - PERFORMANCE_METRICS["avg_time_to_first_token"]) / PERFORMANCE_METRICS["streamed_responses"]
+                )
+            logger.info(f"✅ {model_type} response in {response_time:.2f}s (first token {time_to_first_token or 0:.2f}s)")
+            
+            if use_cache and answer and not answer.startswith("❌"):
+                await asyncio.to_thread(RESPONSE_CACHE.put, self.cache_key, answer)
+        finally:
+            # Cached (or failed) before it stops being joinable, so no request misses both
+            self.done = True
+            self._unregister()
+            self._publish()
+
+# 🌊 Streaming answers, token by token
+class LLMStream:
+    """An answer as the model generates it: iterate with `async for`, then read .answer
+
+    Tokens are forwarded as the backend sends them; a cached answer comes as a single
+    piece. .answer is the final, post-processed text, cached like run_llm's, and may end
+    with a source line the model didn't generate (that part is sent as a last piece).
+    A request identical to one still generating (same cache key) joins that generation
+    instead of starting another; a new generation waits for a slot on its backend at
+    the stream's priority. The backend request is closed once every stream on it has
+    been closed; iterating to the end or stopping early closes a stream, and a started
+    stream that is never iterated must be closed with close().
+    """
+    
+    def __init__(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        model_type: str = "ollama",
+        use_cache: bool = True,
+        sources: Optional[List[str]] = None,
+        conversation_history: Optional[List[Dict]] = None,
+        priority: str = "interactive"
+    ):
+        self.query = query
+        self.context = context
+        self.model_type = model_type
+        self.use_cache = use_cache
+        self.sources = sources
+        self.conversation_history = conversation_history
+        self.priority = priority
+        self.answer = None
+        self.cached = False
+        self.coalesced = False
+        self.time_to_first_token = None
+        self._started = False
+        self._generation = None
+    
+    async def start(self):
+        """Answer from the cache, join an identical generation or queue a new one
+
+        Raises LLMBusyError when the backend's queue is full. Iterating starts the stream
+        too; await this first to get that error before sending anything.
+        """
+        if self._started:
+            return
+        self._started = True
+        model_type = _resolve_model_type(self.model_type)
+        cache_key = hashlib.md5(f"{self.query}:{self.context or 'no_context'}:{model_type}".encode()).hexdigest()
+        cached_answer = await asyncio.to_thread(RESPONSE_CACHE.get, cache_key) if self.use_cache else None
+        if cached_answer:
+            PERFORMANCE_METRICS["cache_hits"] += 1
+            logger.info("✅ Using cached response")
+            self.cached = True
+            self.answer = cached_answer
+            return
+        if self.use_cache:
+            PERFORMANCE_METRICS["cache_misses"] += 1
+        
+        if model_type != "gemini" and model_type not in LOCAL_MODELS:
+            self.answer = f"❌ Invalid model type: {model_type}"
+            return
+        
+        # use_cache=False asks for a fresh answer, so it neither joins nor can be joined
+        generation = IN_FLIGHT.get(cache_key) if self.use_cache else None
+        if generation is not None:
+            PERFORMANCE_METRICS["generations_saved"] += 1
+            logger.info("🤝 Joining an identical request already generating")
+            self.coalesced = True
+        else:
+            waiter = get_scheduler(model_type).admit(self.priority)
+            # 🎯 PRIVACY PROTECTION: Route based on model and context availability
+            prompt, source_info = _build_prompt(self.query, self.context, model_type, self.sources, self.conversation_history)
+            generation = _Generation(cache_key, model_type, prompt, source_info, self.use_cache, self.priority, waiter)
+            if self.use_cache:
+                IN_FLIGHT[cache_key] = generation
+        generation.join()
+        self._generation = generation
+    
+    def close(self):
+        """Stop reading; a generation no other stream reads is cancelled. Safe to call more than once"""
+        generation, self._generation = self._generation, None
+        if generation is not None:
+            generation.leave()
+    
+    def __aiter__(self):
+        return self._generate()
+    
+    async def _generate(self):
+        start_time = time.time()
+        await self.start()
+        generation = self._generation
+        if generation is None:
+            yield self.answer
+            return
+        
+        try:
+            async with aclosing(generation.follow()) as pieces:
+                async for piece in pieces:
+                    if self.time_to_first_token is None:
+                        self.time_to_first_token = time.time() - start_time
+                    yield piece
+            self.answer = generation.answer
+        finally:
+            self.close()
+
 # 🚀 Batch processing for multiple queries
 async def run_llm_batch(
     queries: List[str], 
     contexts: Optional[List[str]] = None,
-    model_type: str = "ollama"
+    model_type: str = "ollama",
+    priority: str = "batch"
 ) -> List[str]:
     """Process multiple queries in parallel"""
     
@@ -402,7 +809,7 @@ async def run_llm_batch(
     tasks = []
     for query, context in zip(queries, contexts):
         task = asyncio.create_task(
-            run_llm_async(query, context, model_type)
+            run_llm_async(query, context, model_type, priority=priority)
         )
         tasks.append(task)
     
@@ -420,15 +827,18 @@ async def run_llm_batch(
 
 # 📊 Performance monitoring
 def get_performance_metrics() -> Dict:
-    """Get current performance metrics"""
+    """Get current performance metrics; the response cache figures query its database, so call this off the event loop"""
     return {
         **PERFORMANCE_METRICS,
         "cache_size": len(RESPONSE_CACHE),
+        "response_cache": RESPONSE_CACHE.stats(),
+        "in_flight_generations": len(IN_FLIGHT),
+        "scheduler": {backend: scheduler.stats() for backend, scheduler in _schedulers.items()},
         "cache_hit_rate": PERFORMANCE_METRICS["cache_hits"] / max(1, PERFORMANCE_METRICS["cache_hits"] + PERFORMANCE_METRICS["cache_misses"])
     }
 
 def clear_response_cache():
-    """Clear response cache for memory management"""
+    """Clear the response cache (for every worker sharing it)"""
     RESPONSE_CACHE.clear()
     logger.info("✅ Response cache cleared")
 
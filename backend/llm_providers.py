@@ -0,0 +1,166 @@
+# llm_providers.py - Async LLM backends sharing one pooled keep-alive HTTP client each
+import os
+import json
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 🔌 Provider configuration
+LLAMACPP_HOST = os.getenv("LLAMACPP_HOST", "http://localhost:8080")
+GEMINI_HOST = "https://generativelanguage.googleapis.com"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "8"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_TOKEN_TIMEOUT = float(os.getenv("LLM_TOKEN_TIMEOUT", "30"))  # longest wait for the next token
+
+class ProviderError(Exception):
+    """A backend answered with an error instead of tokens"""
+
+class Provider:
+    """One LLM backend; stream() yields text as it is generated
+
+    Leaving the stream early (the caller is cancelled, times out or stops reading)
+    closes the upstream response, so the backend stops generating.
+    """
+
+    name = "provider"
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use, inside the event loop that serves requests
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                    keepalive_expiry=LLM_KEEPALIVE_SECONDS
+                ),
+                timeout=httpx.Timeout(LLM_TOKEN_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+            )
+        return self._client
+
+    def request(self, prompt: str, options: dict) -> dict:
+        """Keyword arguments of the streaming HTTP request for a prompt"""
+        raise NotImplementedError
+
+    def parse(self, line: str) -> Optional[dict]:
+        """{"text", "done"} of one line of the response stream, None to skip it"""
+        raise NotImplementedError
+
+    async def stream(self, prompt: str, options: Optional[dict] = None) -> AsyncIterator[str]:
+        async with self.client.stream(**self.request(prompt, options or {})) as response:
+            if response.status_code != 200:
+                raise ProviderError(f"{self.name} API error {response.status_code}: {(await response.aread()).decode(errors='replace')}")
+            async for line in response.aiter_lines():
+                chunk = self.parse(line) if line else None
+                if chunk is None:
+                    continue
+                if chunk["text"]:
+                    yield chunk["text"]
+                if chunk["done"]:
+                    return
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class OllamaProvider(Provider):
+    name = "ollama"
+
+    def __init__(self, base_url: str, model: str):
+        super().__init__(base_url)
+        self.model = model
+
+    def request(self, prompt: str, options: dict) -> dict:
+        return {
+            "method": "POST",
+            "url": "/api/generate",
+            "json": {"model": self.model, "prompt": prompt, "stream": True, "options": options}
+        }
+
+    def parse(self, line: str) -> Optional[dict]:
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise ProviderError(chunk["error"])
+        return {"text": chunk.get("response", ""), "done": chunk.get("done", False)}
+
+class LlamaCppProvider(Provider):
+    """llama.cpp's llama-server, via its native /completion endpoint"""
+
+    name = "llamacpp"
+
+    def request(self, prompt: str, options: dict) -> dict:
+        # Ollama option names map onto llama-server's; unknown ones are ignored by the server
+        params = {("n_predict" if key == "num_predict" else key): value for key, value in options.items() if key != "num_ctx"}
+        return {"method": "POST", "url": "/completion", "json": {"prompt": prompt, "stream": True, "cache_prompt": True, **params}}
+
+    def parse(self, line: str) -> Optional[dict]:
+        if not line.startswith("data:"):
+            return None
+        chunk = json.loads(line[len("data:"):])
+        if "error" in chunk:
+            raise ProviderError(chunk["error"].get("message", chunk["error"]) if isinstance(chunk["error"], dict) else chunk["error"])
+        return {"text": chunk.get("content", ""), "done": chunk.get("stop", False)}
+
+class GeminiProvider(Provider):
+    """Gemini's REST streaming endpoint (server-sent events)"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str], model: Optional[str], base_url: str = GEMINI_HOST):
+        super().__init__(base_url)
+        self.api_key = api_key
+        self.model = model
+
+    def request(self, prompt: str, options: dict) -> dict:
+        return {
+            "method": "POST",
+            "url": f"/v1beta/models/{self.model}:streamGenerateContent",
+            "params": {"alt": "sse"},
+            "headers": {"x-goog-api-key": self.api_key or ""},
+            "json": {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": options}
+        }
+
+    def parse(self, line: str) -> Optional[dict]:
+        if not line.startswith("data:"):
+            return None
+        chunk = json.loads(line[len("data:"):])
+        feedback = chunk.get("promptFeedback", {})
+        if feedback.get("blockReason"):
+            raise ProviderError(f"Content blocked: {feedback['blockReason']}")
+        candidates = chunk.get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return {"text": "".join(part.get("text", "") for part in parts), "done": bool(candidates[0].get("finishReason"))}
+
+# 🚀 One provider (and connection pool) per backend
+_providers: Dict[str, Provider] = {}
+
+def get_provider(name: str) -> Provider:
+    provider = _providers.get(name)
+    if provider is None:
+        if name == "ollama":
+            from llm_interface import OLLAMA_HOST, OLLAMA_MODEL
+            provider = OllamaProvider(OLLAMA_HOST, OLLAMA_MODEL)
+        elif name == "llamacpp":
+            provider = LlamaCppProvider(LLAMACPP_HOST)
+        elif name == "gemini":
+            from llm_interface import GEMINI_API_KEY, GEMINI_MODEL
+            provider = GeminiProvider(GEMINI_API_KEY, GEMINI_MODEL)
+        else:
+            raise ValueError(f"Unknown LLM provider: {name}")
+        _providers[name] = provider
+    return provider
+
+async def close_providers():
+    """Close every pooled client (application shutdown)"""
+    await asyncio.gather(*(provider.close() for provider in _providers.values()), return_exceptions=True)
+    _providers.clear()
@@ -1,16 +1,20 @@
 # main.py
-from fastapi import FastAPI, UploadFile, Form, File, APIRouter, Depends, Query, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, Form, File, APIRouter, Depends, Query, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import os
 import shutil
+import hashlib
 from sqlalchemy.orm import Session
 import json
 from typing import List, Optional
 
 from routers import auth, query
-from retriever import create_vectorstore, load_vectorstore
-from llm_interface import run_llm
+from retriever import load_vectorstore
+from ingest_queue import get_ingest_queue, start_workers, stop_workers
+from index_catalog import get_catalog
+from llm_interface import run_llm, run_prompt, LLMBusyError
+from llm_providers import close_providers
 from db import engine, Base, get_db
 from models import User, Announcement, Quiz, QuizAttempt, Attendance, StudentMarks
 from routers import profile
@@ -18,7 +22,8 @@ from routers.query import get_current_user
 from routers import attendance
 from routers import marks
 from routers import subjectroute as subjectroute
-import requests
+import asyncio
+import httpx
 from schemas import QuizSchema, QuizCreateSchema, QuestionSchema, QuizAttemptCreate, QuizAttemptSchema, AnnouncementCreate, AnnouncementResponse, QuizWithAttemptStatus
 from pydantic import BaseModel
 
@@ -53,6 +58,19 @@ VECTOR_STORE_DIR = "vector_store"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
 
+# 🏭 Ingestion runs in worker processes, so parsing and embedding never compete with queries
+@app.on_event("startup")
+def start_ingest_workers():
+    start_workers()
+
+@app.on_event("shutdown")
+def stop_ingest_workers():
+    stop_workers()
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    await close_providers()
+
 # ✅ Upload PDF & generate vectorstore with proper error handling
 @app.post("/upload")
 async def upload_pdf(
@@ -61,7 +79,7 @@ async def upload_pdf(
     year: str = Form(...),
     semester: str = Form(...),
     subject: str = Form(...),
-    background_tasks: BackgroundTasks = None
+    idempotency_key: Optional[str] = Header(None)
 ):
     import logging
     logger = logging.getLogger(__name__)
@@ -76,10 +94,16 @@ async def upload_pdf(
         os.makedirs(save_dir, exist_ok=True)
         logger.info(f"Created directory: {save_dir}")
 
-        # Save uploaded file
+        # Save uploaded file, hashing it on the way for the default idempotency key
         file_path = os.path.join(save_dir, file.filename)
+        digest = hashlib.sha1()
         with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
+            while True:
+                block = file.file.read(1024 * 1024)
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
         
         file_size = os.path.getsize(file_path)
         logger.info(f"File saved: {file_path} ({file_size} bytes)")
@@ -88,40 +112,24 @@ async def upload_pdf(
         if file_size == 0:
             return JSONResponse(status_code=400, content={"message": "Uploaded file is empty"})
 
-        # Create vectorstore with proper error handling
-        def create_vectorstore_with_logging(pdf_path: str, store_dir: str):
-            try:
-                logger.info(f"Starting vectorstore creation for {pdf_path}")
-                success = create_vectorstore(pdf_path, store_dir)
-                if success:
-                    logger.info(f"✅ Vectorstore created successfully at {store_dir}")
-                    # Verify files were created
-                    index_file = os.path.join(store_dir, "index.faiss")
-                    pkl_file = os.path.join(store_dir, "index.pkl")
-                    if os.path.exists(index_file) and os.path.exists(pkl_file):
-                        logger.info(f"✅ Vectorstore files verified: index.faiss ({os.path.getsize(index_file)} bytes), index.pkl ({os.path.getsize(pkl_file)} bytes)")
-                    else:
-                        logger.error(f"❌ Vectorstore files missing after creation")
-                else:
-                    logger.error(f"❌ Vectorstore creation failed for {pdf_path}")
-            except Exception as e:
-                logger.error(f"❌ Vectorstore creation error: {str(e)}")
-                import traceback
-                logger.error(traceback.format_exc())
-        
-        # Process vectorstore creation
-        if background_tasks:
-            background_tasks.add_task(create_vectorstore_with_logging, file_path, save_dir)
-            message = f"File uploaded to {branch}/{year}/{semester}/{subject}. Vector store processing in background..."
+        # 📥 Queue the vectorstore build; a retried upload maps to the job it already created
+        key = idempotency_key or f"{save_dir}:{digest.hexdigest()}"
+        job, created = get_ingest_queue().enqueue(file_path, save_dir, key)
+        if created:
+            logger.info(f"Queued ingestion job {job['id']} for {file_path}")
+            message = f"File uploaded to {branch}/{year}/{semester}/{subject}. Vector store processing queued..."
         else:
-            create_vectorstore_with_logging(file_path, save_dir)
-            message = f"File uploaded and processed successfully: {branch}/{year}/{semester}/{subject}"
+            logger.info(f"Upload of {file_path} matches ingestion job {job['id']} ({job['status']})")
+            message = f"File already uploaded to {branch}/{year}/{semester}/{subject}. Vector store processing {job['status']}"
 
         return {
             "message": message,
             "file_path": file_path,
             "store_dir": save_dir,
-            "file_size": file_size
+            "file_size": file_size,
+            "job_id": job["id"],
+            "job_status": job["status"],
+            "status_url": f"/ingest/jobs/{job['id']}"
         }
 
     except Exception as e:
@@ -130,11 +138,19 @@ async def upload_pdf(
         logger.error(traceback.format_exc())
         return JSONResponse(status_code=500, content={"message": f"Upload failed: {str(e)}"})
 
+# 📥 Ingestion job progress and errors
+@app.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = get_ingest_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
 # ✅ List documents
 @app.get("/documents")
 async def list_documents():
     try:
-        documents = [f for f in os.listdir(VECTOR_STORE_DIR) if os.path.isdir(os.path.join(VECTOR_STORE_DIR, f))]
+        documents = get_catalog().list_branches()
         return {"documents": documents}
     except Exception as e:
         return JSONResponse(status_code=500, content={"message": f"Error occurred: {str(e)}"})
@@ -749,36 +765,30 @@ async def call_llm_for_quiz(prompt: str) -> str:
     try:
         print(f"🤖 Calling LLM with prompt length: {len(prompt)}")
         
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "mistral",
-                "prompt": prompt,
-                "stream": False,
-                "options": {
+        # Queued behind interactive questions on the shared Ollama slots
+        llm_output = await asyncio.wait_for(
+            run_prompt(
+                prompt,
+                model_type="ollama",
+                options={
                     "temperature": 0.7,
                     "top_p": 0.9,
                     "num_predict": 2000
-                }
-            },
+                },
+                priority="quiz"
+            ),
             timeout=120  # Increased timeout for quiz generation
         )
         
-        print(f"🔍 LLM Response Status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result = response.json()
-            llm_output = result.get("response", "")
-            print(f"📝 LLM Response Length: {len(llm_output)}")
-            print(f"📝 LLM Response Preview: {llm_output[:200]}...")
-            return llm_output
-        else:
-            print(f"❌ LLM API Error: {response.status_code} - {response.text}")
-            raise Exception(f"LLM API error: {response.status_code} - {response.text}")
+        print(f"📝 LLM Response Length: {len(llm_output)}")
+        print(f"📝 LLM Response Preview: {llm_output[:200]}...")
+        return llm_output
             
-    except requests.exceptions.ConnectionError:
+    except LLMBusyError:
+        raise
+    except httpx.ConnectError:
         raise Exception("Cannot connect to Ollama. Make sure Ollama is running on localhost:11434")
-    except requests.exceptions.Timeout:
+    except (asyncio.TimeoutError, httpx.TimeoutException):
         raise Exception("LLM request timed out. Try reducing the number of questions.")
     except Exception as e:
         print(f"❌ LLM Error: {str(e)}")
@@ -902,6 +912,9 @@ async def generate_quiz_with_ai(request: QuizGenerationRequest):
         
     except HTTPException:
         raise
+    except LLMBusyError as e:
+        print(f"⏳ Quiz generation refused: {str(e)}")
+        raise HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         print(f"❌ Quiz generation failed: {str(e)}")
         raise HTTPException(500, f"Quiz generation failed: {str(e)}")
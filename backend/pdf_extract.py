@@ -0,0 +1,265 @@
+# pdf_extract.py - Page-parallel PDF text extraction over pluggable extractor backends
+import os
+import re
+import atexit
+import threading
+import logging
+import importlib.util
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Extraction configuration
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))  # smaller PDFs aren't worth a round trip
+PDF_EXTRACT_START_METHOD = os.getenv("PDF_EXTRACT_START_METHOD", "spawn")  # fork is unsafe once FAISS/torch threads run
+PDF_EXTRACT_BACKEND = os.getenv("PDF_EXTRACT_BACKEND", "pypdf2")  # pypdf2 | pypdfium2 | pymupdf
+PDF_STREAM_RANGE_PAGES = int(os.getenv("PDF_STREAM_RANGE_PAGES", "16"))  # pages per task when streaming
+
+Page = Tuple[int, str]  # (1-based page number, cleaned text)
+
+def clean_page_text(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip()
+
+# 🔌 Extractor backends
+class PdfExtractor:
+    """Text extraction for one PDF library; subclasses open the document and read single pages"""
+
+    name = "base"
+    module = None  # import name of the optional dependency
+
+    @classmethod
+    def available(cls) -> bool:
+        return cls.module is None or importlib.util.find_spec(cls.module) is not None
+
+    def open(self, path: str):
+        raise NotImplementedError
+
+    def count(self, document) -> int:
+        raise NotImplementedError
+
+    def page_text(self, document, number: int) -> str:
+        raise NotImplementedError
+
+    def close(self, document):
+        pass
+
+    def page_count(self, path: str) -> int:
+        document = self.open(path)
+        try:
+            return self.count(document)
+        finally:
+            self.close(document)
+
+    def iter_range(self, path: str, start: int, end: int) -> Iterator[Page]:
+        """Cleaned text of the non-empty pages in [start, end), one page at a time"""
+        document = self.open(path)
+        try:
+            for number in range(start, min(end, self.count(document))):
+                try:
+                    text = self.page_text(document, number) or ""
+                except Exception as e:
+                    logger.warning(f"Skipping page {number + 1} of {path}: {e}")
+                    continue
+                text = clean_page_text(text)
+                if text:
+                    yield number + 1, text
+        finally:
+            self.close(document)
+
+    def extract_range(self, path: str, start: int, end: int) -> List[Page]:
+        return list(self.iter_range(path, start, end))
+
+class PyPDF2Extractor(PdfExtractor):
+    name = "pypdf2"
+
+    def open(self, path):
+        return PdfReader(path)
+
+    def count(self, document):
+        return len(document.pages)
+
+    def page_text(self, document, number):
+        return document.pages[number].extract_text()
+
+class PdfiumExtractor(PdfExtractor):
+    name = "pypdfium2"
+    module = "pypdfium2"
+
+    def open(self, path):
+        import pypdfium2
+        return pypdfium2.PdfDocument(path)
+
+    def count(self, document):
+        return len(document)
+
+    def page_text(self, document, number):
+        page = document[number]
+        try:
+            text_page = page.get_textpage()
+            try:
+                return text_page.get_text_range()
+            finally:
+                text_page.close()
+        finally:
+            page.close()
+
+    def close(self, document):
+        document.close()
+
+class PyMuPDFExtractor(PdfExtractor):
+    name = "pymupdf"
+    module = "pymupdf"
+
+    @classmethod
+    def available(cls):
+        return any(importlib.util.find_spec(module) is not None for module in ("pymupdf", "fitz"))
+
+    def open(self, path):
+        try:
+            import pymupdf
+        except ImportError:  # PyMuPDF < 1.24 only ships the fitz name
+            import fitz as pymupdf
+        return pymupdf.open(path)
+
+    def count(self, document):
+        return document.page_count
+
+    def page_text(self, document, number):
+        return document.load_page(number).get_text()
+
+    def close(self, document):
+        document.close()
+
+EXTRACTORS: Dict[str, PdfExtractor] = {
+    extractor.name: extractor for extractor in (PyPDF2Extractor(), PdfiumExtractor(), PyMuPDFExtractor())
+}
+
+def available_backends() -> List[str]:
+    return [name for name, extractor in EXTRACTORS.items() if extractor.available()]
+
+_unavailable_warned = set()
+
+def get_extractor(backend: Optional[str] = None) -> PdfExtractor:
+    """Extractor for a backend name, falling back to PyPDF2 when it isn't installed"""
+    backend = (backend or PDF_EXTRACT_BACKEND).lower()
+    extractor = EXTRACTORS.get(backend)
+    if extractor is None or not extractor.available():
+        if backend not in _unavailable_warned:
+            _unavailable_warned.add(backend)
+            logger.warning(f"PDF backend '{backend}' is not available, using pypdf2")
+        extractor = EXTRACTORS["pypdf2"]
+    return extractor
+
+def page_count(path: str, backend: Optional[str] = None) -> int:
+    return get_extractor(backend).page_count(path)
+
+def _extract_range(path: str, start: int, end: int, backend: Optional[str] = None) -> List[Page]:
+    """Extract pages [start, end) of one PDF; runs inside a pool worker"""
+    return get_extractor(backend).extract_range(path, start, end)
+
+def _page_ranges(n_pages: int, n_ranges: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous, near-equal ranges"""
+    n_ranges = max(1, min(n_ranges, n_pages))
+    bounds = [round(i * n_pages / n_ranges) for i in range(n_ranges + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(n_ranges) if bounds[i] < bounds[i + 1]]
+
+# 🚀 Long-lived worker pools, one per worker count
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(PDF_EXTRACT_START_METHOD)
+            )
+            _pools[workers] = pool
+        return pool
+
+def _discard_pool(workers: int):
+    with _pools_lock:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+@atexit.register
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def extract_pages(
+    path: str,
+    workers: Optional[int] = None,
+    min_pages: Optional[int] = None,
+    backend: Optional[str] = None
+) -> List[Page]:
+    """Text of every non-empty page in page order, extracted in parallel for large PDFs"""
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    min_pages = PDF_PARALLEL_MIN_PAGES if min_pages is None else min_pages
+    backend = get_extractor(backend).name
+    n_pages = page_count(path, backend)
+    if workers <= 1 or n_pages < max(2, min_pages):
+        return _extract_range(path, 0, n_pages, backend)
+
+    # Two ranges per worker evens out pages that are much slower than others
+    try:
+        pool = _get_pool(workers)
+        futures = [
+            pool.submit(_extract_range, path, start, end, backend)
+            for start, end in _page_ranges(n_pages, workers * 2)
+        ]
+        pages = []
+        for future in futures:  # submission order is page order
+            pages.extend(future.result())
+        return pages
+    except BrokenProcessPool as e:
+        logger.warning(f"PDF worker pool failed ({e}), extracting {path} serially")
+        _discard_pool(workers)
+        return _extract_range(path, 0, n_pages, backend)
+
+def iter_pages(
+    path: str,
+    workers: Optional[int] = None,
+    backend: Optional[str] = None,
+    range_pages: int = PDF_STREAM_RANGE_PAGES
+) -> Iterator[Page]:
+    """Pages in page order without holding the whole document: at most two ranges per worker in flight"""
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    extractor = get_extractor(backend)
+    n_pages = extractor.page_count(path)
+    if workers <= 1 or n_pages < max(2, PDF_PARALLEL_MIN_PAGES):
+        yield from extractor.iter_range(path, 0, n_pages)
+        return
+
+    ranges = iter([(start, min(start + range_pages, n_pages)) for start in range(0, n_pages, range_pages)])
+    done_until = 0  # pages before this one have all been yielded
+    try:
+        pool = _get_pool(workers)
+        pending = deque()
+        for start, end in ranges:
+            pending.append((end, pool.submit(_extract_range, path, start, end, extractor.name)))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            end, future = pending.popleft()
+            pages = future.result()
+            following = next(ranges, None)
+            if following is not None:
+                pending.append((following[1], pool.submit(_extract_range, path, *following, extractor.name)))
+            yield from pages
+            done_until = end
+    except BrokenProcessPool as e:
+        logger.warning(f"PDF worker pool failed ({e}), extracting {path} serially from page {done_until + 1}")
+        _discard_pool(workers)
+        yield from extractor.iter_range(path, done_until, n_pages)
@@ -0,0 +1,185 @@
+# response_cache.py - LLM answers in a SQLite file shared by every worker and kept across restarts
+import os
+import time
+import zlib
+import sqlite3
+import threading
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 💾 Cache configuration
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "response_cache.db")
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))  # seconds, 0 to keep answers until evicted
+RESPONSE_CACHE_COMPRESS = os.getenv("RESPONSE_CACHE_COMPRESS", "true").lower() == "true"
+COMPRESS_MIN_BYTES = 256  # shorter answers don't shrink enough to be worth it
+TOUCH_SECONDS = 60  # LRU clock resolution: a hit rewrites its row at most this often
+EVICT_TO = 0.9  # eviction frees down to this share of the limit, so it doesn't run on every write
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    answer BLOB NOT NULL,
+    compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS responses_size (bytes INTEGER NOT NULL);
+INSERT INTO responses_size SELECT COALESCE(SUM(size), 0) FROM responses WHERE NOT EXISTS (SELECT 1 FROM responses_size);
+CREATE TRIGGER IF NOT EXISTS responses_added AFTER INSERT ON responses
+    BEGIN UPDATE responses_size SET bytes = bytes + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS responses_replaced AFTER UPDATE OF size ON responses
+    BEGIN UPDATE responses_size SET bytes = bytes + NEW.size - OLD.size; END;
+CREATE TRIGGER IF NOT EXISTS responses_removed AFTER DELETE ON responses
+    BEGIN UPDATE responses_size SET bytes = bytes - OLD.size; END;
+"""
+
+class ResponseCache:
+    """Answers by cache key, with a TTL and a byte limit enforced by evicting least recently used rows
+
+    The file is in WAL mode, so any number of workers read while one writes. Each
+    thread keeps its own connection, opened on first use. Cache failures are logged
+    and treated as misses; they never fail a request.
+    """
+
+    def __init__(
+        self,
+        path: str = RESPONSE_CACHE_DB,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttl: float = RESPONSE_CACHE_TTL,
+        compress: bool = RESPONSE_CACHE_COMPRESS
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compress = compress
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self.metrics = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0, "errors": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")  # durable across crashes of the process, enough for a cache
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _encode(self, answer: str):
+        data = answer.encode()
+        if self.compress and len(data) >= COMPRESS_MIN_BYTES:
+            packed = zlib.compress(data, 6)
+            if len(packed) < len(data):
+                return packed, 1
+        return data, 0
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT answer, compressed, created_at, accessed_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is not None and self.ttl and row[2] < now - self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ? AND created_at = ?", (key, row[2]))
+                self.metrics["expired"] += 1
+                row = None
+            if row is None:
+                self.metrics["misses"] += 1
+                return None
+            if row[3] < now - TOUCH_SECONDS:
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.metrics["hits"] += 1
+            return (zlib.decompress(row[0]) if row[1] else row[0]).decode()
+        except (sqlite3.Error, zlib.error) as e:
+            self.metrics["errors"] += 1
+            logger.warning(f"Response cache read failed: {e}")
+            return None
+
+    def put(self, key: str, answer: str):
+        data, compressed = self._encode(answer)
+        now = time.time()
+        conn = None
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO responses (key, answer, compressed, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET answer = excluded.answer, compressed = excluded.compressed, "
+                "size = excluded.size, created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+                (key, data, compressed, len(data), now, now)
+            )
+            if conn.execute("SELECT bytes FROM responses_size").fetchone()[0] > self.max_bytes:
+                self._evict(conn, now)
+            conn.execute("COMMIT")
+            self.metrics["writes"] += 1
+        except sqlite3.Error as e:
+            if conn is not None and conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.metrics["errors"] += 1
+            logger.warning(f"Response cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired answers, then the least recently used until under EVICT_TO of the limit"""
+        if self.ttl:
+            self.metrics["expired"] += conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+        excess = conn.execute("SELECT bytes FROM responses_size").fetchone()[0] - int(self.max_bytes * EVICT_TO)
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.metrics["evictions"] += len(victims)
+
+    def clear(self):
+        try:
+            self._connect().execute("DELETE FROM responses")
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache clear failed: {e}")
+
+    def __len__(self):
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> Dict:
+        try:
+            size = self._connect().execute("SELECT bytes FROM responses_size").fetchone()[0]
+        except sqlite3.Error:
+            size = None
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,  # this process's
+            "entries": len(self),
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hit_rate": self.metrics["hits"] / max(1, lookups)
+        }
+
+# 🚀 One cache per process, over the shared file
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Get the shared response cache (the file is opened lazily)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -1,5 +1,4 @@
 # retriever.py - Critical Performance Fixes
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 # from simple_embeddings import get_embeddings  # Not used directly anymore
 try:
@@ -10,7 +9,6 @@ except ImportError:
     except ImportError:
         # Fallback for older versions
         from langchain.embeddings import HuggingFaceEmbeddings
-from PyPDF2 import PdfReader
 from langchain_core.documents import Document
 import os
 import re
@@ -18,37 +16,103 @@ import numpy as np
 import time
 from functools import lru_cache
 import concurrent.futures
+import heapq
+import itertools
 import logging
 import hashlib
 import pickle
-from typing import Dict, List, Tuple, Optional
+import json
+import shutil
+import uuid
+from typing import Callable, Dict, List, Tuple, Optional
 import asyncio
-from collections import defaultdict
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from index_catalog import get_catalog, SEMESTER_INDEX_DIR
+from embedding_cache import get_embedding_store, content_hash
+from semantic_cache import SEMANTIC_CACHE, SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_ANSWERS
+from ann_index import (
+    load_policy, build_index, apply_policy, configure_search,
+    search_params, similarity_from_distance, reconstruct_all,
+    rerank_search, normalized, is_compressed, load_exact_vectors, save_exact_vectors,
+    EXACT_VECTORS_FILE, ANN_RERANK_FACTOR
+)
+from chunk_store import ChunkStore, PositionalIds, has_chunk_store, write_chunk_store, append_chunk_store, OFFSETS_FILE
+from array_file import append_rows
+from store_cache import StoreCache
+from pdf_extract import extract_pages
+from ingest_pipeline import IngestRun, get_pipeline_metrics
+from subject_centroids import write_centroids, extend_centroids, load_centroids, score_bound
+from section_index import SECTION_INDEX_FILE, SECTION_SEARCH_MIN_CHUNKS, SECTION_TOP_N, write_section_index, extend_section_index, load_section_index
+from subject_router import ROUTING_ENABLED, ROUTING_TOP_N, route, should_audit, record_audit, get_routing_metrics
+from lexical_index import (
+    write_lexical_index, extend_lexical_index, load_lexical_index, fuse, is_confident,
+    HYBRID_SEARCH, LEXICAL_SHORTCUT, LEXICAL_INDEX_FILE
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # 🚀 Enhanced caching system
-VECTORSTORE_CACHE = {}
+VECTORSTORE_CACHE = StoreCache()  # LRU under VECTORSTORE_CACHE_BYTES, safe across search threads
 QUERY_CACHE = {}
-EMBEDDING_CACHE = {}
-MAX_CACHE_SIZE = 50
+EMBEDDING_CACHE = get_embedding_store("all-MiniLM-L6-v2")  # persistent, content-addressed
 QUERY_CACHE_SIZE = 1000
+RESULT_TOP_K = int(os.getenv("RESULT_TOP_K", "5"))  # chunks returned per query
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))  # subjects searched at once per query (dense and lexical)
+_heap_tiebreak = itertools.count()  # keeps heap entries with equal scores from comparing dicts
+
+# 🗂️ Unified per-semester index (one FAISS index over every subject's chunks)
+SEMESTER_INDEX_ENABLED = os.getenv("SEMESTER_INDEX_ENABLED", "false").lower() == "true"
+SEMESTER_INDEX_META = {}
+
+# 🗺️ Memory-mapped loading: indexes and chunk stores are shared through the OS page cache
+MMAP_INDEXES = os.getenv("MMAP_INDEXES", "true").lower() == "true"
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+# 🔒 In-flight loads: concurrent callers for one store wait on the first caller's future
+VECTORSTORE_LOADS = {}
+VECTORSTORE_LOADS_LOCK = threading.Lock()
+
+# 🔒 Per-subject ingestion locks: threads of one process, then every process through a lock file in the store
+INGEST_LOCKS = defaultdict(threading.Lock)
+INGEST_LOCK_FILE = ".ingest.lock"
 
 # 📊 Performance metrics
 PERFORMANCE_METRICS = {
     "cache_hits": 0,
     "cache_misses": 0,
     "avg_search_time": 0.0,
-    "total_searches": 0
+    "total_searches": 0,
+    "vectorstore_loads": 0,
+    "avg_load_time": 0.0,
+    "duplicate_loads_avoided": 0,
+    "load_wait_time": 0.0,
+    "lexical_searches": 0,
+    "avg_lexical_time": 0.0,
+    "lexical_shortcuts": 0,
+    "subjects_searched": 0,
+    "subjects_skipped": 0,
+    "section_searches": 0,
+    "section_vectors_scanned": 0,
+    "section_vectors_total": 0,
+    "stale_stores_dropped": 0
 }
 
 class FastRetriever:
     def __init__(self):
         self.embeddings = None
         self._init_embeddings()
-        self.semantic_cache = {}
+        self.semantic_cache = SEMANTIC_CACHE
         self.query_embeddings = {}
     
     def _init_embeddings(self):
@@ -98,86 +162,297 @@ class FastRetriever:
         PERFORMANCE_METRICS["cache_misses"] += 1
         return None
 
+def _append_exact_vectors(store_dir: str, previous: Optional[np.ndarray], vectors: np.ndarray, start: int) -> np.ndarray:
+    """Grow a store's exact vectors by the new rows in place; the whole file is written only when it can't grow
+
+    Returns the file memory-mapped, covering every id of the old and new index.
+    """
+    path = os.path.join(store_dir, EXACT_VECTORS_FILE)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not append_rows(path, vectors, start):
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, vectors if previous is None else np.vstack([previous[:start], vectors]))
+        os.replace(tmp_path, path)
+    return load_exact_vectors(store_dir)
+
+def _publish_append(
+    store_dir: str,
+    index,
+    docs: List[Document],
+    vectors: np.ndarray,
+    start: int,
+    exact_vectors: Optional[np.ndarray] = None
+):
+    """Write chunks start onwards of a store next to the live files, then publish them by renaming index.faiss into place
+
+    Only the new chunks are written: their records are appended to the chunk store and
+    the lexical, section and centroid files are extended from them alone. Readers bound
+    every file by the ntotal of the index they opened, so the one rename is the commit
+    point; a crash before it leaves the previous store as it was.
+    """
+    def stored():
+        return itertools.islice(ChunkStore(store_dir), index.ntotal)
+
+    def all_vectors():
+        return exact_vectors if exact_vectors is not None else reconstruct_all(index)
+
+    if not append_chunk_store(store_dir, docs, start):
+        write_chunk_store(store_dir, itertools.chain(itertools.islice(ChunkStore(store_dir), start) if start else [], docs))
+    # A fresh store (start 0) replaces whatever an earlier one left behind
+    if not start or extend_lexical_index(store_dir, (doc.page_content for doc in docs), start) is None:
+        write_lexical_index(store_dir, (doc.page_content for doc in stored()))
+    if not start or extend_section_index(store_dir, (doc.metadata for doc in docs), vectors, start) is None:
+        write_section_index(store_dir, (doc.metadata for doc in stored()), all_vectors())
+    if not start or not extend_centroids(store_dir, vectors):
+        write_centroids(store_dir, all_vectors())
+
+    index_path = os.path.join(store_dir, "index.faiss")
+    tmp_path = f"{index_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+    # Files the new index doesn't use: a pickled docstore from before chunk stores, exact vectors of an uncompressed index
+    legacy_path = os.path.join(store_dir, "index.pkl")
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+    if not is_compressed(index):
+        save_exact_vectors(store_dir, index, None)
+
+def _add_vectors(db: FAISS, docs: List[Document], vectors: np.ndarray):
+    """Append embedded chunks to a store, handing the float32 batch to FAISS as one array
+
+    FAISS.add_embeddings takes (text, vector) pairs and rebuilds the matrix from them.
+    """
+    ids = [str(uuid.uuid4()) for _ in docs]
+    db.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    for id_, doc in zip(ids, docs):
+        doc.id = id_
+    db.docstore.add(dict(zip(ids, docs)))
+    start = len(db.index_to_docstore_id)
+    db.index_to_docstore_id.update({start + i: id_ for i, id_ in enumerate(ids)})
+
+def _iter_documents(db: FAISS):
+    """A store's Documents in FAISS id order"""
+    for i in range(db.index.ntotal):
+        yield db.docstore.search(db.index_to_docstore_id[i])
+
+def _read_vectorstore(store_dir: str, embeddings) -> FAISS:
+    """Open a store: the index memory-mapped read-only, chunks from the lazy chunk store when present
+
+    The index is opened first; writers replace it last, so the chunk store read
+    afterwards always covers every id the index can return.
+    """
+    index_path = os.path.join(store_dir, "index.faiss")
+    index = faiss.read_index(index_path, MMAP_FLAGS) if MMAP_INDEXES else faiss.read_index(index_path)
+    if has_chunk_store(store_dir):
+        docstore, index_to_docstore_id = ChunkStore(store_dir), PositionalIds(index.ntotal)
+    else:
+        # Stores written before chunk stores existed: unpickle the full docstore
+        with open(os.path.join(store_dir, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id
+    )
+
+def _store_nbytes(store_dir: str, db: FAISS) -> int:
+    """Memory a cached store can pin: its index plus whatever part of the docstore lives in RAM"""
+    files = ["index.faiss", LEXICAL_INDEX_FILE, SECTION_INDEX_FILE, OFFSETS_FILE if isinstance(db.docstore, ChunkStore) else "index.pkl"]
+    return sum(os.path.getsize(path) for path in (os.path.join(store_dir, f) for f in files) if os.path.exists(path))
+
+@contextmanager
+def _ingest_lock(store_dir: str):
+    """Hold a store for one ingestion, against other threads and other worker processes"""
+    with INGEST_LOCKS[store_dir]:
+        os.makedirs(store_dir, exist_ok=True)
+        with open(os.path.join(store_dir, INGEST_LOCK_FILE), "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+# 🔄 Stores republished by another process: writers rename a new index.faiss into place
+def _index_signature(store_dir: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(os.path.join(store_dir, "index.faiss"))
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def _drop_stale_stores(store_dirs: List[str]):
+    """Forget cached stores whose index.faiss changed since they were loaded, and their semesters' cached results
+
+    Ingestion workers publish in their own process, so this is how the API process
+    learns of new chunks.
+    """
+    stale_semesters = set()
+    for store_dir in store_dirs:
+        db = VECTORSTORE_CACHE.peek(store_dir)
+        if db is not None and getattr(db, "signature", None) != _index_signature(store_dir):
+            VECTORSTORE_CACHE.pop(store_dir, None)
+            SEMESTER_INDEX_META.pop(store_dir, None)
+            stale_semesters.add(os.path.dirname(os.path.normpath(store_dir)))
+            PERFORMANCE_METRICS["stale_stores_dropped"] += 1
+            logger.info(f"🔄 {store_dir} was republished, reloading it")
+    for semester_dir in stale_semesters:
+        _invalidate_semester_results(semester_dir)
+
+def _invalidate_semester_results(semester_dir: str):
+    """Forget the retrieval results (exact and semantic) cached for a semester"""
+    for key in [key for key, entry in list(QUERY_CACHE.items()) if entry.get("scope") == semester_dir]:
+        QUERY_CACHE.pop(key, None)
+    SEMANTIC_CACHE.invalidate(lambda scope: scope[0] == semester_dir)
+
 # 🚀 Optimized vectorstore creation
-def create_vectorstore(pdf_path: str, store_dir: str) -> bool:
-    """Create optimized vectorstore with better chunking strategy"""
+def create_vectorstore(
+    pdf_path: str,
+    store_dir: str,
+    append: bool = True,
+    progress: Optional[Callable[[dict], None]] = None,
+    raise_errors: bool = False
+) -> bool:
+    """Create or extend a subject vectorstore, embedding only chunks it doesn't hold yet
+
+    progress, if given, is called with the pipeline counts after every embedded batch
+    and once more when the store is saved.
+    """
     start_time = time.time()
     
     try:
-        text = load_pdf(pdf_path)
-        if not text:
-            raise ValueError("No text extracted from PDF")
-        
-        # 🎯 Smart chunking strategy
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,  # Optimal size for balance
-            chunk_overlap=100,  # Reduced overlap for speed
-            separators=["\n\n", "\n", ". ", "! ", "? ", "; ", ":", " "],
-            length_function=len
-        )
-        
-        # Extract structured sections
-        sections = extract_sections(text)
-        if not sections:
-            sections = [("Full Document", text)]
-        
-        docs = []
-        for section_title, section_content in sections:
-            # Skip very short sections
-            if len(section_content.strip()) < 50:
-                continue
-                
-            section_chunks = splitter.split_text(section_content)
-            docs.extend([
-                Document(
-                    page_content=chunk.strip(),
-                    metadata={
-                        "source": os.path.basename(pdf_path),
-                        "section": section_title,
-                        "chunk_id": f"{section_title}_{i}",
-                        "length": len(chunk)
-                    }
-                ) for i, chunk in enumerate(section_chunks) if chunk.strip()
-            ])
-        
-        # 🚀 GPU-accelerated embeddings
-        device = "cuda"
-        try:
-            import torch
-            if not torch.cuda.is_available():
-                device = "cpu"
-        except ImportError:
-            device = "cpu"
-        
         # Use simple embeddings to avoid torch conflicts
         from simple_embeddings import SimpleEmbeddings
         embeddings = SimpleEmbeddings()
         
-        # Create and save vectorstore
-        db = FAISS.from_documents(docs, embeddings)
-        os.makedirs(store_dir, exist_ok=True)
-        db.save_local(store_dir)
-        
-        # Cache the vectorstore
-        if len(VECTORSTORE_CACHE) >= MAX_CACHE_SIZE:
-            VECTORSTORE_CACHE.pop(next(iter(VECTORSTORE_CACHE)))
-        
-        VECTORSTORE_CACHE[store_dir] = db
+        # One ingestion at a time per subject, so concurrent uploads (or workers) don't drop each other's chunks
+        with _ingest_lock(store_dir):
+            index_path = os.path.join(store_dir, "index.faiss")
+            index = None
+            known_hashes = set()
+            if append and os.path.exists(index_path):
+                # Read from disk rather than the search cache: only the new chunks are written back
+                index = faiss.read_index(index_path)
+                if not has_chunk_store(store_dir):
+                    # Stores from before chunk stores get one written in full once, then grow in place
+                    with open(os.path.join(store_dir, "index.pkl"), "rb") as f:
+                        docstore, index_to_docstore_id = pickle.load(f)
+                    write_chunk_store(store_dir, (docstore.search(index_to_docstore_id[i]) for i in range(index.ntotal)))
+                known_hashes = {
+                    doc.metadata.get("content_hash") or content_hash(doc.page_content)
+                    for doc in itertools.islice(ChunkStore(store_dir), index.ntotal)
+                }
+            start = index.ntotal if index is not None else 0
+            
+            policy = load_policy(store_dir)
+            keep_exact = policy["compression"] != "none" or (index is not None and is_compressed(index))
+            previous_exact = None
+            if index is not None and keep_exact:
+                # Compressed codes can't be rebuilt losslessly, so the exact vectors grow alongside
+                previous_exact = load_exact_vectors(store_dir) if is_compressed(index) else None
+                if previous_exact is None or len(previous_exact) < start:
+                    previous_exact = normalized(reconstruct_all(index))
+            
+            # 🌊 Pages -> sections -> chunks -> embeddings stream through bounded stages; chunks
+            # already stored (re-uploads, repeated boilerplate pages) are dropped before embedding
+            run = IngestRun(pdf_path, known_hashes, embeddings.embed_documents_array)
+            new_docs, new_vectors = [], []
+            for docs, vectors in run:
+                vectors = normalized(vectors)
+                if index is None:
+                    # New stores fill a flat index first; the policy picks the final type below
+                    index = faiss.IndexFlatIP(vectors.shape[1])
+                index.add(vectors)
+                new_docs.extend(docs)
+                new_vectors.append(vectors)
+                if progress:
+                    progress({**run.counts, "stage": "embedding"})
+            
+            if not run.counts["pages"]:
+                raise ValueError("No text extracted from PDF")
+            if not new_docs:
+                if index is None:
+                    raise ValueError("No chunks extracted from PDF")
+                logger.info(f"✅ No new chunks in {pdf_path}, {store_dir} left unchanged")
+                if progress:
+                    progress({**run.counts, "stage": "unchanged", "total_chunks": index.ntotal})
+                return True
+            
+            new_vectors = np.vstack(new_vectors)
+            exact_vectors = _append_exact_vectors(store_dir, previous_exact, new_vectors, start) if keep_exact else None
+            # 🎯 Index type (flat / IVF / HNSW, inner product) and compression follow the subject's policy
+            index = apply_policy(index, store_dir, exact_vectors)
+            _publish_append(store_dir, index, new_docs, new_vectors, start, exact_vectors)
+            total = index.ntotal
+            
+            # Searches reopen the published store, memory-mapped like any other
+            VECTORSTORE_CACHE.pop(store_dir, None)
+            load_vectorstore(store_dir)
+        get_catalog().update_subject(store_dir, chunks=total)
         
+        # Cached results for this semester no longer reflect its material
+        semester_dir = os.path.dirname(os.path.normpath(store_dir))
+        _invalidate_semester_results(semester_dir)
+
+        # Keep the unified semester index in step with the subject stores
+        if SEMESTER_INDEX_ENABLED:
+            build_semester_index(semester_dir)
+
         creation_time = time.time() - start_time
-        logger.info(f"✅ Vectorstore created in {creation_time:.2f}s for {pdf_path}")
+        counts = run.counts
+        logger.info(
+            f"✅ Vectorstore updated in {creation_time:.2f}s for {pdf_path}: {counts['pages']} pages, "
+            f"{counts['sections']} sections, {counts['new_chunks']} new of {counts['chunks']} chunks, {total} total"
+        )
+        if progress:
+            progress({**counts, "stage": "saved", "total_chunks": total})
         return True
         
     except Exception as e:
         logger.error(f"❌ Vectorstore creation failed: {str(e)}")
+        if raise_errors:
+            raise
         return False
 
 # 🚀 Fast vectorstore loading with cache
 def load_vectorstore(store_dir: str) -> Optional[FAISS]:
-    """Load vectorstore with intelligent caching"""
-    if store_dir in VECTORSTORE_CACHE:
-        return VECTORSTORE_CACHE[store_dir]
+    """Load vectorstore with intelligent caching; concurrent misses on one store share a single load
+
+    A cached store is reused only while its index.faiss is the one it was loaded from.
+    """
+    db = VECTORSTORE_CACHE.get(store_dir)
+    if db is not None:
+        if getattr(db, "signature", None) == _index_signature(store_dir):
+            return db
+        _drop_stale_stores([store_dir])
+    
+    with VECTORSTORE_LOADS_LOCK:
+        future = VECTORSTORE_LOADS.get(store_dir)
+        leader = future is None
+        if leader:
+            # A load that finished since our cache miss has already cached the store
+            if store_dir in VECTORSTORE_CACHE:
+                return VECTORSTORE_CACHE.get(store_dir)
+            future = concurrent.futures.Future()
+            VECTORSTORE_LOADS[store_dir] = future
     
+    if not leader:
+        wait_start = time.time()
+        db = future.result()
+        with VECTORSTORE_LOADS_LOCK:
+            PERFORMANCE_METRICS["duplicate_loads_avoided"] += 1
+            PERFORMANCE_METRICS["load_wait_time"] += time.time() - wait_start
+        return db
+    
+    db = None
+    try:
+        db = _load_vectorstore_from_disk(store_dir)
+        return db
+    finally:
+        # Cached (or failed) before the future is dropped, so no later caller loads it again
+        with VECTORSTORE_LOADS_LOCK:
+            VECTORSTORE_LOADS.pop(store_dir, None)
+        future.set_result(db)
+
+def _load_vectorstore_from_disk(store_dir: str) -> Optional[FAISS]:
     if not os.path.exists(os.path.join(store_dir, "index.faiss")):
         return None
     
@@ -194,21 +469,73 @@ def load_vectorstore(store_dir: str) -> Optional[FAISS]:
         from simple_embeddings import SimpleEmbeddings
         embeddings = SimpleEmbeddings()
         
-        db = FAISS.load_local(store_dir, embeddings, allow_dangerous_deserialization=True)
+        load_start = time.time()
+        # Taken before the read: an index replaced meanwhile shows up as stale on the next lookup
+        signature = _index_signature(store_dir)
+        db = _read_vectorstore(store_dir, embeddings)
+        db.signature = signature
+        policy = load_policy(store_dir)
+        configure_search(db.index, policy)
+        # 🗜️ Compressed indexes re-rank against exact vectors mapped from disk, not held in RAM
+        db.exact_vectors = load_exact_vectors(store_dir) if is_compressed(db.index) else None
+        db.rerank_factor = policy["rerank_factor"]
+        db.lexical = load_lexical_index(store_dir)
+        db.sections = load_section_index(store_dir)
         
-        # Cache the loaded vectorstore
-        if len(VECTORSTORE_CACHE) >= MAX_CACHE_SIZE:
-            VECTORSTORE_CACHE.pop(next(iter(VECTORSTORE_CACHE)))
+        load_time = time.time() - load_start
+        PERFORMANCE_METRICS["vectorstore_loads"] += 1
+        PERFORMANCE_METRICS["avg_load_time"] += (load_time - PERFORMANCE_METRICS["avg_load_time"]) / PERFORMANCE_METRICS["vectorstore_loads"]
+        logger.info(f"📂 Loaded {store_dir} in {load_time * 1000:.1f}ms ({db.index.ntotal} vectors)")
         
-        VECTORSTORE_CACHE[store_dir] = db
+        # Cache the loaded vectorstore
+        VECTORSTORE_CACHE.put(store_dir, db, _store_nbytes(store_dir, db))
         return db
         
     except Exception as e:
         logger.error(f"Error loading vectorstore: {str(e)}")
         return None
 
+def _search_store(db: FAISS, query_embedding: np.ndarray, k: int, sel=None):
+    """FAISS search of a loaded store, re-ranking candidates of a compressed index"""
+    return rerank_search(
+        db.index, query_embedding, k,
+        params=search_params(db.index, sel=sel),
+        exact_vectors=getattr(db, "exact_vectors", None),
+        rerank_factor=getattr(db, "rerank_factor", ANN_RERANK_FACTOR)
+    )
+
+def _search_sections(db: FAISS, query_embedding: np.ndarray, k: int):
+    """Search a big store's chunks in its best-matching sections only, the whole store otherwise
+
+    Falls back to the full search when the chosen sections can't fill k results.
+    """
+    sections = getattr(db, "sections", None)
+    n = db.index.ntotal
+    if sections is None or n < SECTION_SEARCH_MIN_CHUNKS or len(sections) <= SECTION_TOP_N:
+        return _search_store(db, query_embedding, k)
+    
+    sel, scanned = sections.selector(sections.top_sections(query_embedding), n)
+    if sel is not None and scanned >= k:
+        scores, indices = _search_store(db, query_embedding, k, sel=sel)
+        if (indices[0] != -1).sum() >= k:
+            PERFORMANCE_METRICS["section_searches"] += 1
+            PERFORMANCE_METRICS["section_vectors_scanned"] += scanned
+            PERFORMANCE_METRICS["section_vectors_total"] += n
+            return scores, indices
+    return _search_store(db, query_embedding, k)
+
+def get_query_embedding(query: str) -> np.ndarray:
+    """Query vector from the shared query-embedding LRU"""
+    from simple_embeddings import get_query_embedding as _embed_query
+    return _embed_query(query)
+
 # 🚨 CRITICAL FIX: Fast similarity search with proper scoring
-def search_subject_index(subject_dir: str, query: str, k: int = 3) -> dict:
+def search_subject_index(
+    subject_dir: str,
+    query: str,
+    k: int = 3,
+    query_embedding: Optional[np.ndarray] = None
+) -> dict:
     """Fast search in a specific subject index with optimized FAISS operations"""
     start_time = time.time()
     
@@ -219,12 +546,13 @@ def search_subject_index(subject_dir: str, query: str, k: int = 3) -> dict:
         
         # 🚀 CRITICAL: Use direct FAISS search for speed
         try:
-            # Get query embedding
-            query_embedding = db.embedding_function.embed_query(query)
-            query_embedding = np.array(query_embedding).reshape(1, -1).astype('float32')
+            # Get query embedding (normally computed once by the caller for all subjects)
+            if query_embedding is None:
+                query_embedding = get_query_embedding(query)
+            query_embedding = np.asarray(query_embedding, dtype='float32').reshape(1, -1)
             
             # Direct FAISS search (much faster than langchain wrapper)
-            scores, indices = db.index.search(query_embedding, k)
+            scores, indices = _search_sections(db, query_embedding, k)
             
             # Process results efficiently
             matches = []
@@ -233,12 +561,11 @@ def search_subject_index(subject_dir: str, query: str, k: int = 3) -> dict:
             
             for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
                 if idx != -1:  # Valid index
-                    # Convert FAISS score to similarity (0-1 range)
-                    # FAISS returns L2 distance, convert to similarity
-                    similarity_score = 1.0 / (1.0 + abs(score))
+                    # Cosine similarity, comparable across flat / IVF / HNSW and legacy L2 indexes
+                    similarity_score = similarity_from_distance(db.index, score)
                     
                     if similarity_score > 0.1:  # Lower threshold for more results
-                        doc = db.docstore._dict[db.index_to_docstore_id[idx]]
+                        doc = db.docstore.search(db.index_to_docstore_id[idx])
                         matches.append({
                             "content": doc.page_content,
                             "source": doc.metadata.get('source', 'Unknown'),
@@ -293,6 +620,348 @@ def search_subject_index(subject_dir: str, query: str, k: int = 3) -> dict:
         logger.error(f"Search error in {subject_dir}: {str(e)}")
         return {"matches": [], "sources": set(), "score": 0.0}
 
+# 🗂️ Unified semester index build
+def build_semester_index(semester_dir: str) -> bool:
+    """Merge every subject index of a semester into one FAISS index with a subject-id array"""
+    start_time = time.time()
+    index_dir = os.path.join(semester_dir, SEMESTER_INDEX_DIR)
+    tmp_dir = f"{index_dir}.tmp"
+
+    try:
+        subject_dirs = sorted(
+            os.path.join(semester_dir, name) for name in os.listdir(semester_dir)
+            if not name.startswith("_")
+            and os.path.exists(os.path.join(semester_dir, name, "index.faiss"))
+        )
+
+        subjects = []
+        vectors = []
+        subject_ids = []
+        docs = {}
+        for subject_dir in subject_dirs:
+            db = load_vectorstore(subject_dir)
+            if db is None or db.index.ntotal == 0:
+                continue
+
+            subject = os.path.basename(subject_dir)
+            n = db.index.ntotal
+            # Reuse the stored vectors, nothing is re-embedded
+            exact_vectors = getattr(db, "exact_vectors", None)
+            vectors.append(normalized(exact_vectors if exact_vectors is not None else reconstruct_all(db.index)))
+            for doc in _iter_documents(db):
+                docs[str(len(docs))] = Document(
+                    page_content=doc.page_content,
+                    metadata={**doc.metadata, "subject": subject}
+                )
+            subject_ids.append(np.full(n, len(subjects), dtype=np.uint16))
+            subjects.append(subject)
+
+        if not subjects:
+            return False
+
+        vectors = np.vstack(vectors)
+        index = build_index(vectors, load_policy(index_dir))
+
+        from simple_embeddings import SimpleEmbeddings
+        db = FAISS(
+            embedding_function=SimpleEmbeddings(),
+            index=index,
+            docstore=InMemoryDocstore(docs),
+            index_to_docstore_id={i: str(i) for i in range(len(docs))}
+        )
+
+        # Write next to the live index, then swap it in
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        db.save_local(tmp_dir)
+        write_chunk_store(tmp_dir, docs.values())
+        write_lexical_index(tmp_dir, (doc.page_content for doc in docs.values()))
+        np.save(os.path.join(tmp_dir, "subject_ids.npy"), np.concatenate(subject_ids))
+        if is_compressed(index):
+            np.save(os.path.join(tmp_dir, EXACT_VECTORS_FILE), vectors)
+        with open(os.path.join(tmp_dir, "subjects.json"), "w") as f:
+            json.dump(subjects, f)
+
+        old_dir = f"{index_dir}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(index_dir):
+            os.rename(index_dir, old_dir)
+        os.rename(tmp_dir, index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        VECTORSTORE_CACHE.pop(index_dir, None)
+        SEMESTER_INDEX_META.pop(index_dir, None)
+        get_catalog().update_semester_index(semester_dir)
+
+        logger.info(f"✅ Semester index built in {time.time() - start_time:.2f}s: {len(subjects)} subjects, {index.ntotal} chunks")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Semester index build failed for {semester_dir}: {str(e)}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+def _load_semester_meta(index_dir: str) -> dict:
+    """Load subject names and the per-vector subject-id array for a semester index"""
+    meta = SEMESTER_INDEX_META.get(index_dir)
+    if meta is None:
+        with open(os.path.join(index_dir, "subjects.json")) as f:
+            subjects = json.load(f)
+        meta = {
+            "subjects": subjects,
+            "subject_ids": np.load(os.path.join(index_dir, "subject_ids.npy")),
+            "selectors": {}
+        }
+        SEMESTER_INDEX_META[index_dir] = meta
+    return meta
+
+def _subject_selector(meta: dict, subject: str):
+    """FAISS id selector restricting a semester index search to one subject"""
+    selector = meta["selectors"].get(subject)
+    if selector is None:
+        subject_id = meta["subjects"].index(subject)
+        ids = np.flatnonzero(meta["subject_ids"] == subject_id).astype('int64')
+        selector = faiss.IDSelectorBatch(ids)
+        meta["selectors"][subject] = selector
+    return selector
+
+# 🗂️ Single search over the unified semester index
+def search_semester_index(
+    semester_dir: str,
+    query: str,
+    target_subject: Optional[str] = None,
+    k: int = 5,
+    query_embedding: Optional[np.ndarray] = None
+) -> dict:
+    """Search the unified semester index, filtering by subject inside FAISS"""
+    index_dir = os.path.join(semester_dir, SEMESTER_INDEX_DIR)
+
+    try:
+        db = load_vectorstore(index_dir)
+        if db is None:
+            return {"matches": [], "sources": set(), "score": 0.0}
+
+        meta = _load_semester_meta(index_dir)
+        if query_embedding is None:
+            query_embedding = get_query_embedding(query)
+        query_embedding = np.asarray(query_embedding, dtype='float32').reshape(1, -1)
+
+        if target_subject and target_subject in meta["subjects"]:
+            scores, indices = _search_store(db, query_embedding, k, sel=_subject_selector(meta, target_subject))
+        else:
+            scores, indices = _search_store(db, query_embedding, k)
+
+        matches = []
+        sources = set()
+        for score, idx in zip(scores[0], indices[0]):
+            if idx == -1:
+                continue
+            similarity_score = similarity_from_distance(db.index, score)
+            if similarity_score > 0.1:
+                doc = db.docstore.search(db.index_to_docstore_id[idx])
+                matches.append({
+                    "content": doc.page_content,
+                    "source": doc.metadata.get('source', 'Unknown'),
+                    "section": doc.metadata.get('section', 'Unknown'),
+                    "score": float(similarity_score)
+                })
+                sources.add(f"{doc.metadata['subject']}/{doc.metadata['source']}")
+
+        avg_score = sum(m["score"] for m in matches) / len(matches) if matches else 0.0
+        return {"matches": matches, "sources": sources, "score": avg_score}
+
+    except Exception as e:
+        logger.error(f"Semester index search error in {semester_dir}: {str(e)}")
+        return {"matches": [], "sources": set(), "score": 0.0}
+
+def _find_subject_dirs(base_dir: str) -> List[str]:
+    """Subject directories on disk, for semesters not covered by the catalog"""
+    subject_dirs = []
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [d for d in dirs if d != SEMESTER_INDEX_DIR and not d.startswith(".")]
+        if "index.faiss" in files and ("index.pkl" in files or OFFSETS_FILE in files):
+            subject_dirs.append(root)
+    return subject_dirs
+
+# 🔤 BM25 search over the lexical indexes stored next to each FAISS index
+def _lexical_matches(db: FAISS, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[dict]:
+    lexical = getattr(db, "lexical", None)
+    if lexical is None:
+        return []
+    scores, ids, coverage = lexical.search(query, k, n=db.index.ntotal, mask=mask)
+    matches = []
+    for score, idx, covered in zip(scores, ids, coverage):
+        doc = db.docstore.search(db.index_to_docstore_id[int(idx)])
+        matches.append({
+            "content": doc.page_content,
+            "source": doc.metadata.get('source', 'Unknown'),
+            "section": doc.metadata.get('section', 'Unknown'),
+            "subject": doc.metadata.get('subject'),
+            "bm25": float(score),
+            "coverage": float(covered)
+        })
+    return matches
+
+def _subject_lexical_matches(subject_dir: str, query: str, k: int) -> List[dict]:
+    db = load_vectorstore(subject_dir)
+    return _lexical_matches(db, query, k) if db is not None else []
+
+def search_lexical(
+    base_dir: str,
+    query: str,
+    target_subject: Optional[str] = None,
+    k: int = 3,
+    subject_dirs: Optional[List[str]] = None,
+    semester_index: Optional[str] = None
+) -> dict:
+    """Keyword hits for exact terms (course codes, formulas, acronyms), ranked by BM25
+
+    With a target subject only that subject is searched, as the semester index masks
+    to it; otherwise subjects are searched in parallel like the dense fan-out.
+    """
+    start_time = time.time()
+    matches = []
+    sources = set()
+    try:
+        if SEMESTER_INDEX_ENABLED and semester_index:
+            db = load_vectorstore(semester_index)
+            if db is not None:
+                meta = _load_semester_meta(semester_index)
+                mask = None
+                if target_subject and target_subject in meta["subjects"]:
+                    mask = meta["subject_ids"] == meta["subjects"].index(target_subject)
+                matches = _lexical_matches(db, query, k, mask)
+                sources.update(f"{m['subject']}/{m['source']}" for m in matches)
+        else:
+            subject_dirs = _find_subject_dirs(base_dir) if subject_dirs is None else list(subject_dirs)
+            target_dir = os.path.join(base_dir, target_subject) if target_subject else None
+            if target_dir in subject_dirs:
+                subject_dirs = [target_dir]
+            if len(subject_dirs) > 1:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=min(SEARCH_WORKERS, len(subject_dirs))) as executor:
+                    per_subject = list(executor.map(lambda d: _subject_lexical_matches(d, query, k), subject_dirs))
+            else:
+                per_subject = [_subject_lexical_matches(d, query, k) for d in subject_dirs]
+            for subject_dir, subject_matches in zip(subject_dirs, per_subject):
+                matches.extend(subject_matches)
+                sources.update(f"{os.path.basename(subject_dir)}/{m['source']}" for m in subject_matches)
+        matches.sort(key=lambda m: m["bm25"], reverse=True)
+    except Exception as e:
+        logger.error(f"Lexical search error in {base_dir}: {str(e)}")
+        matches, sources = [], set()
+
+    search_time = time.time() - start_time
+    PERFORMANCE_METRICS["lexical_searches"] += 1
+    PERFORMANCE_METRICS["avg_lexical_time"] += (
+        (search_time - PERFORMANCE_METRICS["avg_lexical_time"]) / PERFORMANCE_METRICS["lexical_searches"]
+    )
+    return {"matches": matches[:max(k, RESULT_TOP_K)], "sources": sources, "search_time": search_time}
+
+def _format_chunks(results: List[dict]) -> List[str]:
+    return [
+        f"Source: {result['source']} | Section: {result['section']}\nContent: {result['content']}"
+        for result in results
+    ]
+
+# 🚀 Per-subject fan-out (fallback when no unified semester index exists)
+def _search_subject_indexes(
+    base_dir: str,
+    query: str,
+    target_subject: Optional[str] = None,
+    k: int = 3,
+    subject_dirs: Optional[List[str]] = None,
+    query_embedding: Optional[np.ndarray] = None,
+    top_k: int = RESULT_TOP_K
+) -> Optional[dict]:
+    """Global top_k matches over every subject index under base_dir, searched in parallel
+
+    Subjects are searched in order of their centroid score bound. Once top_k matches
+    are held, a subject whose bound can't beat the k-th best score is skipped, and a
+    running search of one is no longer waited for.
+    """
+    subject_dirs = _find_subject_dirs(base_dir) if subject_dirs is None else list(subject_dirs)
+    
+    if not subject_dirs:
+        return None
+    
+    if query_embedding is None:
+        query_embedding = get_query_embedding(query)
+    bounds = {d: score_bound(load_centroids(d), query_embedding) for d in subject_dirs}
+    
+    # 🎯 The target subject is always searched, and first; the rest by how well they could score
+    target_dir = os.path.join(base_dir, target_subject) if target_subject else None
+    subject_dirs.sort(key=lambda d: (d != target_dir, -bounds[d]))
+    
+    heap = []  # min-heap of (score, tiebreak, match, source) holding the global top_k
+    total_matches = 0
+    skipped = 0
+    
+    def kth_score() -> float:
+        return heap[0][0] if len(heap) >= top_k else float("-inf")
+    
+    def prunable(subject_dir: str) -> bool:
+        return subject_dir != target_dir and bounds[subject_dir] <= kth_score()
+    
+    # 🚀 Parallel search with limited workers; a subject is only submitted once a worker is free,
+    # so the k-th best score is as high as possible when deciding whether it's still worth searching
+    max_workers = min(SEARCH_WORKERS, len(subject_dirs))
+    per_subject_k = max(k, top_k)  # one strong subject can fill the whole top_k and end the search
+    queue = deque(subject_dirs)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = {}
+        
+        def submit_next():
+            nonlocal skipped
+            while queue and len(pending) < max_workers:
+                subject_dir = queue.popleft()
+                if prunable(subject_dir):
+                    skipped += 1
+                    continue
+                pending[executor.submit(search_subject_index, subject_dir, query, per_subject_k, query_embedding)] = subject_dir
+        
+        submit_next()
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                subject_dir = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Error in parallel search: {str(e)}")
+                    continue
+                if not result["matches"] or result["score"] <= 0.1:
+                    continue
+                total_matches += len(result["matches"])
+                for match in result["matches"]:
+                    entry = (match["score"], next(_heap_tiebreak), match, f"{os.path.basename(subject_dir)}/{match['source']}")
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, entry)
+                    elif entry[0] > heap[0][0]:
+                        heapq.heapreplace(heap, entry)
+            
+            # ✂️ Searches still running that can no longer reach the top_k aren't waited for
+            for future, subject_dir in list(pending.items()):
+                if prunable(subject_dir):
+                    future.cancel()
+                    del pending[future]
+                    skipped += 1
+            submit_next()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    PERFORMANCE_METRICS["subjects_searched"] += len(subject_dirs) - skipped
+    PERFORMANCE_METRICS["subjects_skipped"] += skipped
+    
+    top = sorted(heap, key=lambda entry: entry[0], reverse=True)
+    matches = [entry[2] for entry in top]
+    return {
+        "matches": matches,
+        "sources": {entry[3] for entry in top},
+        "score": sum(m["score"] for m in matches) / len(matches) if matches else 0.0,
+        "total_results": total_matches,
+        "subjects_skipped": skipped
+    }
+
 # 🚀 Smart multi-index search with caching
 def search_multiple_indexes(
     base_dir: str, 
@@ -303,51 +972,82 @@ def search_multiple_indexes(
     """Intelligent search across multiple indexes with caching and targeting"""
     start_time = time.time()
     
-    # Check cache first
+    # 🗂️ Resolve the semester layout from the in-memory catalog instead of walking it
+    record = get_catalog().semester(base_dir)
+    if record is not None:
+        semester_index = record["semester_index"]
+        subject_dirs = [s["path"] for s in record["subjects"].values() if s["index_path"]]
+    elif os.path.exists(base_dir):
+        semester_index = os.path.join(base_dir, SEMESTER_INDEX_DIR)
+        if not os.path.exists(os.path.join(semester_index, "index.faiss")):
+            semester_index = None
+        subject_dirs = _find_subject_dirs(base_dir)
+    else:
+        return {"matched_chunks": [], "sources": [], "search_time": 0.0}
+    _drop_stale_stores(subject_dirs + ([semester_index] if semester_index else []))
+    
+    # Check cache once stores republished elsewhere have cleared their semester's results
     cache_key = hashlib.md5(f"{query}:{base_dir}:{target_subject}".encode()).hexdigest()
+    cache_scope = os.path.normpath(base_dir)
     cached_result = QUERY_CACHE.get(cache_key)
     if cached_result:
         PERFORMANCE_METRICS["cache_hits"] += 1
         logger.info(f"✅ Cache hit for query: {query[:50]}...")
         return cached_result["result"]
     
-    if not os.path.exists(base_dir):
-        return {"matched_chunks": [], "sources": [], "search_time": 0.0}
+    # 🧭 Without a target subject, only the subjects the question most resembles are searched,
+    # by keyword too; routing needs the query embedding, so it is then computed up front
+    query_embedding = None
+    routed_dirs = None
+    if ROUTING_ENABLED and not target_subject and not (SEMESTER_INDEX_ENABLED and semester_index) and len(subject_dirs) > ROUTING_TOP_N:
+        query_embedding = get_query_embedding(query)
+        routed_dirs = route(subject_dirs, query_embedding)
     
-    # Find relevant subject directories
-    subject_dirs = []
-    for root, dirs, files in os.walk(base_dir):
-        if "index.faiss" in files and "index.pkl" in files:
-            subject_dirs.append(root)
+    # 🔤 Exact keyword hits first: a confident one answers without embedding the query (or searching it densely)
+    lexical = {"matches": [], "sources": set()}
+    if HYBRID_SEARCH != "off" or LEXICAL_SHORTCUT:
+        lexical = search_lexical(base_dir, query, target_subject, k, routed_dirs or subject_dirs, semester_index)
+        if LEXICAL_SHORTCUT and is_confident(lexical["matches"]):
+            PERFORMANCE_METRICS["lexical_shortcuts"] += 1
+            logger.info(f"✅ Lexical hit ({lexical['matches'][0]['bm25']:.2f}) for query: {query[:50]}...")
+            final_result = {
+                "matched_chunks": _format_chunks(lexical["matches"][:RESULT_TOP_K]),
+                "sources": list(lexical["sources"]),
+                "search_time": time.time() - start_time,
+                "total_results": len(lexical["matches"]),
+                "cache_key": cache_key,
+                "lexical_shortcut": True
+            }
+            if len(QUERY_CACHE) < QUERY_CACHE_SIZE:
+                QUERY_CACHE[cache_key] = {"result": final_result, "scope": cache_scope, "timestamp": time.time(), "access_count": 1}
+            return final_result
     
-    if not subject_dirs:
-        return {"matched_chunks": [], "sources": [], "search_time": 0.0}
+    # 🚀 Embed the query once and share the vector with every index searched
+    if query_embedding is None:
+        query_embedding = get_query_embedding(query)
     
-    # 🎯 Priority-based search strategy
-    if target_subject:
-        # Search target subject first
-        target_dir = os.path.join(base_dir, target_subject)
-        if target_dir in subject_dirs:
-            subject_dirs.remove(target_dir)
-            subject_dirs.insert(0, target_dir)
-    
-    # 🚀 Parallel search with limited workers for optimal performance
-    max_workers = min(4, len(subject_dirs))
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_subject = {
-            executor.submit(search_subject_index, subject_dir, query, k): subject_dir 
-            for subject_dir in subject_dirs
-        }
-        
-        all_results = []
-        for future in concurrent.futures.as_completed(future_to_subject):
-            try:
-                result = future.result()
-                if result["matches"]:
-                    all_results.append(result)
-            except Exception as e:
-                logger.error(f"Error in parallel search: {str(e)}")
+    # 🧠 Near-duplicate wordings of a recent query reuse its retrieval result
+    semantic_scope = _semantic_scope(base_dir, target_subject)
+    if SEMANTIC_CACHE_ENABLED:
+        cached = SEMANTIC_CACHE.lookup(semantic_scope, query_embedding)
+        if cached:
+            PERFORMANCE_METRICS["cache_hits"] += 1
+            logger.info(f"✅ Semantic cache hit ({cached['similarity']:.3f}) for query: {query[:50]}...")
+            return cached["result"]
+    
+    if SEMESTER_INDEX_ENABLED and semester_index:
+        # 🗂️ One search over the unified index replaces the per-subject fan-out
+        result = search_semester_index(base_dir, query, target_subject, k=max(k, RESULT_TOP_K), query_embedding=query_embedding)
+        all_results = [result] if result["matches"] else []
+    else:
+        result = _search_subject_indexes(base_dir, query, target_subject, k, routed_dirs or subject_dirs, query_embedding)
+        if result is None:
+            return {"matched_chunks": [], "sources": [], "search_time": 0.0}
+        if routed_dirs and should_audit():
+            threading.Thread(
+                target=_audit_routing, args=(base_dir, query, k, subject_dirs, query_embedding, result["matches"]), daemon=True
+            ).start()
+        all_results = [result] if result["matches"] else []
     
     # 🎯 Smart result ranking and selection
     ranked_results = []
@@ -360,13 +1060,14 @@ def search_multiple_indexes(
     
     # Sort by relevance score and limit results
     ranked_results.sort(key=lambda x: x["score"], reverse=True)
-    top_results = ranked_results[:5]  # Limit to top 5 results
+    if HYBRID_SEARCH != "off" and lexical["matches"]:
+        # 🔀 Keyword hits the embedding missed join the ranking (reciprocal rank or weighted fusion)
+        ranked_results = fuse(ranked_results, lexical["matches"], HYBRID_SEARCH)
+        all_sources.update(lexical["sources"])
+    top_results = ranked_results[:RESULT_TOP_K]
     
     # Format final output
-    final_chunks = []
-    for result in top_results:
-        chunk = f"Source: {result['source']} | Section: {result['section']}\nContent: {result['content']}"
-        final_chunks.append(chunk)
+    final_chunks = _format_chunks(top_results)
     
     search_time = time.time() - start_time
     
@@ -374,7 +1075,7 @@ def search_multiple_indexes(
         "matched_chunks": final_chunks,
         "sources": list(all_sources),
         "search_time": search_time,
-        "total_results": len(ranked_results),
+        "total_results": sum(result.get("total_results", len(result["matches"])) for result in all_results),
         "cache_key": cache_key
     }
     
@@ -382,12 +1083,44 @@ def search_multiple_indexes(
     if len(QUERY_CACHE) < QUERY_CACHE_SIZE:
         QUERY_CACHE[cache_key] = {
             "result": final_result,
+            "scope": cache_scope,
             "timestamp": time.time(),
             "access_count": 1
         }
+    if SEMANTIC_CACHE_ENABLED:
+        SEMANTIC_CACHE.store(semantic_scope, query_embedding, final_result)
     
     return final_result
 
+def _audit_routing(base_dir: str, query: str, k: int, subject_dirs: List[str], query_embedding: np.ndarray, routed: List[dict]):
+    """Compare a routed search with the full fan-out it replaced, off the request path"""
+    try:
+        full = _search_subject_indexes(base_dir, query, None, k, subject_dirs, query_embedding)
+        record_audit(routed, full["matches"] if full else [])
+    except Exception as e:
+        logger.warning(f"Routing audit failed: {e}")
+
+def _semantic_scope(base_dir: str, target_subject: Optional[str] = None) -> tuple:
+    return (os.path.normpath(base_dir), target_subject)
+
+# 🧠 Optional answer reuse for near-duplicate questions
+def get_cached_answer(base_dir: str, query: str, target_subject: Optional[str], answer_key: str) -> Optional[str]:
+    """Answer given to a near-duplicate of this query, when answer caching is enabled"""
+    if not (SEMANTIC_CACHE_ENABLED and SEMANTIC_CACHE_ANSWERS):
+        return None
+    subject_dirs = get_catalog().subject_dirs(base_dir)
+    _drop_stale_stores(_find_subject_dirs(base_dir) if subject_dirs is None else subject_dirs)
+    return SEMANTIC_CACHE.lookup_answer(
+        _semantic_scope(base_dir, target_subject), get_query_embedding(query), answer_key
+    )
+
+def cache_answer(base_dir: str, query: str, target_subject: Optional[str], answer_key: str, answer: str):
+    """Attach an LLM answer to the semantic cache entry of its query"""
+    if SEMANTIC_CACHE_ENABLED and SEMANTIC_CACHE_ANSWERS:
+        SEMANTIC_CACHE.store_answer(
+            _semantic_scope(base_dir, target_subject), get_query_embedding(query), answer_key, answer
+        )
+
 # 📊 Performance monitoring
 def get_performance_metrics() -> dict:
     """Get current performance metrics"""
@@ -395,9 +1128,24 @@ def get_performance_metrics() -> dict:
         **PERFORMANCE_METRICS,
         "cache_size": len(QUERY_CACHE),
         "vectorstore_cache_size": len(VECTORSTORE_CACHE),
+        "index_catalog": get_catalog().stats(),
+        "query_embedding_cache": _query_embedding_stats(),
+        "semantic_cache": SEMANTIC_CACHE.stats(),
+        "ingest_pipeline": get_pipeline_metrics(),
+        "subject_routing": get_routing_metrics(),
+        "section_scan_ratio": PERFORMANCE_METRICS["section_vectors_scanned"] / max(1, PERFORMANCE_METRICS["section_vectors_total"]),
         "cache_hit_rate": PERFORMANCE_METRICS["cache_hits"] / max(1, PERFORMANCE_METRICS["cache_hits"] + PERFORMANCE_METRICS["cache_misses"])
     }
 
+def _query_embedding_stats() -> dict:
+    from simple_embeddings import QUERY_EMBEDDING_CACHE, QUERY_EMBEDDING_METRICS
+    lookups = QUERY_EMBEDDING_METRICS["hits"] + QUERY_EMBEDDING_METRICS["misses"]
+    return {
+        **QUERY_EMBEDDING_METRICS,
+        "size": len(QUERY_EMBEDDING_CACHE),
+        "hit_rate": QUERY_EMBEDDING_METRICS["hits"] / max(1, lookups)
+    }
+
 def clear_caches():
     """Clear all caches for memory management"""
     VECTORSTORE_CACHE.clear()
@@ -433,25 +1181,23 @@ def extract_sections(text: str) -> List[Tuple[str, str]]:
     return sections if sections else [("Full Document", text)]
 
 # 🚀 Fast PDF loading
-def load_pdf(path: str) -> Optional[str]:
-    """Fast PDF text extraction with error handling"""
+def load_pdf_pages(path: str, backend: Optional[str] = None) -> List[Tuple[int, str]]:
+    """(page number, cleaned text) for every non-empty page, extracted across a process pool
+
+    backend picks the extractor (pypdf2, pypdfium2, pymupdf); PDF_EXTRACT_BACKEND by default.
+    """
     try:
-        reader = PdfReader(path)
-        text_chunks = []
-        
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                # Clean and normalize text
-                cleaned_text = re.sub(r'\s+', ' ', page_text).strip()
-                if cleaned_text:
-                    text_chunks.append(cleaned_text)
-        
-        return "\n".join(text_chunks) if text_chunks else None
-        
+        return extract_pages(path, backend=backend)
     except Exception as e:
         logger.error(f"PDF loading error: {str(e)}")
-        return None
+        return []
+
+def _join_pages(pages: List[Tuple[int, str]]) -> Optional[str]:
+    return "\n".join(text for _, text in pages) if pages else None
+
+def load_pdf(path: str, backend: Optional[str] = None) -> Optional[str]:
+    """Fast PDF text extraction with error handling"""
+    return _join_pages(load_pdf_pages(path, backend))
 
 # 🎯 Query preprocessing for better search
 def preprocess_query(query: str) -> str:
@@ -524,16 +1270,21 @@ async def batch_search_queries(queries: List[str], base_dir: str, target_subject
 def clear_caches():
     """Clear all caches for memory management"""
     global VECTORSTORE_CACHE, QUERY_CACHE, EMBEDDING_CACHE
+    from simple_embeddings import QUERY_EMBEDDING_CACHE
     VECTORSTORE_CACHE.clear()
     QUERY_CACHE.clear()
     EMBEDDING_CACHE.clear()
+    QUERY_EMBEDDING_CACHE.clear()
+    SEMANTIC_CACHE.clear()
     logger.info("✅ All retriever caches cleared")
 
 def get_cache_stats():
     """Get cache statistics"""
     return {
         "vectorstore_cache_size": len(VECTORSTORE_CACHE),
+        "vectorstore_cache": VECTORSTORE_CACHE.stats(),
         "query_cache_size": len(QUERY_CACHE),
         "embedding_cache_size": len(EMBEDDING_CACHE),
+        "embedding_cache": EMBEDDING_CACHE.stats(),
         "performance_metrics": PERFORMANCE_METRICS
     }
\ No newline at end of file
@@ -3,19 +3,20 @@ import logging
 import shutil
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from collections import Counter
 from db import SessionLocal
 from models import SearchHistory, User, Activity, LearningProgress
 from schemas import QueryResponse
-from retriever import search_multiple_indexes, create_vectorstore, get_performance_metrics, preprocess_query
-from llm_interface import run_llm_async, create_optimized_prompt, truncate_context, get_performance_metrics as get_llm_metrics
+from retriever import search_multiple_indexes, create_vectorstore, get_performance_metrics, preprocess_query, get_cached_answer, cache_answer
+from llm_interface import run_llm_async, LLMStream, LLMBusyError, create_optimized_prompt, truncate_context, get_performance_metrics as get_llm_metrics
 from utils import validate_directory_structure
 from routers.auth import oauth2_scheme, SECRET_KEY, ALGORITHM
 import asyncio
 import time
+import json
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -37,7 +38,9 @@ QUERY_PERFORMANCE = {
     "avg_response_time": 0.0,
     "cache_hits": 0,
     "vector_search_time": 0.0,
-    "llm_response_time": 0.0
+    "llm_response_time": 0.0,
+    "streamed_queries": 0,
+    "avg_time_to_first_token": 0.0
 }
 
 def get_db():
@@ -175,6 +178,197 @@ async def log_user_activity(db, user_id, branch, year, semester, sources, questi
         logger.error(f"Error logging user activity: {str(e)}")
         db.rollback()
 
+async def _prepare_query(
+    question: str,
+    branch: str,
+    year: str,
+    semester: str,
+    model_type: str,
+    session_id: str,
+    file: UploadFile,
+    current_user: User,
+    db: Session
+) -> dict:
+    """Everything answering a question needs before the LLM call: context, sources and chat history"""
+    # 📊 Update performance metrics
+    QUERY_PERFORMANCE["total_queries"] += 1
+    
+    base_path = os.path.join("vector_store", branch, year, semester)
+    os.makedirs(base_path, exist_ok=True)
+
+    plan = {
+        "base_path": base_path,
+        "context": None,
+        "sources": None,           # passed to the LLM
+        "final_sources": [],       # reported with the answer
+        "citation_map": {},
+        "is_from_pdf": False,
+        "pdf_text": None,
+        "results": None,
+        "target_subject": None,
+        "cached_answer": None,
+        "cache_answer": False      # whether the answer may be reused for near-duplicate questions
+    }
+
+    # 🚀 Handle TEMPORARY PDF processing for student uploads (no permanent storage)
+    if file and file.filename.endswith('.pdf'):
+        # Create temporary directory for student uploads (separate from course materials)
+        import tempfile
+        temp_dir = tempfile.mkdtemp(prefix="student_pdf_")
+        temp_file_path = os.path.join(temp_dir, file.filename)
+        
+        # Save the file temporarily
+        with open(temp_file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+
+        # 🎯 IMMEDIATE temporary PDF processing for instant Q&A
+        from retriever import process_temp_pdf_for_query
+        context = process_temp_pdf_for_query(temp_file_path, question)
+        
+        if context:
+            logger.info(f"📄 Processed temporary PDF: {file.filename} ({len(context)} chars context)")
+            plan["context"] = context
+            plan["is_from_pdf"] = True
+            plan["final_sources"] = plan["sources"] = [file.filename]
+            plan["pdf_text"] = "processed"  # Flag to indicate successful processing
+            
+            # Clean up temporary file after processing
+            try:
+                os.remove(temp_file_path)
+                os.rmdir(temp_dir)
+                logger.info(f"🧹 Cleaned up temporary PDF: {file.filename}")
+            except Exception as cleanup_error:
+                logger.warning(f"⚠️ Failed to cleanup temporary file: {cleanup_error}")
+        else:
+            logger.warning(f"⚠️ Failed to process temporary PDF: {file.filename}")
+            # Clean up on failure too
+            try:
+                os.remove(temp_file_path)
+                os.rmdir(temp_dir)
+            except:
+                pass
+
+        # NOTE: No vectorstore creation for student uploads - they are temporary only
+
+    # 🎯 Preprocess query for better search
+    processed_question = preprocess_query(question)
+    plan["processed_question"] = processed_question
+    logger.info(f"Processing query: {processed_question[:50]}...")
+
+    # 🧠 Get conversation history for context
+    conversation_history = []
+    if session_id:
+        # Fetch recent conversation history for this session
+        recent_chats = db.query(SearchHistory).filter(
+            SearchHistory.user_id == current_user.id,
+            SearchHistory.session_id == session_id
+        ).order_by(SearchHistory.timestamp.desc()).limit(5).all()
+        
+        # Convert to conversation format (reverse to chronological order)
+        conversation_history = [
+            {"question": chat.question, "answer": chat.answer}
+            for chat in reversed(recent_chats)
+        ]
+        
+        logger.debug(f"Found {len(conversation_history)} previous messages in session {session_id}")
+    plan["conversation_history"] = conversation_history
+
+    # 🚀 Enhanced search strategy with temporary PDF processing
+    if plan["pdf_text"] and plan["context"]:
+        # Answer directly from uploaded temporary PDF
+        logger.debug("Answering from temporary uploaded PDF content")
+    elif not validate_directory_structure(base_path):
+        # No course materials found, use LLM's knowledge directly
+        logger.info("No course materials found, using LLM knowledge")
+    else:
+        # 🎯 Targeted search with performance optimization
+        vector_search_start = time.time()
+        
+        # Use targeted search if we have a specific subject
+        results = await asyncio.to_thread(
+            search_multiple_indexes, 
+            base_path, 
+            processed_question, 
+            plan["target_subject"],
+            k=3  # Reduced for speed
+        )
+        plan["results"] = results
+        
+        vector_search_time = time.time() - vector_search_start
+        QUERY_PERFORMANCE["vector_search_time"] = (
+            (QUERY_PERFORMANCE["vector_search_time"] * (QUERY_PERFORMANCE["total_queries"] - 1) + vector_search_time) 
+            / QUERY_PERFORMANCE["total_queries"]
+        )
+        
+        chunks = results.get("matched_chunks", [])
+        search_time = results.get("search_time", 0.0)
+
+        logger.debug(f"Vector search completed in {search_time:.2f}s, found {len(chunks)} chunks")
+
+        if chunks:
+            # 🎯 Smart context optimization
+            numbered_chunks = []
+            
+            for i, chunk in enumerate(chunks[:3], start=1):  # Limit to top 3 chunks
+                plan["citation_map"][i] = chunk
+                numbered_chunks.append(f"[{i}] {chunk}")
+
+            # 🚀 Optimize context for faster LLM processing
+            raw_context = "\n".join(numbered_chunks)
+            plan["context"] = truncate_context(raw_context, max_length=1200)  # Reduced for speed
+            plan["sources"] = results.get("sources", [])
+            plan["is_from_pdf"] = True
+
+            logger.debug(f"Context length: {len(raw_context)} -> {len(plan['context'])} characters")
+
+            # 🧠 Reuse the answer to a near-duplicate question (opt-in, only without chat history)
+            if not conversation_history:
+                plan["cache_answer"] = True
+                plan["cached_answer"] = get_cached_answer(base_path, processed_question, plan["target_subject"], model_type)
+        else:
+            # No relevant chunks found, use LLM's knowledge directly
+            logger.info("No relevant chunks found, using LLM knowledge")
+    
+    return plan
+
+def _record_answer(plan: dict, answer: str, model_type: str, llm_time: float):
+    """Cache a fresh answer, update LLM timing and pick the sources the answer cites"""
+    if plan["cached_answer"]:
+        QUERY_PERFORMANCE["cache_hits"] += 1
+    elif plan["cache_answer"] and not answer.startswith("❌"):
+        cache_answer(plan["base_path"], plan["processed_question"], plan["target_subject"], model_type, answer)
+    
+    if plan["citation_map"]:
+        QUERY_PERFORMANCE["llm_response_time"] = (
+            (QUERY_PERFORMANCE["llm_response_time"] * (QUERY_PERFORMANCE["total_queries"] - 1) + llm_time) 
+            / QUERY_PERFORMANCE["total_queries"]
+        )
+
+        # 🎯 Smart source attribution
+        source_counter = Counter([
+            plan["citation_map"][i] for i in plan["citation_map"].keys()
+            if f"[{i}]" in answer
+        ])
+        plan["final_sources"] = [source_counter.most_common(1)[0]] if source_counter else []
+        
+        logger.info(f"LLM response generated in {llm_time:.2f}s")
+
+def _record_response_time(start_time: float) -> float:
+    # 📊 Calculate total response time
+    total_time = time.time() - start_time
+    QUERY_PERFORMANCE["avg_response_time"] = (
+        (QUERY_PERFORMANCE["avg_response_time"] * (QUERY_PERFORMANCE["total_queries"] - 1) + total_time) 
+        / QUERY_PERFORMANCE["total_queries"]
+    )
+
+    logger.debug(f"Query completed in {total_time:.2f}s")
+    return total_time
+
+def _cited_sources(plan: dict, answer: str) -> list:
+    # Only include sources if we actually used them in the answer
+    final_sources = plan["final_sources"]
+    return final_sources if final_sources and any(source in answer for source in final_sources) else []
+
 @router.post("/document")
 async def query_document(
     question: str = Form(...),
@@ -193,224 +387,189 @@ async def query_document(
     start_time = time.time()
     
     try:
-        # 📊 Update performance metrics
-        QUERY_PERFORMANCE["total_queries"] += 1
-        
-        base_path = os.path.join("vector_store", branch, year, semester)
-        os.makedirs(base_path, exist_ok=True)
-
-        answer = "No answer generated"
-        final_sources = []
-        is_from_pdf = False
-        context = None
-        target_subject = None
-        pdf_text = None
-
-        # 🚀 Handle TEMPORARY PDF processing for student uploads (no permanent storage)
-        if file and file.filename.endswith('.pdf'):
-            # Create temporary directory for student uploads (separate from course materials)
-            import tempfile
-            temp_dir = tempfile.mkdtemp(prefix="student_pdf_")
-            temp_file_path = os.path.join(temp_dir, file.filename)
-            
-            # Save the file temporarily
-            with open(temp_file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            # 🎯 IMMEDIATE temporary PDF processing for instant Q&A
-            from retriever import process_temp_pdf_for_query
-            context = process_temp_pdf_for_query(temp_file_path, question)
-            
-            if context:
-                logger.info(f"📄 Processed temporary PDF: {file.filename} ({len(context)} chars context)")
-                is_from_pdf = True
-                final_sources = [file.filename]
-                pdf_text = "processed"  # Flag to indicate successful processing
-                
-                # Clean up temporary file after processing
-                try:
-                    os.remove(temp_file_path)
-                    os.rmdir(temp_dir)
-                    logger.info(f"🧹 Cleaned up temporary PDF: {file.filename}")
-                except Exception as cleanup_error:
-                    logger.warning(f"⚠️ Failed to cleanup temporary file: {cleanup_error}")
-            else:
-                logger.warning(f"⚠️ Failed to process temporary PDF: {file.filename}")
-                # Clean up on failure too
-                try:
-                    os.remove(temp_file_path)
-                    os.rmdir(temp_dir)
-                except:
-                    pass
-
-            # NOTE: No vectorstore creation for student uploads - they are temporary only
-
-        # 🎯 Preprocess query for better search
-        processed_question = preprocess_query(question)
-        logger.info(f"Processing query: {processed_question[:50]}...")
-
-        # 🧠 Get conversation history for context
-        conversation_history = []
-        if session_id:
-            # Fetch recent conversation history for this session
-            recent_chats = db.query(SearchHistory).filter(
-                SearchHistory.user_id == current_user.id,
-                SearchHistory.session_id == session_id
-            ).order_by(SearchHistory.timestamp.desc()).limit(5).all()
-            
-            # Convert to conversation format (reverse to chronological order)
-            conversation_history = [
-                {"question": chat.question, "answer": chat.answer}
-                for chat in reversed(recent_chats)
-            ]
-            
-            logger.debug(f"Found {len(conversation_history)} previous messages in session {session_id}")
-
-        # 🚀 Enhanced search strategy with temporary PDF processing
-        if pdf_text and context:
-            # Answer directly from uploaded temporary PDF
-            logger.debug("Answering from temporary uploaded PDF content")
-            answer = await run_llm_async(
-                query=question, 
-                context=context,
-                model_type=model_type, 
-                sources=final_sources,
-                conversation_history=conversation_history
-            )
-            is_from_pdf = True
-        elif not validate_directory_structure(base_path):
-            # No course materials found, use LLM's knowledge directly
-            logger.info("No course materials found, using LLM knowledge")
-            answer = await run_llm_async(
-                query=question, 
-                model_type=model_type, 
-                sources=None,
-                conversation_history=conversation_history
-            )
-        else:
-            # 🎯 Targeted search with performance optimization
-            vector_search_start = time.time()
-            
-            # Use targeted search if we have a specific subject
-            results = await asyncio.to_thread(
-                search_multiple_indexes, 
-                base_path, 
-                processed_question, 
-                target_subject,
-                k=3  # Reduced for speed
-            )
-            
-            vector_search_time = time.time() - vector_search_start
-            QUERY_PERFORMANCE["vector_search_time"] = (
-                (QUERY_PERFORMANCE["vector_search_time"] * (QUERY_PERFORMANCE["total_queries"] - 1) + vector_search_time) 
-                / QUERY_PERFORMANCE["total_queries"]
-            )
-            
-            chunks = results.get("matched_chunks", [])
-            sources = results.get("sources", [])
-            search_time = results.get("search_time", 0.0)
-
-            logger.debug(f"Vector search completed in {search_time:.2f}s, found {len(chunks)} chunks")
-
-            if chunks:
-                # 🎯 Smart context optimization
-                numbered_chunks = []
-                citation_map = {}
-                
-                for i, chunk in enumerate(chunks[:3], start=1):  # Limit to top 3 chunks
-                    citation_map[i] = chunk
-                    numbered_chunks.append(f"[{i}] {chunk}")
-
-                # 🚀 Optimize context for faster LLM processing
-                raw_context = "\n".join(numbered_chunks)
-                context = truncate_context(raw_context, max_length=1200)  # Reduced for speed
-                is_from_pdf = True
-
-                logger.debug(f"Context length: {len(raw_context)} -> {len(context)} characters")
-
-                # 🚀 Use optimized LLM with context, sources, and conversation history
-                llm_start = time.time()
-                answer = await run_llm_async(
-                    query=question, 
-                    context=context, 
-                    model_type=model_type,
-                    sources=sources,
-                    conversation_history=conversation_history
-                )
-                llm_time = time.time() - llm_start
-                
-                QUERY_PERFORMANCE["llm_response_time"] = (
-                    (QUERY_PERFORMANCE["llm_response_time"] * (QUERY_PERFORMANCE["total_queries"] - 1) + llm_time) 
-                    / QUERY_PERFORMANCE["total_queries"]
-                )
-
-                # 🎯 Smart source attribution
-                source_counter = Counter([
-                    citation_map[i] for i in citation_map.keys()
-                    if f"[{i}]" in answer
-                ])
-                final_sources = [source_counter.most_common(1)[0]] if source_counter else []
-                
-                logger.info(f"LLM response generated in {llm_time:.2f}s")
-            else:
-                # No relevant chunks found, use LLM's knowledge directly
-                logger.info("No relevant chunks found, using LLM knowledge")
-                answer = await run_llm_async(
-                    query=question, 
-                    model_type=model_type, 
-                    sources=None,
-                    conversation_history=conversation_history
-                )
-                is_from_pdf = False
-
-        # 📊 Calculate total response time
-        total_time = time.time() - start_time
-        QUERY_PERFORMANCE["avg_response_time"] = (
-            (QUERY_PERFORMANCE["avg_response_time"] * (QUERY_PERFORMANCE["total_queries"] - 1) + total_time) 
-            / QUERY_PERFORMANCE["total_queries"]
+        plan = await _prepare_query(question, branch, year, semester, model_type, session_id, file, current_user, db)
+
+        # 🚀 Use optimized LLM with context, sources, and conversation history
+        llm_start = time.time()
+        answer = plan["cached_answer"] or await run_llm_async(
+            query=question, 
+            context=plan["context"], 
+            model_type=model_type,
+            sources=plan["sources"],
+            conversation_history=plan["conversation_history"]
         )
-
-        logger.debug(f"Query completed in {total_time:.2f}s")
+        _record_answer(plan, answer, model_type, time.time() - llm_start)
+        total_time = _record_response_time(start_time)
 
         # Log user activity in background with proper data including session ID
         background_tasks.add_task(
             log_user_activity, 
-            db, current_user.id, branch, year, semester, final_sources, question, answer, is_from_pdf, session_id
+            db, current_user.id, branch, year, semester, plan["final_sources"], question, answer, plan["is_from_pdf"], session_id
         )
 
         # Only include sources if we have them and the answer is from course materials
+        results = plan["results"]
         response_data = {
             "answer": answer,
-            "is_from_pdf": is_from_pdf,
+            "is_from_pdf": plan["is_from_pdf"],
             "model_type": model_type,
-            "pdf_processed": pdf_text is not None,
-            "pdf_filename": file.filename if file and pdf_text else None,
+            "pdf_processed": plan["pdf_text"] is not None,
+            "pdf_filename": file.filename if file and plan["pdf_text"] else None,
             "performance": {
                 "total_time": round(total_time, 2),
-                "vector_search_time": round(results.get("search_time", 0.0), 2) if 'results' in locals() else 0.0,
-                "pdf_extraction_time": round(time.time() - start_time, 2) if pdf_text else 0.0
+                "vector_search_time": round(results.get("search_time", 0.0), 2) if results else 0.0,
+                "pdf_extraction_time": round(time.time() - start_time, 2) if plan["pdf_text"] else 0.0
             }
         }
         
-        # Only include sources if we actually used them in the answer
-        if final_sources and any(source in answer for source in final_sources):
-            response_data["sources"] = final_sources
+        sources = _cited_sources(plan, answer)
+        if sources:
+            response_data["sources"] = sources
             
         return response_data
 
+    except LLMBusyError as e:
+        raise _busy(e)
     except Exception as e:
         logger.error(f"Query error: {str(e)}")
         if 'ENVIRONMENT' not in os.environ or os.environ['ENVIRONMENT'] != 'production':
             logger.exception("Full traceback:")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _busy(e: LLMBusyError) -> HTTPException:
+    logger.warning(f"LLM admission refused: {str(e)}")
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that calls on_close however the response ends
+
+    A client gone before the body is first read never runs the body iterator (and
+    skips background tasks), so its cleanup can't live there.
+    """
+    
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+# 🌊 Streaming variant: sources first, then tokens as the model generates them
+@router.post("/document/stream")
+async def query_document_stream(
+    question: str = Form(...),
+    branch: str = Form(...),
+    year: str = Form(...),
+    semester: str = Form(...),
+    subject: str = Form(None),
+    model_type: str = Form("ollama"),
+    session_id: str = Form(None),
+    file: UploadFile = File(None),
+    background_tasks: BackgroundTasks = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Server-Sent Events version of /document
+
+    Events: "meta" (retrieval sources and flags), "token" ({"text"} per generated piece),
+    then "done" with the final answer, cited sources and timings, or "error".
+    """
+    start_time = time.time()
+    
+    try:
+        plan = await _prepare_query(question, branch, year, semester, model_type, session_id, file, current_user, db)
+    except Exception as e:
+        logger.error(f"Query error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    results = plan["results"]
+    stream = None if plan["cached_answer"] else LLMStream(
+        query=question,
+        context=plan["context"],
+        model_type=model_type,
+        sources=plan["sources"],
+        conversation_history=plan["conversation_history"]
+    )
+    if stream is not None:
+        try:
+            await stream.start()  # a full queue is a 429, not an error event
+        except LLMBusyError as e:
+            raise _busy(e)
+    
+    async def events():
+        yield _sse("meta", {
+            "sources": plan["sources"] or [],
+            "is_from_pdf": plan["is_from_pdf"],
+            "model_type": model_type,
+            "pdf_processed": plan["pdf_text"] is not None,
+            "pdf_filename": file.filename if file and plan["pdf_text"] else None,
+            "cached": stream is None,
+            "vector_search_time": round(results.get("search_time", 0.0), 2) if results else 0.0
+        })
+        
+        llm_start = time.time()
+        time_to_first_token = None
+        try:
+            if stream is None:
+                answer = plan["cached_answer"]
+                time_to_first_token = time.time() - start_time
+                yield _sse("token", {"text": answer})
+            else:
+                async for text in stream:
+                    if time_to_first_token is None:
+                        time_to_first_token = time.time() - start_time
+                    yield _sse("token", {"text": text})
+                answer = stream.answer
+        except Exception as e:
+            logger.error(f"Streaming query error: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+            return
+        
+        _record_answer(plan, answer, model_type, time.time() - llm_start)
+        total_time = _record_response_time(start_time)
+        if time_to_first_token is not None:
+            QUERY_PERFORMANCE["streamed_queries"] += 1
+            QUERY_PERFORMANCE["avg_time_to_first_token"] += (
+                (time_to_first_token - QUERY_PERFORMANCE["avg_time_to_first_token"]) / QUERY_PERFORMANCE["streamed_queries"]
+            )
+        
+        # Runs once the stream is closed, like /document's
+        background_tasks.add_task(
+            log_user_activity, 
+            db, current_user.id, branch, year, semester, plan["final_sources"], question, answer, plan["is_from_pdf"], session_id
+        )
+        yield _sse("done", {
+            "answer": answer,
+            "sources": _cited_sources(plan, answer),
+            "performance": {
+                "total_time": round(total_time, 2),
+                "time_to_first_token": round(time_to_first_token or 0.0, 2)
+            }
+        })
+    
+    return _ClosingStreamingResponse(
+        events(),
+        on_close=stream.close if stream is not None else lambda: None,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks
+    )
+
 # 🚀 New endpoint for performance monitoring
 @router.get("/performance")
 async def get_performance_metrics():
     """Get performance metrics for monitoring"""
     try:
-        retriever_metrics = get_performance_metrics()
-        llm_metrics = get_llm_metrics()
+        retriever_metrics, llm_metrics = await asyncio.gather(
+            asyncio.to_thread(get_performance_metrics),
+            asyncio.to_thread(get_llm_metrics)
+        )
         
         return {
             "query_performance": QUERY_PERFORMANCE,
@@ -452,16 +611,26 @@ async def batch_query_documents(
         tasks = []
         for question in question_list:
             task = asyncio.create_task(
-                run_llm_async(query=question, model_type=model_type)
+                run_llm_async(query=question, model_type=model_type, priority="batch")
             )
             tasks.append(task)
         
         answers = await asyncio.gather(*tasks, return_exceptions=True)
+        if answers and all(isinstance(answer, LLMBusyError) for answer in answers):
+            raise _busy(answers[0])  # nothing was answered
         
         # Format results
         results = []
         for i, (question, answer) in enumerate(zip(question_list, answers)):
-            if isinstance(answer, Exception):
+            if isinstance(answer, LLMBusyError):
+                # Refused by admission control: only this question needs resending
+                results.append({
+                    "question": question,
+                    "answer": f"❌ {str(answer)}",
+                    "status": "busy",
+                    "retry_after": answer.retry_after
+                })
+            elif isinstance(answer, Exception):
                 results.append({
                     "question": question,
                     "answer": f"❌ Error: {str(answer)}",
@@ -477,9 +646,12 @@ async def batch_query_documents(
         return {
             "results": results,
             "total_questions": len(question_list),
-            "successful": len([r for r in results if r["status"] == "success"])
+            "successful": len([r for r in results if r["status"] == "success"]),
+            "busy": len([r for r in results if r["status"] == "busy"])
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Batch query failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
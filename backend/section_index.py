@@ -0,0 +1,159 @@
+# section_index.py - Section-level summaries of a store, so big subjects search only the relevant sections
+import os
+import sys
+import argparse
+import logging
+from typing import Iterable, Optional
+import numpy as np
+import faiss
+from ann_index import normalized
+
+logger = logging.getLogger(__name__)
+
+# 📑 Section index configuration
+SECTION_INDEX_FILE = "sections.npz"
+SECTION_SEARCH_MIN_CHUNKS = int(os.getenv("SECTION_SEARCH_MIN_CHUNKS", "2000"))  # smaller stores are searched whole
+SECTION_TOP_N = int(os.getenv("SECTION_TOP_N", "8"))  # sections whose chunks are searched
+
+def _save_section_index(path: str, keys: dict, sums: np.ndarray, section_ids: np.ndarray):
+    ordered = sorted(keys, key=keys.get)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        tmp_path,
+        sources=np.frombuffer("\n".join(source for source, _ in ordered).encode(), dtype=np.uint8),
+        titles=np.frombuffer("\n".join(title for _, title in ordered).encode(), dtype=np.uint8),
+        vectors=normalized(sums),
+        norms=np.linalg.norm(sums, axis=1).astype(np.float32),
+        section_ids=section_ids
+    )
+    os.replace(tmp_path, path)
+
+def _section_ids(metadatas: Iterable[dict], keys: dict) -> np.ndarray:
+    section_ids = []
+    for metadata in metadatas:
+        key = (metadata.get("source", "Unknown"), metadata.get("section", "Unknown"))
+        section_ids.append(keys.setdefault(key, len(keys)))
+    return np.asarray(section_ids, dtype=np.int32)
+
+def write_section_index(store_dir: str, metadatas: Iterable[dict], vectors: np.ndarray) -> int:
+    """Group a store's chunks (in FAISS id order) by source and section title and write one summary per section
+
+    Layout: titles and sources as newline-joined UTF-8, each section's unit mean chunk
+    vector and the length of its chunk vector sum, and the section id of every chunk.
+    """
+    keys = {}
+    section_ids = _section_ids(metadatas, keys)
+
+    path = os.path.join(store_dir, SECTION_INDEX_FILE)
+    if not len(section_ids):
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+    vectors = normalized(np.asarray(vectors[:len(section_ids)], dtype=np.float32))
+    sums = np.zeros((len(keys), vectors.shape[1]), dtype=np.float32)
+    np.add.at(sums, section_ids, vectors)
+    _save_section_index(path, keys, sums, section_ids)
+    return len(keys)
+
+def extend_section_index(store_dir: str, metadatas: Iterable[dict], vectors: np.ndarray, start: int) -> Optional[int]:
+    """Add chunks start, start + 1, ... to a store's section summaries, from their metadata and vectors alone
+
+    Returns the section count, or None when the stored index doesn't hold exactly
+    start chunks or predates the stored sums; write_section_index then.
+    """
+    path = os.path.join(store_dir, SECTION_INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if "norms" not in data.files or len(data["section_ids"]) != start:
+            return None
+        sources = data["sources"].tobytes().decode().split("\n")
+        titles = data["titles"].tobytes().decode().split("\n")
+        sums = data["vectors"] * data["norms"][:, None]
+        section_ids = data["section_ids"]
+    keys = {key: i for i, key in enumerate(zip(sources, titles))}
+    new_ids = _section_ids(metadatas, keys)
+    vectors = normalized(np.asarray(vectors[:len(new_ids)], dtype=np.float32))
+    sums = np.vstack([sums, np.zeros((len(keys) - len(sums), sums.shape[1]), dtype=np.float32)])
+    np.add.at(sums, new_ids, vectors)
+    _save_section_index(path, keys, sums, np.concatenate([section_ids, new_ids]))
+    return len(keys)
+
+class SectionIndex:
+    """Section summaries of one store and the chunks each section holds"""
+
+    def __init__(self, path: str):
+        with np.load(path) as data:
+            self.sources = data["sources"].tobytes().decode().split("\n")
+            self.titles = data["titles"].tobytes().decode().split("\n")
+            self.vectors = data["vectors"]
+            self.section_ids = data["section_ids"]
+        self.nbytes = self.vectors.nbytes + self.section_ids.nbytes
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def top_sections(self, query_embedding: np.ndarray, n: int = SECTION_TOP_N) -> np.ndarray:
+        """Ids of the n sections whose summaries are closest to the query, best first"""
+        scores = self.vectors @ normalized(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        if n < len(scores):
+            top = np.argpartition(-scores, n - 1)[:n]
+            return top[np.argsort(-scores[top])]
+        return np.argsort(-scores)
+
+    def selector(self, sections: np.ndarray, n: int):
+        """FAISS id selector over the chunks of sections, among the first n ids; None if that's every chunk"""
+        ids = np.flatnonzero(np.isin(self.section_ids[:n], sections)).astype('int64')
+        if len(ids) >= n:
+            return None, n
+        return faiss.IDSelectorBatch(ids), len(ids)
+
+def load_section_index(store_dir: str) -> Optional[SectionIndex]:
+    path = os.path.join(store_dir, SECTION_INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        return SectionIndex(path)
+    except Exception as e:
+        logger.warning(f"Could not load section index {path}: {e}")
+        return None
+
+# 🛠️ Section indexes for existing stores
+def build_all(root: str, force: bool = False) -> dict:
+    """Write a section index next to every store under root that lacks one"""
+    from retriever import _load_vectorstore_from_disk, _iter_documents
+    from ann_index import reconstruct_all
+
+    report = {"built": 0, "skipped": 0, "failed": 0}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        if "index.faiss" not in files:
+            continue
+        if not force and SECTION_INDEX_FILE in files:
+            report["skipped"] += 1
+            continue
+        try:
+            db = _load_vectorstore_from_disk(dirpath)
+            exact_vectors = getattr(db, "exact_vectors", None)
+            vectors = exact_vectors if exact_vectors is not None else reconstruct_all(db.index)
+            n = write_section_index(dirpath, (doc.metadata for doc in _iter_documents(db)), vectors)
+            print(f"✅ {dirpath}: {n} sections")
+            report["built"] += 1
+        except Exception as e:
+            print(f"❌ {dirpath}: {e}")
+            report["failed"] += 1
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Build section indexes for existing vector stores")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("root", nargs="?", default="vector_store")
+    parser.add_argument("--force", action="store_true", help="rebuild indexes that already exist")
+    args = parser.parse_args()
+
+    report = build_all(args.root, args.force)
+    print(f"\n📊 Built: {report['built']}, skipped: {report['skipped']}, failed: {report['failed']}")
+    return report["failed"] == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
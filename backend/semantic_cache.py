@@ -0,0 +1,152 @@
+# semantic_cache.py - Near-duplicate query cache over query embeddings
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+# 🧠 Semantic cache configuration
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # cosine similarity
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))  # seconds
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "256"))  # per scope
+SEMANTIC_CACHE_ANSWERS = os.getenv("SEMANTIC_CACHE_ANSWERS", "false").lower() == "true"
+
+class SemanticCache:
+    """Recent query embeddings per scope in a small inner-product FAISS index
+
+    A scope is whatever the caller searches within, e.g. (semester dir, subject).
+    Entries expire after ttl seconds and the least recently used one is evicted
+    once a scope holds max_entries.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._scopes = {}  # scope -> {"index": faiss.IndexIDMap2, "entries": OrderedDict(id -> entry)}
+        self._next_id = 0
+        self.metrics = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0, "answer_hits": 0}
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, scope_data: dict, entry_id: int):
+        scope_data["entries"].pop(entry_id, None)
+        scope_data["index"].remove_ids(np.array([entry_id], dtype=np.int64))
+
+    def _expire(self, scope_data: dict):
+        cutoff = time.time() - self.ttl
+        expired = [entry_id for entry_id, entry in scope_data["entries"].items() if entry["created"] < cutoff]
+        for entry_id in expired:
+            self._remove(scope_data, entry_id)
+        self.metrics["expirations"] += len(expired)
+
+    def _nearest(self, scope: Hashable, vector: np.ndarray):
+        """Closest live entry in a scope and its cosine similarity (caller holds the lock)"""
+        scope_data = self._scopes.get(scope)
+        if scope_data is None:
+            return None, 0.0
+        self._expire(scope_data)
+        if scope_data["index"].ntotal == 0:
+            return None, 0.0
+        scores, ids = scope_data["index"].search(vector, 1)
+        if ids[0][0] == -1:
+            return None, 0.0
+        scope_data["entries"].move_to_end(int(ids[0][0]))
+        return scope_data["entries"][int(ids[0][0])], float(scores[0][0])
+
+    def lookup(self, scope: Hashable, vector: np.ndarray) -> Optional[dict]:
+        """Cached entry for a query within the similarity threshold, if any"""
+        vector = self._normalize(vector)
+        with self._lock:
+            entry, similarity = self._nearest(scope, vector)
+            if entry is None or similarity < self.threshold:
+                self.metrics["misses"] += 1
+                return None
+            entry["hits"] += 1
+            self.metrics["hits"] += 1
+            return {**entry, "similarity": similarity}
+
+    def store(self, scope: Hashable, vector: np.ndarray, result: dict) -> int:
+        """Remember the retrieval result for a query"""
+        vector = self._normalize(vector)
+        with self._lock:
+            scope_data = self._scopes.get(scope)
+            if scope_data is None:
+                scope_data = {
+                    "index": faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1])),
+                    "entries": OrderedDict()
+                }
+                self._scopes[scope] = scope_data
+
+            while len(scope_data["entries"]) >= self.max_entries:
+                self._remove(scope_data, next(iter(scope_data["entries"])))
+                self.metrics["evictions"] += 1
+
+            entry_id = self._next_id
+            self._next_id += 1
+            scope_data["index"].add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            scope_data["entries"][entry_id] = {"result": result, "answers": {}, "created": time.time(), "hits": 0}
+            self.metrics["stores"] += 1
+            return entry_id
+
+    def lookup_answer(self, scope: Hashable, vector: np.ndarray, answer_key: Hashable) -> Optional[str]:
+        """Cached answer of a near-duplicate query, if one was stored under answer_key"""
+        vector = self._normalize(vector)
+        with self._lock:
+            entry, similarity = self._nearest(scope, vector)
+            if entry is None or similarity < self.threshold:
+                return None
+            answer = entry["answers"].get(answer_key)
+            if answer is not None:
+                self.metrics["answer_hits"] += 1
+            return answer
+
+    def store_answer(self, scope: Hashable, vector: np.ndarray, answer_key: Hashable, answer: str):
+        """Attach an answer to the entry the query matches"""
+        vector = self._normalize(vector)
+        with self._lock:
+            entry, similarity = self._nearest(scope, vector)
+            if entry is not None and similarity >= self.threshold:
+                entry["answers"][answer_key] = answer
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]):
+        """Drop every scope the predicate matches (e.g. after new material is ingested)"""
+        with self._lock:
+            for scope in [scope for scope in self._scopes if predicate(scope)]:
+                del self._scopes[scope]
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = sum(len(s["entries"]) for s in self._scopes.values())
+            scopes = len(self._scopes)
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "scopes": scopes,
+            "entries": entries,
+            "threshold": self.threshold,
+            "hit_rate": self.metrics["hits"] / max(1, lookups)
+        }
+
+# 🚀 Shared cache for retrieval results
+SEMANTIC_CACHE = SemanticCache()
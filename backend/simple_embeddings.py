@@ -2,20 +2,32 @@
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import logging
+import os
+import threading
+from collections import OrderedDict
+from embedding_cache import get_embedding_store
 
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
 # Global model instance for reuse
 _model = None
 
+# 🔁 Query embedding LRU, shared by every index searched for a request and across requests
+QUERY_EMBEDDING_CACHE = OrderedDict()
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_EMBEDDING_METRICS = {"hits": 0, "misses": 0}
+_query_cache_lock = threading.Lock()
+
 def get_embeddings_model():
     """Get or initialize the embeddings model"""
     global _model
     if _model is None:
         try:
             # Use a lightweight, fast model for embeddings
-            _model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("✅ Embeddings model loaded: all-MiniLM-L6-v2")
+            _model = SentenceTransformer(MODEL_NAME)
+            logger.info(f"✅ Embeddings model loaded: {MODEL_NAME}")
         except Exception as e:
             logger.error(f"❌ Failed to load embeddings model: {e}")
             raise
@@ -46,16 +58,43 @@ def get_embeddings(texts):
         logger.error(f"❌ Error generating embeddings: {e}")
         raise
 
+def get_query_embedding(text):
+    """
+    Get the embedding for a query, reusing recent ones
+    Returns:
+        read-only float32 numpy vector
+    """
+    with _query_cache_lock:
+        vector = QUERY_EMBEDDING_CACHE.get(text)
+        if vector is not None:
+            QUERY_EMBEDDING_CACHE.move_to_end(text)
+            QUERY_EMBEDDING_METRICS["hits"] += 1
+            return vector
+
+    vector = np.asarray(get_embeddings([text])[0], dtype=np.float32)
+    vector.setflags(write=False)
+
+    with _query_cache_lock:
+        QUERY_EMBEDDING_METRICS["misses"] += 1
+        QUERY_EMBEDDING_CACHE[text] = vector
+        while len(QUERY_EMBEDDING_CACHE) > QUERY_EMBEDDING_CACHE_SIZE:
+            QUERY_EMBEDDING_CACHE.popitem(last=False)
+    return vector
+
 class SimpleEmbeddings:
     """Simple embeddings class compatible with LangChain"""
     
     def __init__(self):
         self.model = get_embeddings_model()
     
+    def embed_documents_array(self, texts):
+        """Embed a list of documents as one contiguous float32 (n, dim) array, for FAISS"""
+        return np.ascontiguousarray(get_embedding_store(MODEL_NAME).embed(texts, get_embeddings), dtype=np.float32)
+    
     def embed_documents(self, texts):
-        """Embed a list of documents"""
-        return get_embeddings(texts).tolist()
+        """Embed a list of documents, reusing vectors from the on-disk embedding cache"""
+        return self.embed_documents_array(texts).tolist()
     
     def embed_query(self, text):
         """Embed a single query"""
-        return get_embeddings([text])[0].tolist()
+        return get_query_embedding(text).tolist()
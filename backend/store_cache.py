@@ -0,0 +1,103 @@
+# store_cache.py - Thread-safe LRU for loaded vector stores under a memory budget
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 💾 Cache configuration
+VECTORSTORE_CACHE_BYTES = int(os.getenv("VECTORSTORE_CACHE_BYTES", str(2 * 1024 ** 3)))  # 2 GiB
+VECTORSTORE_CACHE_ENTRIES = int(os.getenv("VECTORSTORE_CACHE_ENTRIES", "50"))
+
+class StoreCache:
+    """Least recently used stores, evicted once their bytes exceed budget_bytes
+
+    Sizes are supplied by the caller when a store is put, so one 2 GB store weighs
+    as much as a thousand 2 MB ones. A store larger than the whole budget is not
+    cached at all.
+    """
+
+    def __init__(self, budget_bytes: int = VECTORSTORE_CACHE_BYTES, max_entries: int = VECTORSTORE_CACHE_ENTRIES):
+        self.budget_bytes = budget_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._bytes = 0
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0, "evicted_bytes": 0, "rejected": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.metrics["hits"] += 1
+            return entry[0]
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """A cached value without counting a lookup or refreshing its recency"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key: Hashable, value: Any, nbytes: int):
+        with self._lock:
+            self._discard(key)
+            if nbytes > self.budget_bytes:
+                self.metrics["rejected"] += 1
+                logger.info(f"Not caching {key}: {nbytes} bytes exceeds the {self.budget_bytes} byte budget")
+                return
+            while self._entries and (
+                self._bytes + nbytes > self.budget_bytes or len(self._entries) >= self.max_entries
+            ):
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.metrics["evictions"] += 1
+                self.metrics["evicted_bytes"] += evicted_bytes
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+
+    def _discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            self._discard(key)
+            return entry[0] if entry is not None else default
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = len(self._entries)
+            nbytes = self._bytes
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "entries": entries,
+            "bytes": nbytes,
+            "budget_bytes": self.budget_bytes,
+            "max_entries": self.max_entries,
+            "hit_rate": self.metrics["hits"] / max(1, lookups)
+        }
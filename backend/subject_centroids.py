@@ -0,0 +1,118 @@
+# subject_centroids.py - Per-store centroid summaries of chunk vectors, for score bounds
+import os
+import threading
+import logging
+from typing import Optional
+import numpy as np
+import faiss
+from ann_index import normalized
+
+logger = logging.getLogger(__name__)
+
+# 🎯 Centroid configuration
+CENTROIDS_FILE = "centroids.npy"
+CENTROID_CLUSTERS = int(os.getenv("CENTROID_CLUSTERS", "8"))
+CENTROID_BOUND_SLACK = float(os.getenv("CENTROID_BOUND_SLACK", "0.01"))  # covers compressed-index score error
+POINTS_PER_CLUSTER = 40  # k-means wants ~39 training points per centroid
+
+def _n_clusters(n_vectors: int, n_clusters: int = CENTROID_CLUSTERS) -> int:
+    return max(1, min(n_clusters, n_vectors // POINTS_PER_CLUSTER))
+
+def compute_centroids(vectors: np.ndarray, n_clusters: int = CENTROID_CLUSTERS) -> np.ndarray:
+    """One row per cluster of unit vectors: unit mean direction, lowest member cosine to it, member count
+
+    Every member lies in the cone around the direction whose half-angle is given by
+    the lowest cosine, so no member scores above cos(max(0, angle(q, direction) - half-angle))
+    for a query q. That bounds the best cosine score a store can return.
+    """
+    vectors = normalized(vectors)
+    n_clusters = _n_clusters(len(vectors), n_clusters)
+    if n_clusters == 1:
+        assignment = np.zeros(len(vectors), dtype=np.int64)
+    else:
+        kmeans = faiss.Kmeans(vectors.shape[1], n_clusters, niter=20, seed=1234, spherical=True)
+        kmeans.train(vectors)
+        _, assignment = kmeans.index.search(vectors, 1)
+        assignment = assignment.ravel()
+
+    rows = []
+    for cluster in range(n_clusters):
+        members = vectors[assignment == cluster]
+        if not len(members):
+            continue
+        direction = normalized(members.mean(axis=0, keepdims=True))[0]
+        rows.append(np.concatenate([direction, [float((members @ direction).min()), len(members)]]))
+    return np.asarray(rows, dtype=np.float32)
+
+def _save_centroids(path: str, centroids: np.ndarray):
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, centroids)
+    os.replace(tmp_path, path)
+
+def write_centroids(store_dir: str, vectors: np.ndarray):
+    path = os.path.join(store_dir, CENTROIDS_FILE)
+    if not len(vectors):
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    _save_centroids(path, compute_centroids(vectors))
+
+def extend_centroids(store_dir: str, vectors: np.ndarray) -> bool:
+    """Widen the stored clusters to cover new vectors, each joining the cluster whose direction is closest
+
+    Directions stay put and cones only widen, so the bound stays valid without the
+    old vectors. Returns False when there are no centroids yet or the store has grown
+    enough to re-cluster (the new vectors outnumber the old, or it now warrants more
+    clusters); write_centroids then.
+    """
+    path = os.path.join(store_dir, CENTROIDS_FILE)
+    if not os.path.exists(path):
+        return False
+    centroids = np.load(path)  # read fresh: load_centroids is keyed by mtime, which two quick appends can share
+    if not len(centroids):
+        return False
+    n_old = int(centroids[:, -1].sum())
+    if len(vectors) > n_old or _n_clusters(n_old + len(vectors)) != _n_clusters(n_old):
+        return False
+    if not len(vectors):
+        return True
+    scores = normalized(vectors) @ centroids[:, :-2].T
+    closest = scores.argmax(axis=1)
+    for cluster in np.unique(closest):
+        members = scores[closest == cluster, cluster]
+        centroids[cluster, -2] = min(centroids[cluster, -2], float(members.min()))
+        centroids[cluster, -1] += len(members)
+    _save_centroids(path, centroids)
+    return True
+
+# 💾 Loaded centroids, re-read when the file changes
+_cache = {}
+_cache_lock = threading.Lock()
+
+def load_centroids(store_dir: str) -> Optional[np.ndarray]:
+    path = os.path.join(store_dir, CENTROIDS_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    try:
+        centroids = np.load(path)
+    except Exception as e:
+        logger.warning(f"Could not load centroids {path}: {e}")
+        return None
+    with _cache_lock:
+        _cache[path] = (mtime, centroids)
+    return centroids
+
+def score_bound(centroids: Optional[np.ndarray], query_embedding: np.ndarray) -> float:
+    """Highest cosine score any vector summarised by centroids can reach for the query"""
+    if centroids is None or not len(centroids):
+        return float("inf")
+    query = normalized(np.asarray(query_embedding).reshape(1, -1))[0]
+    query_angles = np.arccos(np.clip(centroids[:, :-2] @ query, -1.0, 1.0))
+    half_angles = np.arccos(np.clip(centroids[:, -2], -1.0, 1.0))
+    return float(np.cos(np.maximum(0.0, query_angles - half_angles)).max() + CENTROID_BOUND_SLACK)
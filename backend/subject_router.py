@@ -0,0 +1,165 @@
+# subject_router.py - Pick the subjects a question is about from their centroid embeddings
+import os
+import sys
+import json
+import random
+import argparse
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ann_index import normalized
+from subject_centroids import load_centroids
+
+logger = logging.getLogger(__name__)
+
+# 🧭 Routing configuration
+ROUTING_ENABLED = os.getenv("ROUTING_ENABLED", "true").lower() == "true"
+ROUTING_TOP_N = int(os.getenv("ROUTING_TOP_N", "2"))               # subjects searched when routing is confident
+ROUTING_MIN_SCORE = float(os.getenv("ROUTING_MIN_SCORE", "0.2"))   # best subject's centroid cosine
+ROUTING_MIN_MARGIN = float(os.getenv("ROUTING_MIN_MARGIN", "0.05"))  # gap between the last subject kept and the next
+ROUTING_AUDIT_RATE = float(os.getenv("ROUTING_AUDIT_RATE", "0.05"))  # routed queries re-run over every subject
+
+ROUTING_METRICS = {"routed": 0, "fallbacks": 0, "audits": 0, "audit_top1_hits": 0, "audit_recall_sum": 0.0}
+_metrics_lock = threading.Lock()
+
+def subject_scores(subject_dirs: List[str], query_embedding: np.ndarray) -> Optional[List[Tuple[float, str]]]:
+    """(score, subject dir) best first, scoring a subject by its closest centroid; None if any lacks centroids"""
+    query = normalized(np.asarray(query_embedding).reshape(1, -1))[0]
+    scores = []
+    for subject_dir in subject_dirs:
+        centroids = load_centroids(subject_dir)
+        if centroids is None or not len(centroids):
+            return None
+        scores.append((float((centroids[:, :-2] @ query).max()), subject_dir))
+    scores.sort(key=lambda item: item[0], reverse=True)
+    return scores
+
+def route(
+    subject_dirs: List[str],
+    query_embedding: np.ndarray,
+    n: int = ROUTING_TOP_N,
+    min_score: float = ROUTING_MIN_SCORE,
+    min_margin: float = ROUTING_MIN_MARGIN
+) -> Optional[List[str]]:
+    """The n most likely subjects, or None when every subject should be searched"""
+    if len(subject_dirs) <= n:
+        return None
+    scores = subject_scores(subject_dirs, query_embedding)
+    confident = (
+        scores is not None
+        and scores[0][0] >= min_score
+        and scores[n - 1][0] - scores[n][0] >= min_margin
+    )
+    with _metrics_lock:
+        ROUTING_METRICS["routed" if confident else "fallbacks"] += 1
+    return [subject_dir for _, subject_dir in scores[:n]] if confident else None
+
+def should_audit() -> bool:
+    return ROUTING_AUDIT_RATE > 0 and random.random() < ROUTING_AUDIT_RATE
+
+def match_recall(routed: List[dict], full: List[dict]) -> float:
+    """Share of the full fan-out's matches that the routed search also returned"""
+    if not full:
+        return 1.0
+    routed_keys = {(m["source"], m["content"]) for m in routed}
+    return sum((m["source"], m["content"]) in routed_keys for m in full) / len(full)
+
+def record_audit(routed: List[dict], full: List[dict]):
+    recall = match_recall(routed, full)
+    top1 = bool(routed and full and (routed[0]["source"], routed[0]["content"]) == (full[0]["source"], full[0]["content"]))
+    with _metrics_lock:
+        ROUTING_METRICS["audits"] += 1
+        ROUTING_METRICS["audit_top1_hits"] += int(top1 or not full)
+        ROUTING_METRICS["audit_recall_sum"] += recall
+
+def get_routing_metrics() -> Dict:
+    with _metrics_lock:
+        audits = ROUTING_METRICS["audits"]
+        decisions = ROUTING_METRICS["routed"] + ROUTING_METRICS["fallbacks"]
+        return {
+            **ROUTING_METRICS,
+            "top_n": ROUTING_TOP_N,
+            "routed_rate": ROUTING_METRICS["routed"] / max(1, decisions),
+            "audit_top1_accuracy": ROUTING_METRICS["audit_top1_hits"] / max(1, audits),
+            "audit_recall": ROUTING_METRICS["audit_recall_sum"] / max(1, audits)
+        }
+
+# 📊 Offline routing accuracy, to tune ROUTING_TOP_N
+def _sample_queries(subject_dirs: List[str], n_queries: int, seed: int = 0) -> List[str]:
+    """Opening words of random chunks, standing in for questions about them"""
+    from chunk_store import ChunkStore, has_chunk_store
+
+    rng = random.Random(seed)
+    queries = []
+    stores = [ChunkStore(d) for d in subject_dirs if has_chunk_store(d)]
+    stores = [store for store in stores if len(store)]
+    for _ in range(n_queries if stores else 0):
+        store = rng.choice(stores)
+        words = store.get(rng.randrange(len(store))).page_content.split()
+        queries.append(" ".join(words[:12]))
+    return queries
+
+def routing_report(base_dir: str, queries: Optional[List[str]] = None, max_n: int = 4, n_queries: int = 100) -> Dict:
+    """Per N: how often routing is confident, and how much of the full fan-out's top-k it keeps"""
+    from retriever import _find_subject_dirs, _search_subject_indexes, get_query_embedding
+
+    subject_dirs = _find_subject_dirs(base_dir)
+    queries = queries or _sample_queries(subject_dirs, n_queries)
+    report = {"subjects": len(subject_dirs), "queries": len(queries), "by_n": {}}
+    full_results = {}
+    for query in queries:
+        embedding = get_query_embedding(query)
+        full = _search_subject_indexes(base_dir, query, subject_dirs=subject_dirs, query_embedding=embedding)
+        full_results[query] = (embedding, full["matches"] if full else [])
+
+    for n in range(1, min(max_n, len(subject_dirs) - 1) + 1):
+        routed_count, recall_sum, top1 = 0, 0.0, 0
+        for query, (embedding, full) in full_results.items():
+            selected = route(subject_dirs, embedding, n)
+            if selected is None:
+                recall_sum += 1.0  # fan-out: identical to the full search
+                top1 += 1
+                continue
+            routed_count += 1
+            result = _search_subject_indexes(base_dir, query, subject_dirs=selected, query_embedding=embedding)
+            routed = result["matches"] if result else []
+            recall_sum += match_recall(routed, full)
+            top1 += int(not full or (routed and routed[0]["content"] == full[0]["content"]))
+        report["by_n"][n] = {
+            "routed_rate": routed_count / max(1, len(queries)),
+            "recall": recall_sum / max(1, len(queries)),
+            "top1_accuracy": top1 / max(1, len(queries)),
+            "subjects_searched": (routed_count * n + (len(queries) - routed_count) * len(subject_dirs)) / max(1, len(queries))
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure subject routing against a full fan-out")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("base_dir", help="semester directory, e.g. vector_store/cse/3/5")
+    parser.add_argument("--queries", help="file with one question per line (default: sampled from chunks)")
+    parser.add_argument("--max-n", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    queries = None
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    report = routing_report(args.base_dir, queries, args.max_n, args.samples)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return True
+
+    print(f"\n🧭 Routing over {report['subjects']} subjects, {report['queries']} queries")
+    for n, row in report["by_n"].items():
+        print(
+            f"   N={n}: routed {row['routed_rate']:6.1%}  recall {row['recall']:.3f}  "
+            f"top-1 {row['top1_accuracy']:.3f}  subjects/query {row['subjects_searched']:.1f}"
+        )
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -107,6 +107,146 @@ async def test_llm_interface():
         print(f"❌ LLM interface error: {e}")
         return False
 
+async def test_llm_streaming():
+    """Test streaming tokens through our LLM interface"""
+    print("\n🧪 Testing LLM Streaming...")
+    
+    try:
+        from llm_interface import LLMStream
+        
+        start_time = time.time()
+        first_token_time = None
+        pieces = 0
+        stream = LLMStream(query="What is Python?", model_type="ollama", use_cache=False)
+        async for _ in stream:
+            if first_token_time is None:
+                first_token_time = time.time() - start_time
+            pieces += 1
+        total_time = time.time() - start_time
+        
+        if stream.answer and not stream.answer.startswith("❌") and pieces > 1:
+            print(f"✅ First token in {first_token_time:.2f}s, {pieces} pieces in {total_time:.2f}s")
+            return True
+        else:
+            print(f"❌ Streaming failed ({pieces} pieces): {stream.answer}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ LLM streaming error: {e}")
+        return False
+
+async def test_llm_coalescing():
+    """Test that identical concurrent questions share one generation"""
+    print("\n🧪 Testing LLM Request Coalescing...")
+    
+    try:
+        from llm_interface import run_llm_async, PERFORMANCE_METRICS
+        
+        saved_before = PERFORMANCE_METRICS["generations_saved"]
+        query = f"What is a deadlock? ({time.time()})"  # unique, so nothing is cached yet
+        answers = await asyncio.gather(*(run_llm_async(query, model_type="ollama") for _ in range(3)))
+        saved = PERFORMANCE_METRICS["generations_saved"] - saved_before
+        
+        if len(set(answers)) == 1 and not answers[0].startswith("❌") and saved == 2:
+            print(f"✅ 3 identical requests, {saved} generations saved")
+            return True
+        else:
+            print(f"❌ Coalescing failed ({saved} generations saved): {answers[0][:100]}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ LLM coalescing error: {e}")
+        return False
+
+def test_llm_scheduler():
+    """Test that the scheduler serves interactive requests first, refuses a full queue and frees abandoned slots"""
+    print("\n🚦 Testing LLM Scheduler...")
+    
+    try:
+        from llm_interface import get_scheduler, LLMBusyError, LLM_QUEUE_LIMITS, _Generation
+        
+        async def scenario():
+            scheduler = get_scheduler("scheduler-test")
+            served = []
+            
+            async def request(name, priority):
+                async with scheduler.slot(priority):
+                    served.append(name)
+                    await asyncio.sleep(0.01)
+            
+            # Fill every slot, then queue a quiz, a batch and an interactive request
+            blockers = [asyncio.create_task(request(f"blocker {i}", "interactive")) for i in range(scheduler.limit)]
+            await asyncio.sleep(0)
+            waiting = [asyncio.create_task(request(p, p)) for p in ("quiz", "batch", "interactive")]
+            await asyncio.sleep(0)
+            
+            refused = False
+            extra = []
+            try:
+                for _ in range(LLM_QUEUE_LIMITS["quiz"]):
+                    extra.append(scheduler.admit("quiz"))
+            except LLMBusyError as e:
+                refused = e.retry_after >= 1
+            for waiter in extra:
+                waiter.cancel()  # never run: the scheduler skips them
+            
+            await asyncio.gather(*blockers, *waiting)
+            
+            # A generation cancelled before its task first runs still gives its slot back
+            generation = _Generation("scheduler-test", "scheduler-test", "", None, False, "interactive", scheduler.admit())
+            generation.task.cancel()
+            await asyncio.gather(generation.task, return_exceptions=True)
+            await asyncio.sleep(0)
+            return served[scheduler.limit:], refused, scheduler.running
+        
+        order, refused, running = asyncio.run(scenario())
+        if order == ["interactive", "batch", "quiz"] and refused and running == 0:
+            print(f"✅ Served in priority order {order}, full queue refused, abandoned slot freed")
+            return True
+        else:
+            print(f"❌ Scheduler order {order}, full queue refused: {refused}, slots still held: {running}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ LLM scheduler error: {e}")
+        return False
+
+def test_response_cache():
+    """Test the on-disk response cache: round trip, compression, LRU eviction and TTL"""
+    print("\n💾 Testing Response Cache...")
+    
+    try:
+        import tempfile
+        from response_cache import ResponseCache
+        
+        path = os.path.join(tempfile.mkdtemp(), "responses.db")
+        cache = ResponseCache(path, max_bytes=20000, ttl=3600)
+        long_answer = "Deadlock is a cycle of processes each waiting for another. " * 50
+        cache.put("long", long_answer)
+        cache.put("short", "Yes.")
+        round_trip = cache.get("long") == long_answer and cache.get("short") == "Yes." and cache.get("missing") is None
+        compressed = cache.stats()["bytes"] < len(long_answer)
+        
+        # Another worker opening the same file sees the answers
+        shared = ResponseCache(path).get("short") == "Yes."
+        
+        for i in range(40):
+            cache.put(f"filler {i}", os.urandom(600).hex())
+        bounded = cache.stats()["bytes"] <= cache.max_bytes and cache.get("filler 39") is not None
+        
+        expired = ResponseCache(path, ttl=1e-9).get("filler 39") is None
+        
+        if round_trip and compressed and shared and bounded and expired:
+            print(f"✅ Response cache OK ({cache.stats()['entries']} entries, {cache.stats()['bytes']} bytes)")
+            return True
+        else:
+            print(f"❌ Response cache: round trip {round_trip}, compressed {compressed}, shared {shared}, bounded {bounded}, expired {expired}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Response cache error: {e}")
+        return False
+
 def test_gemini_availability():
     """Test if Gemini is available"""
     print("\n🔍 Testing Gemini Availability...")
@@ -138,6 +278,18 @@ async def main():
     # Test our LLM interface
     llm_interface = await test_llm_interface() if ollama_query else False
     
+    # Test token streaming
+    llm_streaming = await test_llm_streaming() if llm_interface else False
+    
+    # Test identical requests sharing a generation
+    llm_coalescing = await test_llm_coalescing() if llm_interface else False
+    
+    # Test admission control (no backend needed)
+    llm_scheduler = test_llm_scheduler()
+    
+    # Test the response cache (no backend needed)
+    response_cache = test_response_cache()
+    
     # Test Gemini availability
     gemini_available = test_gemini_availability()
     
@@ -145,6 +297,10 @@ async def main():
     print(f"🔗 Ollama Connection: {'✅ PASS' if ollama_connection else '❌ FAIL'}")
     print(f"🧪 Ollama Query: {'✅ PASS' if ollama_query else '❌ FAIL'}")
     print(f"🤖 LLM Interface: {'✅ PASS' if llm_interface else '❌ FAIL'}")
+    print(f"🌊 LLM Streaming: {'✅ PASS' if llm_streaming else '❌ FAIL'}")
+    print(f"🤝 LLM Coalescing: {'✅ PASS' if llm_coalescing else '❌ FAIL'}")
+    print(f"🚦 LLM Scheduler: {'✅ PASS' if llm_scheduler else '❌ FAIL'}")
+    print(f"💾 Response Cache: {'✅ PASS' if response_cache else '❌ FAIL'}")
     print(f"🌟 Gemini Available: {'✅ YES' if gemini_available else '⚠️ NO'}")
     
     if not ollama_connection:
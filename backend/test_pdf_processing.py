@@ -13,6 +13,27 @@ from pathlib import Path
 # Add backend to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+def _write_text_pdf(path, pages):
+    """Minimal PDF with one line of text per page (Helvetica, no compression)"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 11 Tf 40 740 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    data, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(data)
+
 def test_simple_embeddings():
     """Test the SimpleEmbeddings class"""
     print("🧪 Testing SimpleEmbeddings...")
@@ -55,6 +76,126 @@ def test_pdf_loading():
         print(f"❌ PDF loading test failed: {e}")
         return False
 
+def test_page_mapping():
+    """Test page range splitting and locating a chunk's page"""
+    print("\n🧪 Testing page ranges and chunk pages...")
+    try:
+        from pdf_extract import _page_ranges
+        from ingest_pipeline import iter_sections, iter_chunks
+
+        ranges = _page_ranges(10, 4)
+        if ranges[0][0] != 0 or ranges[-1][1] != 10 or any(a[1] != b[0] for a, b in zip(ranges, ranges[1:])):
+            print(f"❌ Page ranges don't cover the document in order: {ranges}")
+            return False
+
+        pages = [(1, "Deadlock needs mutual exclusion, hold and wait and circular wait. " * 20),
+                 (3, "Paging avoids external fragmentation with fixed-size frames. " * 20)]
+        chunks = list(iter_chunks(iter_sections(pages), "os.pdf", set()))
+        numbers = [doc.metadata["page"] for doc in chunks]
+        if numbers[0] != 1 or numbers[-1] != 3 or numbers != sorted(numbers):
+            print(f"❌ Chunks mapped to the wrong page: {numbers}")
+            return False
+
+        print(f"✅ Page ranges {ranges}, chunk pages resolved")
+        return True
+    except Exception as e:
+        print(f"❌ Page mapping test failed: {e}")
+        return False
+
+def test_streaming_ingestion():
+    """Test streamed sections match extract_sections and known chunks are skipped"""
+    print("\n🧪 Testing streaming ingestion stages...")
+    try:
+        from retriever import extract_sections
+        from ingest_pipeline import iter_sections, iter_chunks, iter_batches, run_stage
+        import threading
+
+        body = "Processes share the CPU through time slicing and context switches between them."
+        pages = [(1, "Introduction:"), (1, body), (1, body), (2, "Scheduling:"), (2, body), (2, body), (2, body)]
+        expected = extract_sections("\n".join(text for _, text in pages))
+        streamed = [(s["title"], s["content"]) for s in iter_sections(pages)]
+        if streamed != expected:
+            print(f"❌ Streamed sections differ: {streamed} vs {expected}")
+            return False
+
+        parts = list(iter_sections(pages, max_chars=100))
+        if len(parts) <= len(expected) or parts[0]["final"] or not parts[-1]["final"]:
+            print("❌ Long sections weren't split into parts")
+            return False
+
+        known = set()
+        first = list(iter_chunks(iter_sections(pages), "os.pdf", known))
+        again = list(iter_chunks(iter_sections(pages), "os.pdf", known))
+        if not first or again:
+            print("❌ Known chunks weren't skipped")
+            return False
+
+        stop = threading.Event()
+        stage = run_stage("test", iter_batches(first, lambda texts: [[1.0, 0.0]] * len(texts), batch_size=1), stop, maxsize=1)
+        batches = list(stage)
+        stop.set()
+        if len(batches) != len(first) or batches[0][1].shape != (1, 2):
+            print("❌ Embedding batches lost chunks")
+            return False
+
+        print(f"✅ {len(streamed)} sections, {len(first)} chunks streamed in {len(batches)} batches")
+        return True
+    except Exception as e:
+        print(f"❌ Streaming ingestion test failed: {e}")
+        return False
+
+def test_ingest_run_early_stop():
+    """Test that stopping an ingestion run early ends every stage thread"""
+    print("\n🧪 Testing early-stopped ingestion runs...")
+    try:
+        from ingest_pipeline import IngestRun
+        import threading
+        import time
+
+        class PagesRun(IngestRun):
+            def _pages(self):
+                for number in range(1, 200):
+                    time.sleep(0.01)  # slow extraction: later stages are waiting on it when the run stops
+                    self.counts["pages"] += 1
+                    yield number, f"Chapter {number}:\n" + " ".join(f"Page {number} line {i}: the CPU is shared by time slicing." for i in range(30))
+
+        for _ in range(3):
+            for _ in PagesRun("notes.pdf", set(), lambda texts: [[1.0, 0.0]] * len(texts)):  # first batch only
+                break
+
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            left = [t.name for t in threading.enumerate() if t.name.startswith("ingest-")]
+            if not left:
+                break
+            time.sleep(0.05)
+        if left:
+            print(f"❌ Stage threads still running: {left}")
+            return False
+
+        print("✅ No stage threads left after 3 early-stopped runs")
+        return True
+    except Exception as e:
+        print(f"❌ Early-stop ingestion test failed: {e}")
+        return False
+
+def test_extractor_backends():
+    """Test extractor backend selection and fallback"""
+    print("\n🧪 Testing PDF extractor backends...")
+    try:
+        from pdf_extract import available_backends, get_extractor
+
+        backends = available_backends()
+        if "pypdf2" not in backends or get_extractor("not-a-backend").name != "pypdf2":
+            print(f"❌ PyPDF2 must always be available as the fallback: {backends}")
+            return False
+
+        print(f"✅ Available backends: {', '.join(backends)}")
+        return True
+    except Exception as e:
+        print(f"❌ Extractor backend test failed: {e}")
+        return False
+
 def test_temp_pdf_processing():
     """Test temporary PDF processing"""
     print("\n🧪 Testing temporary PDF processing...")
@@ -79,6 +220,96 @@ def test_vectorstore_creation():
         print(f"❌ Vectorstore creation test failed: {e}")
         return False
 
+def test_ingest_queue():
+    """Test ingestion job idempotency keys, the running-job cap and one running job per store"""
+    print("\n🧪 Testing ingestion job queue...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        from ingest_queue import IngestQueue
+
+        queue = IngestQueue(os.path.join(temp_dir, "jobs.db"), max_running=1)
+        first, created = queue.enqueue("notes.pdf", "vector_store/cse/3/5/os", "upload-1")
+        retried, created_again = queue.enqueue("notes.pdf", "vector_store/cse/3/5/os", "upload-1")
+        if not created or created_again or retried["id"] != first["id"]:
+            print("❌ A retried upload created a second job")
+            return False
+
+        second, _ = queue.enqueue("slides.pdf", "vector_store/cse/3/5/os", "upload-2")
+        claimed = queue.claim("worker-1")
+        if claimed["id"] != first["id"] or queue.claim("worker-2") is not None:
+            print("❌ More jobs ran than the cap allows")
+            return False
+
+        queue.finish(first["id"], error="No text extracted from PDF")
+        job = queue.get(first["id"])
+        if job["status"] != "failed" or job["error"] != "No text extracted from PDF":
+            print(f"❌ Failed job not recorded: {job}")
+            return False
+        if queue.claim("worker-2")["id"] != second["id"]:
+            print("❌ Next job wasn't released after the first finished")
+            return False
+
+        # Under a higher cap, a second job for a busy store waits while another store's job runs
+        queue.max_running = 3
+        third, _ = queue.enqueue("lab.pdf", "vector_store/cse/3/5/os", "upload-3")
+        other, _ = queue.enqueue("intro.pdf", "vector_store/cse/3/5/dbms", "upload-4")
+        if queue.claim("worker-1")["id"] != other["id"] or queue.claim("worker-3") is not None:
+            print("❌ Two jobs ran at once for the same store")
+            return False
+        queue.finish(second["id"])
+        if queue.claim("worker-2")["id"] != third["id"]:
+            print("❌ Store's next job wasn't released after its running one finished")
+            return False
+
+        print(f"✅ Job queue stats: {queue.stats()}")
+        return True
+    except Exception as e:
+        print(f"❌ Ingestion job queue test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_ingest_worker_process():
+    """Test a worker started by start_workers ingests a PDF big enough for parallel page extraction"""
+    print("\n🧪 Testing ingestion worker processes...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        import time
+        import ingest_queue
+        from pdf_extract import PDF_PARALLEL_MIN_PAGES
+
+        pdf_path = os.path.join(temp_dir, "os.pdf")
+        _write_text_pdf(pdf_path, [
+            f"Chapter {i}: page {i} covers process scheduling, paging and deadlock topic {i}."
+            for i in range(PDF_PARALLEL_MIN_PAGES + 4)
+        ])
+        queue = ingest_queue.IngestQueue(os.path.join(temp_dir, "jobs.db"))
+        job, _ = queue.enqueue(pdf_path, os.path.join(temp_dir, "store"))
+        # Extraction uses a process pool of its own, which a daemon worker isn't allowed to start
+        os.environ["PDF_EXTRACT_WORKERS"] = "2"
+        try:
+            ingest_queue.start_workers(1, queue.path)
+        finally:
+            os.environ.pop("PDF_EXTRACT_WORKERS")
+        try:
+            deadline = time.time() + 180
+            while queue.get(job["id"])["status"] in ("queued", "running") and time.time() < deadline:
+                time.sleep(0.5)
+        finally:
+            ingest_queue.stop_workers()
+
+        job = queue.get(job["id"])
+        if job["status"] != "done":
+            print(f"❌ Worker job ended {job['status']}: {job['error']}")
+            return False
+        print(f"✅ Worker ingested {job['progress'].get('pages')} pages")
+        return True
+    except Exception as e:
+        print(f"❌ Ingestion worker test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
 def main():
     """Run all tests"""
     print("🚀 Starting PDF Processing Tests\n")
@@ -86,8 +317,14 @@ def main():
     tests = [
         test_simple_embeddings,
         test_pdf_loading,
+        test_page_mapping,
+        test_streaming_ingestion,
+        test_ingest_run_early_stop,
+        test_extractor_backends,
         test_temp_pdf_processing,
-        test_vectorstore_creation
+        test_vectorstore_creation,
+        test_ingest_queue,
+        test_ingest_worker_process
     ]
     
     results = []
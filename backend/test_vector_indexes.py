@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Test script for vector index layouts
+Builds small subject stores in a temporary semester directory and checks retrieval over them
+"""
+
+import os
+import sys
+import tempfile
+import shutil
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_SUBJECTS = {
+    "operating_systems": [
+        "Round robin scheduling gives every process a fixed time quantum.",
+        "The banker's algorithm avoids deadlock by checking for a safe state."
+    ],
+    "dbms": [
+        "Third normal form removes transitive dependencies between attributes.",
+        "An inner join returns rows that have matching values in both tables."
+    ]
+}
+
+def _build_sample_semester(base_dir):
+    """Create one FAISS store per sample subject and return the semester directory"""
+    from langchain_community.vectorstores import FAISS
+    from simple_embeddings import SimpleEmbeddings
+
+    semester_dir = os.path.join(base_dir, "cse", "3", "5")
+    embeddings = SimpleEmbeddings()
+    for subject, texts in SAMPLE_SUBJECTS.items():
+        db = FAISS.from_texts(
+            texts,
+            embeddings,
+            metadatas=[{"source": f"{subject}.pdf", "section": "Notes"} for _ in texts]
+        )
+        db.save_local(os.path.join(semester_dir, subject))
+    return semester_dir
+
+def test_semester_index():
+    """Test the unified semester index and subject filtering"""
+    print("🧪 Testing unified semester index...")
+    base_dir = tempfile.mkdtemp(prefix="vector_store_")
+    try:
+        import retriever
+
+        semester_dir = _build_sample_semester(base_dir)
+        if not retriever.build_semester_index(semester_dir):
+            print("❌ Semester index build failed")
+            return False
+
+        result = retriever.search_semester_index(semester_dir, "deadlock avoidance", k=4)
+        print(f"✅ Unfiltered search: {len(result['matches'])} matches from {sorted(result['sources'])}")
+
+        result = retriever.search_semester_index(semester_dir, "deadlock avoidance", target_subject="dbms", k=4)
+        if any(not source.startswith("dbms/") for source in result["sources"]):
+            print(f"❌ Subject filter leaked other subjects: {result['sources']}")
+            return False
+        print(f"✅ Filtered search: {len(result['matches'])} matches from {sorted(result['sources'])}")
+
+        return True
+    except Exception as e:
+        print(f"❌ Semester index test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+def test_semantic_cache():
+    """Test near-duplicate lookups, scoping and LRU eviction of the semantic cache"""
+    print("\n🧪 Testing semantic query cache...")
+    try:
+        import numpy as np
+        from semantic_cache import SemanticCache
+
+        cache = SemanticCache(threshold=0.9, ttl=60, max_entries=2)
+        rng = np.random.default_rng(0)
+        query = rng.normal(size=384).astype("float32")
+        near_duplicate = query + rng.normal(scale=0.05, size=384).astype("float32")
+
+        cache.store(("cse/3/5", None), query, {"matched_chunks": ["cached"]})
+        hit = cache.lookup(("cse/3/5", None), near_duplicate)
+        if not hit or hit["result"]["matched_chunks"] != ["cached"]:
+            print("❌ Near-duplicate query missed the cache")
+            return False
+        if cache.lookup(("cse/3/6", None), near_duplicate):
+            print("❌ Cache leaked across scopes")
+            return False
+
+        for _ in range(2):
+            cache.store(("cse/3/5", None), rng.normal(size=384).astype("float32"), {})
+        if cache.lookup(("cse/3/5", None), query) or cache.stats()["evictions"] != 1:
+            print("❌ Least recently used entry was not evicted")
+            return False
+
+        print(f"✅ Semantic cache stats: {cache.stats()}")
+        return True
+    except Exception as e:
+        print(f"❌ Semantic cache test failed: {e}")
+        return False
+
+def test_compressed_index():
+    """Test that re-ranking a compressed index against exact vectors recovers exact results"""
+    print("\n🧪 Testing compressed index re-ranking...")
+    try:
+        import numpy as np
+        import faiss
+        from ann_index import build_index, load_policy, rerank_search, normalized, compression
+
+        rng = np.random.default_rng(0)
+        vectors = normalized(rng.normal(size=(2000, 64)))
+        queries = normalized(vectors[:50] + rng.normal(scale=0.1, size=(50, 64)))
+        exact = faiss.IndexFlatIP(64)
+        exact.add(vectors)
+        truth = exact.search(queries, 5)[1]
+
+        for codec in ["sq8", "fp16", "pq"]:
+            index = build_index(vectors, {**load_policy(), "compression": codec}, "flat")
+            ids = rerank_search(index, queries, 5, exact_vectors=vectors, rerank_factor=4)[1]
+            recall = np.mean([len(set(f) & set(t)) / 5 for f, t in zip(ids, truth)])
+            if compression(index) != codec or recall < 0.9:
+                print(f"❌ {codec}: built as {compression(index)}, recall@5 {recall:.3f}")
+                return False
+            print(f"✅ {codec}: {faiss.serialize_index(index).nbytes} bytes, re-ranked recall@5 {recall:.3f}")
+
+        return True
+    except Exception as e:
+        print(f"❌ Compressed index test failed: {e}")
+        return False
+
+def test_chunk_store():
+    """Test writing, appending and lazily reading a chunk store"""
+    print("\n🧪 Testing lazy chunk store...")
+    store_dir = tempfile.mkdtemp(prefix="chunk_store_")
+    try:
+        from langchain_core.documents import Document
+        from chunk_store import ChunkStore, PositionalIds, write_chunk_store
+
+        docs = [Document(page_content=f"Chunk {i} – ünïcode", metadata={"source": "notes.pdf", "i": i}) for i in range(3)]
+        write_chunk_store(store_dir, docs[:2])
+        old = ChunkStore(store_dir)
+        write_chunk_store(store_dir, docs)
+        store = ChunkStore(store_dir)
+
+        ids = PositionalIds(len(store))
+        doc = store.search(ids[2])
+        if len(store) != 3 or doc.page_content != docs[2].page_content or doc.metadata != docs[2].metadata:
+            print(f"❌ Chunk store returned {doc}")
+            return False
+        if old.search("1").page_content != docs[1].page_content or not isinstance(store.search("7"), str):
+            print("❌ Chunk store lookups by id are wrong")
+            return False
+
+        print(f"✅ Chunk store holds {len(store)} chunks, {os.path.getsize(os.path.join(store_dir, 'chunks.jsonl'))} bytes")
+        return True
+    except Exception as e:
+        print(f"❌ Chunk store test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+def test_store_cache():
+    """Test byte-budgeted LRU eviction of the vector store cache"""
+    print("\n🧪 Testing vector store cache...")
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+        from store_cache import StoreCache
+
+        cache = StoreCache(budget_bytes=100, max_entries=10)
+        cache.put("a", "store a", 40)
+        cache.put("b", "store b", 40)
+        cache.get("a")                      # b is now least recently used
+        cache.put("c", "store c", 40)
+        cache.put("huge", "store huge", 500)
+        if "b" in cache or cache.get("a") != "store a" or "huge" in cache or cache.nbytes != 80:
+            print(f"❌ Unexpected cache contents: {cache.stats()}")
+            return False
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: (cache.put(i % 5, i, 10), cache.get(i % 7)), range(1000)))
+        stats = cache.stats()
+        if stats["bytes"] > 100 or stats["bytes"] != sum(10 if isinstance(k, int) else 40 for k in cache._entries):
+            print(f"❌ Byte accounting drifted under concurrency: {stats}")
+            return False
+
+        print(f"✅ Store cache stats: {stats}")
+        return True
+    except Exception as e:
+        print(f"❌ Store cache test failed: {e}")
+        return False
+
+def test_lexical_index():
+    """Test BM25 hits on exact terms, the shortcut test and rank fusion"""
+    print("\n🧪 Testing lexical index and fusion...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        from lexical_index import write_lexical_index, LexicalIndex, LEXICAL_INDEX_FILE, fuse, is_confident
+
+        texts = [
+            "Paging maps virtual pages onto physical frames.",
+            "CS-301 operating systems covers paging and deadlock.",
+            "Deadlock needs mutual exclusion and circular wait.",
+        ]
+        write_lexical_index(temp_dir, texts)
+        index = LexicalIndex(os.path.join(temp_dir, LEXICAL_INDEX_FILE))
+        scores, ids, coverage = index.search("cs301 syllabus", k=2)
+        if list(ids) != [1] or coverage[0] >= 1.0:
+            print(f"❌ Course code not found or coverage wrong: {ids}, {coverage}")
+            return False
+        scores, ids, coverage = index.search("deadlock", k=3, n=2)
+        if list(ids) != [1]:
+            print(f"❌ Ids beyond the FAISS index were returned: {ids}")
+            return False
+
+        hits = [{"source": "os.pdf", "content": texts[i], "bm25": float(s), "coverage": float(c)}
+                for s, i, c in zip(*index.search("cs-301", k=3))]
+        if not is_confident(hits):
+            print("❌ Unique exact match wasn't confident")
+            return False
+
+        dense = [{"source": "os.pdf", "content": texts[0], "score": 0.8}, {"source": "os.pdf", "content": texts[2], "score": 0.5}]
+        fused = fuse(dense, hits, "rrf")
+        if len(fused) != 3 or fuse(dense, hits, "off") != dense:
+            print(f"❌ Fusion lost or duplicated chunks: {[m['content'] for m in fused]}")
+            return False
+
+        print(f"✅ Lexical index: {index.n_docs} docs, {len(index.vocab)} terms")
+        return True
+    except Exception as e:
+        print(f"❌ Lexical index test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_centroid_bounds():
+    """Test that centroid score bounds never undercut a store's best score"""
+    print("\n🧪 Testing subject centroid bounds...")
+    try:
+        import numpy as np
+        from subject_centroids import compute_centroids, score_bound
+
+        rng = np.random.default_rng(0)
+        topics = rng.normal(size=(4, 32)).astype('float32')
+        vectors = np.vstack([topic + 0.3 * rng.normal(size=(100, 32)) for topic in topics]).astype('float32')
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        centroids = compute_centroids(vectors)
+
+        for query in rng.normal(size=(50, 32)).astype('float32'):
+            best = float((vectors @ (query / np.linalg.norm(query))).max())
+            if score_bound(centroids, query) < best:
+                print(f"❌ Bound {score_bound(centroids, query):.3f} below best score {best:.3f}")
+                return False
+
+        unrelated = rng.normal(size=32).astype('float32')
+        unrelated -= topics.T @ np.linalg.lstsq(topics.T, unrelated, rcond=None)[0]  # orthogonal to every topic
+        if score_bound(centroids, unrelated) >= 0.9:
+            print("❌ Bound too loose to prune an unrelated store")
+            return False
+
+        print(f"✅ {len(centroids)} centroids, bounds hold for 50 queries")
+        return True
+    except Exception as e:
+        print(f"❌ Centroid bound test failed: {e}")
+        return False
+
+def test_subject_routing():
+    """Test routing to the closest subjects and falling back when unsure"""
+    print("\n🧪 Testing subject routing...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        import numpy as np
+        from subject_centroids import write_centroids
+        from subject_router import route
+
+        rng = np.random.default_rng(0)
+        topics = np.linalg.qr(rng.normal(size=(32, 4)))[0].T.astype('float32')  # orthogonal unit topics
+        subject_dirs = []
+        for i, topic in enumerate(topics):
+            subject_dir = os.path.join(temp_dir, f"subject{i}")
+            os.makedirs(subject_dir)
+            write_centroids(subject_dir, (topic + 0.05 * rng.normal(size=(80, 32))).astype('float32'))
+            subject_dirs.append(subject_dir)
+
+        routed = route(subject_dirs, topics[2], n=1)
+        if routed != [subject_dirs[2]]:
+            print(f"❌ Question about subject 2 routed to {routed}")
+            return False
+        if route(subject_dirs, topics[0] + topics[1], n=1) is not None:
+            print("❌ A question split between two subjects wasn't searched everywhere")
+            return False
+        if route(subject_dirs + [temp_dir], topics[2], n=1) is not None:
+            print("❌ A subject without centroids was routed around")
+            return False
+
+        print(f"✅ Routed to {os.path.basename(routed[0])}, ambiguous questions fan out")
+        return True
+    except Exception as e:
+        print(f"❌ Subject routing test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_section_index():
+    """Test section summaries select the chunks of the closest sections"""
+    print("\n🧪 Testing section index...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        import numpy as np
+        from section_index import write_section_index, load_section_index
+
+        rng = np.random.default_rng(0)
+        topics = np.linalg.qr(rng.normal(size=(32, 10)))[0].T.astype('float32')
+        metadatas = [{"source": "os.pdf", "section": f"Topic {i % 10}"} for i in range(200)]
+        vectors = np.stack([topics[i % 10] + 0.05 * rng.normal(size=32) for i in range(200)]).astype('float32')
+        if write_section_index(temp_dir, metadatas, vectors) != 10:
+            print("❌ Chunks weren't grouped into their 10 sections")
+            return False
+
+        sections = load_section_index(temp_dir)
+        top = sections.top_sections(topics[4], n=2)
+        if top[0] != 4 or sections.titles[top[0]] != "Topic 4":
+            print(f"❌ Closest section was {sections.titles[top[0]]}")
+            return False
+        sel, scanned = sections.selector(top, len(vectors))
+        if sel is None or scanned != 40 or not sel.is_member(4) or sel.is_member(5):
+            print(f"❌ Selector covers {scanned} chunks instead of the 2 sections' 40")
+            return False
+
+        print(f"✅ {len(sections)} sections, {scanned}/{len(vectors)} chunks searched")
+        return True
+    except Exception as e:
+        print(f"❌ Section index test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_incremental_append():
+    """Test appends write only the new chunks and match a store written in full"""
+    print("\n🧪 Testing incremental store appends...")
+    temp_dir = tempfile.mkdtemp()
+    full_dir = tempfile.mkdtemp()
+    try:
+        import numpy as np
+        from langchain_core.documents import Document
+        from chunk_store import ChunkStore, write_chunk_store, append_chunk_store, CHUNKS_FILE
+        from lexical_index import write_lexical_index, extend_lexical_index, LexicalIndex, LEXICAL_INDEX_FILE
+        from section_index import write_section_index, extend_section_index, load_section_index
+
+        rng = np.random.default_rng(0)
+        docs = [
+            Document(page_content=f"Chunk {i} on paging, frame {i % 7} and tlb", metadata={"source": "os.pdf", "section": f"Topic {i % 4}"})
+            for i in range(30)
+        ]
+        vectors = rng.normal(size=(30, 16)).astype('float32')
+        write_chunk_store(temp_dir, docs[:20])
+        write_lexical_index(temp_dir, (doc.page_content for doc in docs[:20]))
+        write_section_index(temp_dir, (doc.metadata for doc in docs[:20]), vectors[:20])
+        old = ChunkStore(temp_dir)
+        size = os.path.getsize(os.path.join(temp_dir, CHUNKS_FILE))
+
+        # An interrupted append leaves records past the published ones; the next append overwrites them
+        append_chunk_store(temp_dir, [Document(page_content="leftover", metadata={})] * 3, 20)
+        if not append_chunk_store(temp_dir, docs[20:], 20) or extend_lexical_index(temp_dir, (doc.page_content for doc in docs[20:]), 20) != 30:
+            print("❌ Append was refused")
+            return False
+        if extend_section_index(temp_dir, (doc.metadata for doc in docs[20:]), vectors[20:], 20) != 4:
+            print("❌ Section index wasn't extended")
+            return False
+
+        store = ChunkStore(temp_dir)
+        if [doc.page_content for doc in store] != [doc.page_content for doc in docs] or old.search("19").page_content != docs[19].page_content:
+            print("❌ Appended chunk store doesn't hold the chunks in order")
+            return False
+        if os.path.getsize(os.path.join(temp_dir, CHUNKS_FILE)) <= size:
+            print("❌ Chunk records weren't appended")
+            return False
+
+        write_lexical_index(full_dir, (doc.page_content for doc in docs))
+        write_section_index(full_dir, (doc.metadata for doc in docs), vectors)
+        appended, full = LexicalIndex(os.path.join(temp_dir, LEXICAL_INDEX_FILE)), LexicalIndex(os.path.join(full_dir, LEXICAL_INDEX_FILE))
+        for query in ["frame 3 tlb", "chunk 25", "paging"]:
+            a, b = appended.search(query, 10), full.search(query, 10)
+            if not np.allclose(a[0], b[0]) or list(a[1]) != list(b[1]):
+                print(f"❌ Extended lexical index ranks '{query}' differently")
+                return False
+        sections, full_sections = load_section_index(temp_dir), load_section_index(full_dir)
+        if not np.array_equal(sections.section_ids, full_sections.section_ids) or not np.allclose(sections.vectors, full_sections.vectors, atol=1e-5):
+            print("❌ Extended section summaries differ from a full build")
+            return False
+
+        print(f"✅ Appended {len(store) - 20} chunks to a store of 20")
+        return True
+    except Exception as e:
+        print(f"❌ Incremental append test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        shutil.rmtree(full_dir, ignore_errors=True)
+
+def test_republished_store():
+    """Test a store republished under a cached search is reloaded, with its semester's cached results"""
+    print("\n🧪 Testing republished stores...")
+    base_dir = tempfile.mkdtemp(prefix="vector_store_")
+    try:
+        import time
+        import retriever
+        from langchain_community.vectorstores import FAISS
+        from simple_embeddings import SimpleEmbeddings
+
+        semester_dir = _build_sample_semester(base_dir)
+        query = "What does quicksort choose as its pivot?"
+        before = retriever.search_multiple_indexes(semester_dir, query)
+
+        # Another process publishes a store with a new chunk (a fresh file, as a rename leaves it)
+        time.sleep(0.01)
+        texts = SAMPLE_SUBJECTS["dbms"] + ["Quicksort partitions the array around a chosen pivot element."]
+        store_dir = os.path.join(semester_dir, "dbms")
+        os.remove(os.path.join(store_dir, "index.faiss"))
+        FAISS.from_texts(texts, SimpleEmbeddings(), metadatas=[{"source": "dbms.pdf", "section": "Notes"} for _ in texts]).save_local(store_dir)
+
+        after = retriever.search_multiple_indexes(semester_dir, query)
+        if after is before or not any("Quicksort" in chunk for chunk in map(str, after["matched_chunks"])):
+            print("❌ Search still answered from the store or results cached before it was republished")
+            return False
+
+        print(f"✅ Republished store searched: {len(after['matched_chunks'])} chunks")
+        return True
+    except Exception as e:
+        print(f"❌ Republished store test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+def main():
+    """Run all tests"""
+    print("🚀 Starting Vector Index Tests\n")
+
+    tests = [
+        test_semester_index,
+        test_semantic_cache,
+        test_compressed_index,
+        test_chunk_store,
+        test_store_cache,
+        test_lexical_index,
+        test_centroid_bounds,
+        test_subject_routing,
+        test_section_index,
+        test_incremental_append,
+        test_republished_store
+    ]
+
+    results = []
+    for test in tests:
+        try:
+            result = test()
+            results.append(result)
+        except Exception as e:
+            print(f"❌ Test {test.__name__} crashed: {e}")
+            results.append(False)
+
+    print(f"\n📊 Test Results:")
+    print(f"✅ Passed: {sum(results)}/{len(results)}")
+    print(f"❌ Failed: {len(results) - sum(results)}/{len(results)}")
+
+    if all(results):
+        print("\n🎉 All tests passed! Vector indexes are ready.")
+    else:
+        print("\n⚠️ Some tests failed. Check the errors above.")
+
+    return all(results)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
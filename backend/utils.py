@@ -51,6 +51,13 @@ import os  # Make sure this is at the top of utils.py
 # Add to utils.py
 def validate_directory_structure(base_path):
     """Check for either PDFs or FAISS indexes"""
+    from index_catalog import get_catalog
+
+    # Answer from the in-memory catalog; only paths it doesn't cover (yet) touch the filesystem
+    has_materials = get_catalog().has_materials(base_path)
+    if has_materials is not None:
+        return has_materials
+
     if not os.path.exists(base_path):
         return False
         